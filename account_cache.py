@@ -0,0 +1,107 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+# Önbellekte tutulan hesap satırının kolonları (sırası önemli)
+ACCOUNT_COLUMNS = "id, name, phone, created_at, balance"
+
+
+class AccountCache:
+    """TTL'li, sınırlı boyutlu LRU hesap önbelleği.
+
+    Ledger yazıcısı commit sonrası güncel satırları `put()` ile yazar
+    (write-through). Okuma yolları ise satırı yalnızca okuma başladıktan sonra
+    hiçbir yazma olmadıysa `put_if_unchanged()` ile ekler; böylece eski bir
+    okuma yeni bakiyenin üzerine yazamaz.
+    """
+
+    def __init__(self, max_size=10000, ttl=60.0, enabled=True):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.enabled = enabled
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._write_seq = 0
+
+        # Önbellek metrikleri
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, account_id):
+        """Hesap satırını döndür; yoksa veya süresi dolmuşsa None"""
+        if not self.enabled:
+            return None
+        with self._lock:
+            entry = self._entries.get(account_id)
+            if entry is None:
+                self.misses += 1
+                return None
+            row, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._entries[account_id]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(account_id)
+            self.hits += 1
+            return row
+
+    def read_token(self):
+        """Veritabanından okumaya başlamadan önce alınan sürüm numarası"""
+        return self._write_seq
+
+    def _store(self, row):
+        self._entries[row[0]] = (row, time.monotonic() + self.ttl)
+        self._entries.move_to_end(row[0])
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def put(self, row):
+        """Commit edilmiş güncel satırı yaz (write-through)"""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._write_seq += 1
+            self._store(row)
+
+    def put_if_unchanged(self, row, token):
+        """Okuma sırasında araya yazma girmediyse satırı önbelleğe ekle"""
+        if not self.enabled:
+            return
+        with self._lock:
+            if self._write_seq == token:
+                self._store(row)
+
+    def invalidate(self, account_id):
+        with self._lock:
+            self._write_seq += 1
+            self._entries.pop(account_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._write_seq += 1
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+
+account_cache = AccountCache(
+    max_size=int(os.environ.get("ACCOUNT_CACHE_SIZE", "10000")),
+    ttl=float(os.environ.get("ACCOUNT_CACHE_TTL", "60")),
+    enabled=os.environ.get("ACCOUNT_CACHE_ENABLED", "1") != "0",
+)
@@ -1,13 +1,21 @@
 import sqlite3
 
+from phones import normalize_phone
+
 conn = sqlite3.connect('accounts.db')
 cursor = conn.cursor()
 
 # Örnek veri ekleme
+# Bakiye kuruş cinsinden; açılış bakiyesi bakiye defterine de yazılır
+cursor.execute(
+    "INSERT INTO accounts (name, phone, created_at, balance, phone_normalized) VALUES (?, ?, ?, ?, ?)",
+    ("Salih", "+905525563473", "2028-02-22T12:02:07", 30300, normalize_phone("+905525563473"))
+)
 cursor.execute(
-    "INSERT INTO account (user_id, name, phone, created_at, balance) VALUES (?, ?, ?, ?, ?)",
-    ("303", "Salih", "+905525563473", "2028-02-22 12:02:07", 303.0)
+    "INSERT INTO balance_journal (account_id, delta, kind, reference, created_at) VALUES (?, ?, 'open', NULL, ?)",
+    (cursor.lastrowid, 30300, "2028-02-22T12:02:07")
 )
+conn.commit()
 
 print("Hesap eklendi.")
 
@@ -1,6 +1,6 @@
 import sqlite3
 
-conn = sqlite3.connect('merchants.db')
+conn = sqlite3.connect('accounts.db')
 cursor = conn.cursor()
 
 # Örnek veri ekleme
@@ -0,0 +1,128 @@
+"""Harcama analitiği: ödeme geçmişi üzerinde NumPy ile toplu toplama.
+
+Ödemeler veritabanından keyset ile parça parça (chunk) okunur, her parça
+(hesap, ay, kategori) anahtarına kodlanıp `np.unique` + `np.bincount` ile
+toplanır; satır başına Python döngüsü yoktur ve bellek kullanımı parça boyutu
+ile farklı anahtar sayısıyla sınırlıdır.
+
+Uygulama çalışırken toplamlar her ödemede `spending_totals` tablosunda artımlı
+olarak güncellenir; bu modül geçmişten toplu yeniden hesaplama ve doğrulama
+içindir:
+
+    python analytics.py rebuild
+"""
+import argparse
+import sqlite3
+
+import numpy as np
+
+from budgets import CATEGORIES
+
+PAYMENT_DTYPE = np.dtype([
+    ("id", np.int64),
+    ("account_id", np.int64),
+    ("category", np.int64),
+    ("month", np.int64),
+    ("amount", np.int64),
+])
+
+# Kategori kodu ve ay indeksi (yıl * 12 + ay - 1) SQLite tarafında hesaplanır
+PAYMENT_CHUNK_SQL = """
+SELECT id, account_id,
+       CASE category WHEN 'cafe' THEN 0 WHEN 'market' THEN 1 WHEN 'transport' THEN 2 ELSE 3 END,
+       CAST(substr(created_at, 1, 4) AS INTEGER) * 12 + CAST(substr(created_at, 6, 2) AS INTEGER) - 1,
+       amount
+FROM payments
+WHERE id > ?
+ORDER BY id
+LIMIT ?
+"""
+
+CATEGORY_BITS = 3
+MONTH_BITS = 20
+
+
+def load_payment_chunks(conn, chunk_size=200_000, after_id=0):
+    """Ödemeleri (hesap, kategori, ay, tutar) dizileri halinde parça parça üret"""
+    while True:
+        rows = conn.execute(PAYMENT_CHUNK_SQL, (after_id, chunk_size)).fetchall()
+        if not rows:
+            return
+        data = np.fromiter(rows, dtype=PAYMENT_DTYPE, count=len(rows))
+        after_id = int(data["id"][-1])
+        yield data["account_id"], data["category"], data["month"], data["amount"]
+
+
+def encode_keys(accounts, categories, months):
+    return (accounts << (MONTH_BITS + CATEGORY_BITS)) | (months << CATEGORY_BITS) | categories
+
+
+def decode_keys(keys):
+    accounts = keys >> (MONTH_BITS + CATEGORY_BITS)
+    months = (keys >> CATEGORY_BITS) & ((1 << MONTH_BITS) - 1)
+    categories = keys & ((1 << CATEGORY_BITS) - 1)
+    return accounts, categories, months
+
+
+def _reduce(keys, totals):
+    unique, inverse = np.unique(keys, return_inverse=True)
+    # bincount float64 toplar; kuruş toplamları 2**53'e kadar tam olarak temsil edilir
+    sums = np.bincount(inverse, weights=totals, minlength=len(unique))
+    return unique, np.rint(sums).astype(np.int64)
+
+
+def aggregate_chunks(chunks, compact_every=8):
+    """Parçalardan (hesap, kategori, ay, toplam) dizilerini hesapla"""
+    keys_parts = []
+    totals_parts = []
+    for accounts, categories, months, amounts in chunks:
+        keys, totals = _reduce(encode_keys(accounts, categories, months), amounts)
+        keys_parts.append(keys)
+        totals_parts.append(totals)
+        # Ara sonuçları birleştirerek belleği farklı anahtar sayısıyla sınırla
+        if len(keys_parts) >= compact_every:
+            keys, totals = _reduce(np.concatenate(keys_parts), np.concatenate(totals_parts))
+            keys_parts, totals_parts = [keys], [totals]
+
+    if not keys_parts:
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty, empty, empty
+    keys, totals = _reduce(np.concatenate(keys_parts), np.concatenate(totals_parts))
+    accounts, categories, months = decode_keys(keys)
+    return accounts, categories, months, totals
+
+
+def month_label(month_index):
+    return f"{month_index // 12:04d}-{month_index % 12 + 1:02d}"
+
+
+def rebuild_spending_totals(conn, chunk_size=200_000):
+    """spending_totals tablosunu ödeme geçmişinden yeniden hesapla"""
+    accounts, categories, months, totals = aggregate_chunks(load_payment_chunks(conn, chunk_size))
+    conn.execute("DELETE FROM spending_totals")
+    conn.executemany(
+        "INSERT INTO spending_totals (account_id, category, month, total) VALUES (?, ?, ?, ?)",
+        zip(accounts.tolist(), (CATEGORIES[c] for c in categories.tolist()),
+            map(month_label, months.tolist()), totals.tolist())
+    )
+    conn.commit()
+    return len(totals)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Harcama analitiği")
+    parser.add_argument("command", choices=["rebuild"])
+    parser.add_argument("--chunk-size", type=int, default=200_000)
+    args = parser.parse_args()
+
+    from migrations import DB_PATH, migrate
+    migrate()
+    conn = sqlite3.connect(DB_PATH)
+    if args.command == "rebuild":
+        count = rebuild_spending_totals(conn, args.chunk_size)
+        print(f"{count} (hesap, kategori, ay) toplamı yeniden hesaplandı")
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,37 @@
-from fastapi import FastAPI, HTTPException, Path, Query, Request
-from fastapi.responses import HTMLResponse, RedirectResponse, JSONResponse
-from fastapi.staticfiles import StaticFiles
+from fastapi import Depends, FastAPI, Header, HTTPException, Path, Query, Request, Response, WebSocket
+from fastapi.responses import FileResponse, HTMLResponse, RedirectResponse, JSONResponse, StreamingResponse
 from fastapi.templating import Jinja2Templates
-from pydantic import BaseModel, Field
+from starlette.concurrency import run_in_threadpool
+from pydantic import BaseModel, Field, ValidationError
 from typing import List, Optional
 from datetime import datetime
+import asyncio
+import csv
+import json
 import sqlite3
 import os
-from create_accounts_db import get_db_connection as get_account_db
-from create_merchants_db import get_db_connection as get_merchant_db
+from db_pool import Database, DatabaseBusy, PoolTimeout, database, get_db
+from migrations import migrate
+from ledger import LedgerError, PaymentResult, ledger
+from account_cache import account_cache
+from history import encode_cursor
+from budgets import CATEGORIES, alert_level, budget_status, month_key
+from cashback import CompiledRules, load_campaigns
+from splits import debts as split_debts, net_balances, record_expense, settlement_plan, split_shares
+from qr import PAID, PENDING, PROCESSING, fetch_idempotent_result, intent_store
+from session import SESSION_COOKIE, Session, get_session, require_session, set_session_cookie
+from storage import Storage, get_storage, storage
+from applog import logger, start_logging, stop_logging
+from metrics import CONTENT_TYPE, MetricsMiddleware, registry
+from profiler import profiler_from_env
+from web import StaticAssets, configure_templates, render_page
+from phones import normalize_phone
+from ratelimit import RateLimitMiddleware, create_store
+from notifications import DISCONNECTED, SLOW_CONSUMER, SubscriptionClosed, TooManySubscribers, hub, sse_stream
+from starlette.background import BackgroundTask
+from starlette.websockets import WebSocketDisconnect
+from exports import DONE, MEDIA_TYPES, export_worker
+import seed
 
 # FastAPI uygulama tanımlaması
 app = FastAPI(
@@ -19,184 +42,333 @@ app = FastAPI(
     redoc_url="/redoc"
 )
 
-# Static dosyalar ve templates için ayarlar
-app.mount("/static", StaticFiles(directory="static"), name="static")
+# Hesap/IP başına istek ve saatlik tutar sınırları; DB'ye gitmeden önce uygulanır (RATE_LIMIT=0 kapatır)
+rate_limit_store = create_store() if os.environ.get("RATE_LIMIT", "1") != "0" else None
+if rate_limit_store is not None:
+    app.add_middleware(RateLimitMiddleware, store=rate_limit_store)
+
+# İstek metrikleri (reddedilen istekler dahil); PROFILE_SLOW_MS verilirse yavaş isteklerin profili de yazılır
+profiler = profiler_from_env()
+app.add_middleware(MetricsMiddleware, profiler=profiler)
+
+# Static dosyalar parmak izli ve önceden sıkıştırılmış sunulur; şablonlar açılışta derlenir
+static_assets = StaticAssets("static")
+app.mount("/static", static_assets, name="static")
 templates = Jinja2Templates(directory="templates")
 
+def format_tl(kurus: int) -> str:
+    """Kuruş tutarını '1234.50' biçiminde TL olarak yaz"""
+    sign = "-" if kurus < 0 else ""
+    return f"{sign}{abs(kurus) // 100}.{abs(kurus) % 100:02d}"
+
+templates.env.filters["tl"] = format_tl
+configure_templates(templates, static_assets)
+
+# Listeleme endpoint'leri için akış (streaming) yardımcısı
+STREAM_MEDIA_TYPES = {"ndjson": "application/x-ndjson", "json": "application/json"}
+
+def stream_rows(chunks, to_dict, fmt: str):
+    """Storage'ın verdiği satır parçalarını tüm sonucu belleğe almadan NDJSON veya JSON dizisi olarak akıt"""
+    async def ndjson():
+        async for rows in chunks:
+            yield "".join(json.dumps(to_dict(row), ensure_ascii=False) + "\n" for row in rows)
+
+    async def json_array():
+        separator = ""
+        yield "["
+        async for rows in chunks:
+            yield separator + ",".join(json.dumps(to_dict(row), ensure_ascii=False) for row in rows)
+            separator = ","
+        yield "]"
+
+    body = ndjson() if fmt == "ndjson" else json_array()
+    return StreamingResponse(body, media_type=STREAM_MEDIA_TYPES[fmt])
+
+# İstekte kabul edilen en yüksek para tutarı (kuruş, 10 milyar TL); toplamlar 64 bit sınırından uzak kalır
+MAX_AMOUNT = 10**12
+
 # Auth Models
 class LoginRequest(BaseModel):
     user_id: int = Field(..., description="Kullanıcı ID")
 
 # Para yükleme modeli
 class TopUpRequest(BaseModel):
-    amount: float = Field(..., gt=0, description="Yüklenecek tutar")
+    amount: int = Field(..., gt=0, le=MAX_AMOUNT, description="Yüklenecek tutar (kuruş)")
 
 class TopUpResponse(BaseModel):
     success: bool
     message: str
-    new_balance: float
+    new_balance: int = Field(..., description="Yeni bakiye (kuruş)")
 
 # Transfer Models
 class MoneyTransferRequest(BaseModel):
-    to_user_id: int = Field(..., description="Alıcı kullanıcı ID")
-    amount: float = Field(..., gt=0, description="Gönderilecek tutar")
+    to_user_id: Optional[int] = Field(None, description="Alıcı kullanıcı ID")
+    to_phone: Optional[str] = Field(None, description="Alıcının telefon numarası (to_user_id yerine)")
+    amount: int = Field(..., gt=0, le=MAX_AMOUNT, description="Gönderilecek tutar (kuruş)")
 
 class MoneyTransferResponse(BaseModel):
     success: bool
     message: str
-    new_balance: float
+    new_balance: int = Field(..., description="Yeni bakiye (kuruş)")
 
 # Para yükleme endpoint'i
 @app.post("/api/topup", response_model=TopUpResponse)
-async def top_up_balance(topup: TopUpRequest, request: Request):
-    user_info = request.cookies.get("user_info")
-    if not user_info:
-        raise HTTPException(status_code=401, detail="Oturum bulunamadı")
-    
-    user_id, user_name, balance = user_info.split(":")
-    user_id = int(user_id)
-    
-    conn = get_account_db()
-    cursor = conn.cursor()
+async def top_up_balance(
+    topup: TopUpRequest,
+    session: Session = Depends(require_session),
+    store: Storage = Depends(get_storage)
+):
     try:
-        # Bakiye güncelle
-        cursor.execute(
-            "UPDATE accounts SET balance = balance + ? WHERE id = ?",
-            (topup.amount, user_id)
+        new_balance = await store.topup(session.user_id, topup.amount)
+        return TopUpResponse(
+            success=True,
+            message="Para yükleme işlemi başarılı",
+            new_balance=new_balance
         )
-        
-        # Yeni bakiyeyi al
-        cursor.execute("SELECT balance FROM accounts WHERE id = ?", (user_id,))
-        new_balance = cursor.fetchone()[0]
-        
-        conn.commit()
-        
-        # Cookie'yi güncelle
-        response = JSONResponse(content={
-            "success": True,
-            "message": "Para yükleme işlemi başarılı",
-            "new_balance": new_balance
-        })
-        response.set_cookie(
-            key="user_info",
-            value=f"{user_id}:{user_name}:{new_balance}",
-            max_age=3600,
-            httponly=True
-        )
-        return response
-        
-    except Exception as e:
-        conn.rollback()
+    except sqlite3.Error as e:
         raise HTTPException(status_code=500, detail=str(e))
-    finally:
-        conn.close()
 
 # Transfer endpoint
 @app.post("/api/transfer", response_model=MoneyTransferResponse)
-async def transfer_money(transfer: MoneyTransferRequest, request: Request):
-    user_info = request.cookies.get("user_info")
-    if not user_info:
-        raise HTTPException(status_code=401, detail="Oturum bulunamadı")
-    
-    from_user_id, user_name, balance = user_info.split(":")
-    from_user_id = int(from_user_id)
-    current_balance = float(balance)
-    
-    if transfer.amount > current_balance:
-        raise HTTPException(status_code=400, detail="Yetersiz bakiye")
-    
-    conn = get_account_db()
-    cursor = conn.cursor()
+async def transfer_money(
+    transfer: MoneyTransferRequest,
+    session: Session = Depends(require_session),
+    store: Storage = Depends(get_storage)
+):
+    if (transfer.to_user_id is None) == (transfer.to_phone is None):
+        raise HTTPException(status_code=400, detail="Alıcı için to_user_id ya da to_phone verilmeli")
+    to_user_id = transfer.to_user_id
+    if to_user_id is None:
+        # Tekil telefon indeksinden tek sorgu; kayıtsız numaralar çoğunlukla filtrede elenir
+        to_user_id = await store.find_account_by_phone(transfer.to_phone)
+        if to_user_id is None:
+            raise HTTPException(status_code=404, detail="Bu telefon numarasıyla kayıtlı hesap bulunamadı")
+    # Hesap ve bakiye kontrolleri storage içinde, bakiyenin güncel değeriyle yapılır
     try:
-        # Alıcı hesabı kontrol et
-        cursor.execute("SELECT id FROM accounts WHERE id = ?", (transfer.to_user_id,))
-        receiver = cursor.fetchone()
-        if not receiver:
-            raise HTTPException(status_code=404, detail="Alıcı hesap bulunamadı")
-        
-        # Transfer işlemleri
-        cursor.execute(
-            "UPDATE accounts SET balance = balance - ? WHERE id = ?",
-            (transfer.amount, from_user_id)
-        )
-        cursor.execute(
-            "UPDATE accounts SET balance = balance + ? WHERE id = ?",
-            (transfer.amount, transfer.to_user_id)
-        )
-        
-        # Yeni bakiyeyi al
-        cursor.execute("SELECT balance FROM accounts WHERE id = ?", (from_user_id,))
-        new_balance = cursor.fetchone()[0]
-        
-        # Transfer kaydını oluştur
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS transfers (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                from_user_id INTEGER,
-                to_user_id INTEGER,
-                amount REAL,
-                created_at TEXT,
-                FOREIGN KEY (from_user_id) REFERENCES accounts (id),
-                FOREIGN KEY (to_user_id) REFERENCES accounts (id)
-            )
-        """)
-        
-        cursor.execute(
-            "INSERT INTO transfers (from_user_id, to_user_id, amount, created_at) VALUES (?, ?, ?, ?)",
-            (from_user_id, transfer.to_user_id, transfer.amount, datetime.now().isoformat())
-        )
-        
-        conn.commit()
-        
-        # Cookie'yi güncelle
-        response = JSONResponse(content={
-            "success": True,
-            "message": "Transfer başarıyla gerçekleşti",
-            "new_balance": new_balance
-        })
-        response.set_cookie(
-            key="user_info",
-            value=f"{from_user_id}:{user_name}:{new_balance}",
-            max_age=3600,
-            httponly=True
+        _, new_balance, _ = await store.transfer(session.user_id, to_user_id, transfer.amount)
+        return MoneyTransferResponse(
+            success=True,
+            message="Transfer başarıyla gerçekleşti",
+            new_balance=new_balance
         )
-        return response
-        
-    except Exception as e:
-        conn.rollback()
+    except sqlite3.Error as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+# Rehber eşleştirme modelleri
+class ContactLookupRequest(BaseModel):
+    phones: List[str] = Field(..., max_length=1000, description="Rehberdeki telefon numaraları (herhangi bir biçimde)")
+
+class ContactMatch(BaseModel):
+    phone: str = Field(..., description="İstekte gönderilen numara")
+    account_id: int = Field(..., description="Numaranın kayıtlı olduğu hesap ID")
+
+class ContactLookupResponse(BaseModel):
+    matches: List[ContactMatch]
+
+# Rehberdeki hangi numaraların cüzdanı olduğunu toplu sorgula
+@app.post("/api/contacts/lookup", response_model=ContactLookupResponse)
+async def lookup_contacts(
+    lookup: ContactLookupRequest,
+    session: Session = Depends(require_session),
+    store: Storage = Depends(get_storage)
+):
+    normalized = {}
+    for phone in lookup.phones:
+        try:
+            normalized[phone] = normalize_phone(phone)
+        except ValueError:
+            continue  # rehberdeki geçersiz numaralar eşleşmez
+    found = await store.find_accounts_by_phone(list(normalized.values()))
+    return ContactLookupResponse(matches=[
+        ContactMatch(phone=phone, account_id=found[n]) for phone, n in normalized.items() if n in found
+    ])
+
+# Canlı bildirimler (SSE ve WebSocket): önce güncel bakiye, ardından commit edilen hareketler
+NOTIFY_HEARTBEAT = float(os.environ.get("NOTIFY_HEARTBEAT", "15"))
+NOTIFY_STREAM_TTL = float(os.environ.get("NOTIFY_STREAM_TTL", "900"))
+
+async def _subscribe(account_id: int, store: Storage):
+    """Hesaba abone ol; (abonelik, ilk bakiye olayı) ya da hesap yoksa (None, None)"""
+    # Abonelik bakiye okunmadan önce açılır; arada commit edilen hareket kaçmaz
+    subscription = hub.subscribe(account_id)
+    try:
+        account = await store.get_account(account_id)
+    except BaseException:
+        hub.unsubscribe(subscription)
+        raise
+    if account is None:
+        hub.unsubscribe(subscription)
+        return None, None
+    return subscription, hub.event("balance", {"balance": account[4]})
+
+@app.get("/api/events", summary="Canlı bildirim akışı (Server-Sent Events)")
+async def event_stream(session: Session = Depends(require_session), store: Storage = Depends(get_storage)):
+    try:
+        subscription, first = await _subscribe(session.user_id, store)
+    except TooManySubscribers as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    if subscription is None:
+        raise HTTPException(status_code=404, detail="Hesap bulunamadı")
+
+    async def body():
+        try:
+            async for frame in sse_stream(subscription, first, NOTIFY_HEARTBEAT, NOTIFY_STREAM_TTL):
+                yield frame
+        finally:
+            hub.unsubscribe(subscription)
+
+    # Akış hiç başlamadan kopan bağlantıların aboneliği arka plan görevinde bırakılır
+    return StreamingResponse(
+        body(), media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        background=BackgroundTask(hub.unsubscribe, subscription)
+    )
+
+async def _read_until_closed(websocket: WebSocket, subscription):
+    # İstemci mesajları yok sayılır; okuma yalnızca kopmayı fark etmek için
+    try:
+        while (await websocket.receive())["type"] != "websocket.disconnect":
+            pass
     finally:
-        conn.close()
+        subscription.close(DISCONNECTED)
+
+# Abonelik kapanma nedenine göre WebSocket kapanış kodu (None: istemci zaten gitti)
+WS_CLOSE_CODES = {SLOW_CONSUMER: 1013, DISCONNECTED: None}
+
+@app.websocket("/ws/events")
+async def event_socket(
+    websocket: WebSocket,
+    session: Optional[Session] = Depends(get_session),
+    store: Storage = Depends(get_storage)
+):
+    if session is None:
+        await websocket.close(code=1008)
+        return
+    try:
+        subscription, first = await _subscribe(session.user_id, store)
+    except TooManySubscribers:
+        await websocket.close(code=1013)
+        return
+    if subscription is None:
+        await websocket.close(code=1008)
+        return
+    reader = None
+    try:
+        await websocket.accept()
+        await websocket.send_text(first.text)
+        reader = asyncio.create_task(_read_until_closed(websocket, subscription))
+        while True:
+            await websocket.send_text((await subscription.get()).text)
+    except SubscriptionClosed as e:
+        code = WS_CLOSE_CODES.get(e.reason, 1001)
+        if code is not None:
+            await websocket.close(code=code)
+    except (WebSocketDisconnect, OSError):
+        pass
+    finally:
+        if reader is not None:
+            reader.cancel()
+        hub.unsubscribe(subscription)
 
 # Debug endpoint - sadece geliştirme sırasında kullanılacak
 @app.post("/debug/create-test-user")
-async def create_test_user():
+async def create_test_user(store: Storage = Depends(get_storage)):
     test_users = [
-        ("Şükrü Şahin", "5551234567", 1000.0),
-        ("Özge Çelik", "5551234568", 1500.0),
-        ("İsmail Ülker", "5551234569", 2000.0),
-        ("Gül Öztürk", "5551234570", 2500.0)
+        ("Şükrü Şahin", "5551234567", 100000),
+        ("Özge Çelik", "5551234568", 150000),
+        ("İsmail Ülker", "5551234569", 200000),
+        ("Gül Öztürk", "5551234570", 250000)
     ]
     
-    conn = get_account_db()
-    cursor = conn.cursor()
+    # Telefonlar tekil olduğundan tekrar çağrıda mevcut test kullanıcıları döndürülür
     created_users = []
-    try:
-        for name, phone, balance in test_users:
-            cursor.execute(
-                "INSERT INTO accounts (name, phone, created_at, balance) VALUES (?, ?, ?, ?)",
-                (name, phone, datetime.now().isoformat(), balance)
-            )
-            created_users.append({
-                "id": cursor.lastrowid,
-                "name": name,
-                "phone": phone,
-                "balance": balance
-            })
-        conn.commit()
-        return {"success": True, "created_users": created_users}
-    finally:
-        conn.close()
+    for name, phone, balance in test_users:
+        account_id = await store.find_account_by_phone(phone)
+        created = account_id is None
+        if created:
+            try:
+                account_id = await store.create_account(name, phone, datetime.now(), balance)
+            except LedgerError as e:
+                # Eşzamanlı bir çağrı aynı numarayı az önce kaydetmiş olabilir
+                if e.status_code != 409:
+                    raise
+                account_id, created = await store.find_account_by_phone(phone), False
+        if not created:
+            row = await store.get_account(account_id)
+            name, phone, balance = row[1], row[2], row[4]
+        created_users.append({
+            "id": account_id,
+            "name": name,
+            "phone": phone,
+            "balance": balance,
+            "created": created
+        })
+    return {"success": True, "created_users": created_users}
+
+# Bağlantı havuzu ve ledger yazıcısı metrikleri
+@app.get("/debug/pool-stats")
+async def pool_stats():
+    return {
+        "database": database.stats(),
+        "ledger": ledger.stats(),
+        "account_cache": account_cache.stats(),
+        "storage": storage.stats(),
+        "qr_intents": intent_store.stats(),
+        "rate_limits": rate_limit_store.stats() if rate_limit_store is not None else None,
+        "notifications": hub.stats(),
+        "exports": export_worker.stats(),
+    }
+
+registry.gauges("db_pool", database.stats)
+registry.gauges("ledger", ledger.stats)
+registry.gauges("account_cache", account_cache.stats)
+registry.gauges("storage", storage.stats)
+registry.gauges("qr_intents", intent_store.stats)
+registry.gauges("notifications", hub.stats)
+registry.gauges("exports", export_worker.stats)
+if rate_limit_store is not None:
+    registry.gauges("rate_limit_store", rate_limit_store.stats)
+
+# Prometheus metin formatında metrikler
+@app.get("/metrics", include_in_schema=False)
+async def metrics_endpoint():
+    return Response(registry.render(), media_type=CONTENT_TYPE)
+
+# DB kuyruğu dolu ya da havuzdan bağlantı alınamadıysa isteği beklet(me)
+@app.exception_handler(DatabaseBusy)
+@app.exception_handler(PoolTimeout)
+async def database_busy_handler(request: Request, exc: Exception):
+    return JSONResponse(status_code=503, content={"detail": f"Veritabanı meşgul: {exc}"})
+
+# Ledger'ın reddettiği kayıtlar (yetersiz bakiye, bulunamayan hesap)
+@app.exception_handler(LedgerError)
+async def ledger_error_handler(request: Request, exc: LedgerError):
+    return JSONResponse(status_code=exc.status_code, content={"detail": exc.detail})
+
+@app.on_event("startup")
+async def start_ledger():
+    start_logging()
+    if profiler is not None:
+        profiler.start()
+    # Şema güncelse yalnızca PRAGMA user_version okunur
+    migrate()
+    await ledger.start()
+    await storage.start()
+    intent_store.start()
+
+@app.on_event("shutdown")
+async def close_pools():
+    hub.close()
+    await intent_store.stop()
+    await storage.close()
+    if rate_limit_store is not None:
+        await rate_limit_store.close()
+    await export_worker.close()
+    await ledger.stop()
+    database.close()
+    if profiler is not None:
+        profiler.stop()
+    stop_logging()
 
 # Pydantic models for request/response
 class MerchantBase(BaseModel):
@@ -238,7 +410,7 @@ class UserResponse(UserBase):
         }
 
 class AccountBase(UserBase):
-    balance: float = Field(default=0.0, ge=0.0, description="Hesap bakiyesi")
+    balance: int = Field(default=0, ge=0, le=MAX_AMOUNT, description="Hesap bakiyesi (kuruş)")
 
 class AccountCreate(AccountBase):
     pass
@@ -253,7 +425,7 @@ class AccountResponse(AccountBase):
                 "name": "Ahmet Yılmaz",
                 "phone": "5551234567",
                 "created_at": "2023-10-03T12:00:00",
-                "balance": 1000.0
+                "balance": 100000
             }
         }
 
@@ -263,54 +435,52 @@ class AccountResponse(AccountBase):
     "/accounts/",
     response_model=AccountResponse,
     summary="Yeni hesap oluştur",
-    description="Yeni bir kullanıcı hesabı oluşturur"
+    description="Yeni bir kullanıcı hesabı oluşturur. Telefon numarası normalize edilemiyorsa 400, "
+                "aynı numarayla açılmış bir hesap varsa 409 döner."
 )
-async def create_account(account: AccountCreate):
-    conn = get_account_db()
-    cursor = conn.cursor()
-    try:
-        cursor.execute(
-            "INSERT INTO accounts (name, phone, created_at, balance) VALUES (?, ?, ?, ?)",
-            (account.name, account.phone, account.created_at.isoformat(), account.balance)
-        )
-        conn.commit()
-        new_id = cursor.lastrowid
-        return AccountResponse(
-            id=new_id,
-            name=account.name,
-            phone=account.phone,
-            created_at=account.created_at,
-            balance=account.balance
-        )
-    except sqlite3.IntegrityError as e:
-        raise HTTPException(status_code=400, detail=str(e))
-    finally:
-        conn.close()
+async def create_account(account: AccountCreate, store: Storage = Depends(get_storage)):
+    # Kısıt ihlalleri storage tarafından 400 olarak bildirilir
+    new_id = await store.create_account(account.name, account.phone, account.created_at, account.balance)
+    return AccountResponse(
+        id=new_id,
+        name=account.name,
+        phone=account.phone,
+        created_at=account.created_at,
+        balance=account.balance
+    )
+
+def _account_dict(row):
+    return {"id": row[0], "name": row[1], "phone": row[2], "created_at": row[3], "balance": row[4]}
 
 @app.get(
     "/accounts/",
     response_model=List[AccountResponse],
-    summary="Tüm hesapları listele",
-    description="Sistemdeki tüm hesapları listeler"
+    summary="Hesapları listele",
+    description="Hesapları ID sırasına göre sayfalı (limit/after) veya akış olarak (stream) listeler"
 )
-async def list_accounts():
-    conn = get_account_db()
-    cursor = conn.cursor()
-    try:
-        cursor.execute("SELECT * FROM accounts")
-        rows = cursor.fetchall()
-        return [
-            AccountResponse(
-                id=row[0],
-                name=row[1],
-                phone=row[2],
-                created_at=datetime.fromisoformat(row[3]),
-                balance=row[4]
-            )
-            for row in rows
-        ]
-    finally:
-        conn.close()
+async def list_accounts(
+    response: Response,
+    limit: int = Query(100, ge=1, le=1000, description="Sayfa başına kayıt sayısı"),
+    after: int = Query(0, ge=0, description="Bu ID'den sonraki kayıtlar (X-Next-Cursor değeri)"),
+    stream: Optional[str] = Query(None, pattern="^(ndjson|json)$", description="Tüm kayıtları akış olarak döndür (ndjson veya json)"),
+    store: Storage = Depends(get_storage)
+):
+    if stream:
+        return stream_rows(store.iter_accounts(after), _account_dict, stream)
+
+    rows = await store.list_accounts(after, limit)
+    if len(rows) == limit:
+        response.headers["X-Next-Cursor"] = str(rows[-1][0])
+    return [
+        AccountResponse(
+            id=row[0],
+            name=row[1],
+            phone=row[2],
+            created_at=datetime.fromisoformat(row[3]),
+            balance=row[4]
+        )
+        for row in rows
+    ]
 
 @app.get(
     "/accounts/{account_id}",
@@ -319,30 +489,88 @@ async def list_accounts():
     description="Belirli bir hesabın detaylarını getirir"
 )
 async def get_account(
-    account_id: int = Path(..., description="Hesap ID")
+    account_id: int = Path(..., description="Hesap ID"),
+    store: Storage = Depends(get_storage)
 ):
-    conn = get_account_db()
-    cursor = conn.cursor()
+    row = await store.get_account(account_id)
+    if row is None:
+        raise HTTPException(status_code=404, detail="Hesap bulunamadı")
+    return AccountResponse(
+        id=row[0],
+        name=row[1],
+        phone=row[2],
+        created_at=datetime.fromisoformat(row[3]),
+        balance=row[4]
+    )
+
+# Hesap hareketleri
+class TransactionResponse(BaseModel):
+    id: int = Field(..., description="Transfer ID")
+    direction: str = Field(..., description="in: gelen, out: giden")
+    counterparty_id: int = Field(..., description="Karşı hesap ID")
+    amount: int = Field(..., description="Transfer miktarı (kuruş)")
+    created_at: datetime
+
+@app.get(
+    "/accounts/{account_id}/transactions",
+    response_model=List[TransactionResponse],
+    summary="Hesap hareketlerini listele",
+    description="Hesabın gelen ve giden transferlerini yeniden eskiye, imleç (X-Next-Cursor) ile sayfalı listeler"
+)
+async def list_transactions(
+    response: Response,
+    account_id: int = Path(..., description="Hesap ID"),
+    limit: int = Query(50, ge=1, le=500, description="Sayfa başına kayıt sayısı"),
+    cursor: Optional[str] = Query(None, description="Önceki sayfanın X-Next-Cursor değeri"),
+    start: Optional[datetime] = Query(None, description="Bu tarihten itibaren"),
+    end: Optional[datetime] = Query(None, description="Bu tarihten önce"),
+    store: Storage = Depends(get_storage)
+):
+    if await store.get_account(account_id) is None:
+        raise HTTPException(status_code=404, detail="Hesap bulunamadı")
     try:
-        cursor.execute("SELECT * FROM accounts WHERE id = ?", (account_id,))
-        row = cursor.fetchone()
-        if row is None:
-            raise HTTPException(status_code=404, detail="Hesap bulunamadı")
-        return AccountResponse(
+        rows = await store.transaction_history(account_id, limit, cursor, start, end)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Geçersiz imleç")
+    if len(rows) == limit:
+        response.headers["X-Next-Cursor"] = encode_cursor(rows[-1])
+    return [
+        TransactionResponse(
             id=row[0],
-            name=row[1],
-            phone=row[2],
-            created_at=datetime.fromisoformat(row[3]),
-            balance=row[4]
+            direction=row[1],
+            counterparty_id=row[2],
+            amount=row[3],
+            created_at=datetime.fromisoformat(row[4])
         )
-    finally:
-        conn.close()
+        for row in rows
+    ]
+
+class BalanceAtResponse(BaseModel):
+    account_id: int = Field(..., description="Hesap ID")
+    at: datetime
+    balance: int = Field(..., description="O andaki bakiye (kuruş)")
+
+@app.get(
+    "/accounts/{account_id}/balance",
+    response_model=BalanceAtResponse,
+    summary="Geçmiş bir andaki bakiye",
+    description="Bakiye defterinden hesaplanır; yalnızca o andan önceki en son snapshot'tan sonraki hareketler toplanır"
+)
+async def get_balance_at(
+    account_id: int = Path(..., description="Hesap ID"),
+    at: Optional[datetime] = Query(None, description="Bu andaki bakiye (varsayılan: şimdi)"),
+    store: Storage = Depends(get_storage)
+):
+    if await store.get_account(account_id) is None:
+        raise HTTPException(status_code=404, detail="Hesap bulunamadı")
+    at = at or datetime.now()
+    return BalanceAtResponse(account_id=account_id, at=at, balance=await store.balance_at(account_id, at))
 
 # Transfer models
 class TransferBase(BaseModel):
     from_account_id: int = Field(..., description="Gönderen hesap ID")
     to_account_id: int = Field(..., description="Alıcı hesap ID")
-    amount: float = Field(..., gt=0, description="Transfer miktarı")
+    amount: int = Field(..., gt=0, le=MAX_AMOUNT, description="Transfer miktarı (kuruş)")
 
 class TransferCreate(TransferBase):
     pass
@@ -357,7 +585,7 @@ class TransferResponse(TransferBase):
                 "id": 1,
                 "from_account_id": 1,
                 "to_account_id": 2,
-                "amount": 100.0,
+                "amount": 10000,
                 "created_at": "2023-10-03T12:00:00"
             }
         }
@@ -368,48 +596,33 @@ class TransferResponse(TransferBase):
     summary="Yeni işletme ekle",
     description="Sisteme yeni bir işletme ekler. İşletme kategorisi belirtilen değerlerden biri olmalıdır."
 )
-async def add_merchant(merchant: MerchantBase):
+async def add_merchant(merchant: MerchantBase, store: Storage = Depends(get_storage)):
     if merchant.category not in ['cafe', 'market', 'transport', 'other']:
         raise HTTPException(
             status_code=400,
             detail="Geçersiz kategori. Geçerli kategoriler: cafe, market, transport, other"
         )
 
-    conn = get_merchant_db()
-    cursor = conn.cursor()
-    try:
-        cursor.execute(
-            "INSERT INTO merchants (name, category) VALUES (?, ?)",
-            (merchant.name, merchant.category)
-        )
-        conn.commit()
-        new_id = cursor.lastrowid
-        return MerchantResponse(id=new_id, name=merchant.name, category=merchant.category)
-    except sqlite3.IntegrityError as e:
-        raise HTTPException(status_code=400, detail=str(e))
-    finally:
-        conn.close()
+    new_id = await store.create_merchant(merchant.name, merchant.category)
+    return MerchantResponse(id=new_id, name=merchant.name, category=merchant.category)
 
 # Login ve yönlendirme endpoint'leri
 @app.get("/", response_class=HTMLResponse)
 async def root(request: Request):
-    return templates.TemplateResponse("login.html", {"request": request})
+    return render_page(templates, request, "login.html", {}, cache_control="no-cache")
 
 @app.get("/logout")
 async def logout():
     response = RedirectResponse(url="/", status_code=302)
-    response.delete_cookie(key="user_info")
+    response.delete_cookie(key=SESSION_COOKIE)
     return response
 
 @app.post("/login")
-async def login(login_request: LoginRequest):
-    print(f"Login attempt with user_id: {login_request.user_id}")  # Debug log
-    conn = get_account_db()
-    cursor = conn.cursor()
+async def login(login_request: LoginRequest, store: Storage = Depends(get_storage)):
+    logger.debug("giriş denemesi: user_id=%s", login_request.user_id)
     try:
-        cursor.execute("SELECT id, name, balance FROM accounts WHERE id = ?", (login_request.user_id,))
-        user = cursor.fetchone()
-        print(f"Database query result: {user}")  # Debug log
+        user = await store.get_account(login_request.user_id)
+        logger.debug("giriş: user_id=%s bulundu=%s", login_request.user_id, user is not None)
         if user:
             from fastapi.responses import JSONResponse
             response = JSONResponse(content={
@@ -417,54 +630,41 @@ async def login(login_request: LoginRequest):
                 "redirect_url": "/dashboard",
                 "user_id": user[0],
                 "user_name": user[1],
-                "balance": user[2]
+                "balance": user[4]
             })
-            response.set_cookie(
-                key="user_info",
-                value=f"{user[0]}:{user[1]}:{user[2]}",
-                max_age=3600,
-                httponly=True
-            )
+            set_session_cookie(response, user[0])
             return response
         else:
             raise HTTPException(status_code=404, detail=f"ID: {login_request.user_id} olan kullanıcı bulunamadı")
     except Exception as e:
-        print(f"Login error: {str(e)}")  # Debug log
+        logger.warning("giriş hatası: user_id=%s: %s", login_request.user_id, e)
         raise HTTPException(status_code=500, detail=f"Giriş işlemi sırasında hata: {str(e)}")
-    finally:
-        conn.close()
 
 @app.get("/dashboard", response_class=HTMLResponse)
-async def dashboard(request: Request):
-    user_info = request.cookies.get("user_info")
-    if not user_info:
+async def dashboard(
+    request: Request,
+    session: Optional[Session] = Depends(get_session),
+    store: Storage = Depends(get_storage)
+):
+    if session is None:
         return RedirectResponse(url="/")
-        
-    user_id, user_name, balance = user_info.split(":")
-    return templates.TemplateResponse(
-        "index.html",
-        {
-            "request": request,
-            "user_name": user_name,
-            "balance": float(balance)
-        }
-    )
+    account = await store.get_account(session.user_id)
+    if account is None:
+        return RedirectResponse(url="/")
+    return render_page(templates, request, "index.html", {"user_name": account[1], "balance": account[4]})
 
 @app.get("/send-money", response_class=HTMLResponse)
-async def send_money(request: Request):
-    user_info = request.cookies.get("user_info")
-    if not user_info:
+async def send_money(
+    request: Request,
+    session: Optional[Session] = Depends(get_session),
+    store: Storage = Depends(get_storage)
+):
+    if session is None:
         return RedirectResponse(url="/")
-        
-    user_id, user_name, balance = user_info.split(":")
-    return templates.TemplateResponse(
-        "send-money.html",
-        {
-            "request": request,
-            "user_name": user_name,
-            "balance": float(balance)
-        }
-    )
+    account = await store.get_account(session.user_id)
+    if account is None:
+        return RedirectResponse(url="/")
+    return render_page(templates, request, "send-money.html", {"user_name": account[1], "balance": account[4]})
 
 @app.post(
     "/transfers/",
@@ -472,83 +672,754 @@ async def send_money(request: Request):
     summary="Para transferi yap",
     description="Bir hesaptan diğerine para transferi gerçekleştirir"
 )
-async def create_transfer(transfer: TransferCreate):
-    conn = get_account_db()
-    cursor = conn.cursor()
+async def create_transfer(transfer: TransferCreate, store: Storage = Depends(get_storage)):
     try:
-        # İlk olarak gönderen hesabı kontrol et
-        cursor.execute("SELECT balance FROM accounts WHERE id = ?", (transfer.from_account_id,))
-        sender = cursor.fetchone()
-        if not sender:
-            raise HTTPException(status_code=404, detail="Gönderen hesap bulunamadı")
-        
-        # Alıcı hesabı kontrol et
-        cursor.execute("SELECT id FROM accounts WHERE id = ?", (transfer.to_account_id,))
-        if not cursor.fetchone():
-            raise HTTPException(status_code=404, detail="Alıcı hesap bulunamadı")
-
-        # Bakiye kontrolü
-        if sender[0] < transfer.amount:
-            raise HTTPException(status_code=400, detail="Yetersiz bakiye")
-
-        # Transfer işlemleri
-        cursor.execute(
-            "UPDATE accounts SET balance = balance - ? WHERE id = ?",
-            (transfer.amount, transfer.from_account_id)
+        transfer_id, _, created_at = await store.transfer(
+            transfer.from_account_id, transfer.to_account_id, transfer.amount
         )
-        cursor.execute(
-            "UPDATE accounts SET balance = balance + ? WHERE id = ?",
-            (transfer.amount, transfer.to_account_id)
+    except sqlite3.Error as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    return TransferResponse(
+        id=transfer_id,
+        from_account_id=transfer.from_account_id,
+        to_account_id=transfer.to_account_id,
+        amount=transfer.amount,
+        created_at=created_at
+    )
+
+# Ödeme, cashback, QR, bölüşme, bütçe, toplu transfer, tohum ve dışa aktarım
+# uç noktaları doğrudan SQLite havuzu ve ledger yazıcısı üzerinde çalışır;
+# başka arka uçta bakiyeler iki veritabanına bölünmesin diye reddedilir
+def require_sqlite(store: Storage = Depends(get_storage)):
+    if store.stats().get("backend") != "sqlite":
+        raise HTTPException(status_code=400, detail="Bu işlem yalnızca SQLite arka ucunda desteklenir")
+
+# İşletme ödemeleri
+class PaymentRequest(BaseModel):
+    merchant_id: int = Field(..., description="İşletme ID")
+    amount: int = Field(..., gt=0, le=MAX_AMOUNT, description="Ödeme tutarı (kuruş)")
+
+class PaymentResponse(PaymentRequest):
+    id: int = Field(..., description="Ödeme ID")
+    account_id: int = Field(..., description="Ödeyen hesap ID")
+    category: str = Field(..., description="İşletme kategorisi")
+    new_balance: int = Field(..., description="Yeni bakiye (kuruş)")
+    created_at: datetime
+    budget_alerts: List[int] = Field(default_factory=list, description="Bu ödemeyle geçilen bütçe eşikleri (%)")
+    cashback: int = Field(0, description="Cüzdana yansıyan iade (kuruş)")
+
+async def fetch_merchant_category(merchant_id: int):
+    row = await storage.get_merchant(merchant_id)
+    if row is None:
+        raise HTTPException(status_code=404, detail="İşletme bulunamadı")
+    return row[2]
+
+@app.post(
+    "/payments/",
+    dependencies=[Depends(require_sqlite)],
+    response_model=PaymentResponse,
+    summary="İşletmeye ödeme yap",
+    description="Oturumdaki hesaptan işletmeye ödeme yapar, aylık kategori harcamasını günceller ve geçilen bütçe eşiklerini döndürür"
+)
+async def create_payment(payment: PaymentRequest, session: Session = Depends(require_session)):
+    category = await fetch_merchant_category(payment.merchant_id)
+    try:
+        result = await ledger.payment(session.user_id, payment.merchant_id, category, payment.amount)
+    except sqlite3.Error as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    return PaymentResponse(
+        id=result.payment_id,
+        account_id=session.user_id,
+        merchant_id=payment.merchant_id,
+        amount=payment.amount,
+        category=category,
+        new_balance=result.new_balance,
+        created_at=result.created_at,
+        budget_alerts=result.budget_alerts,
+        cashback=result.cashback
+    )
+
+# Cashback kampanyaları
+class CampaignBase(BaseModel):
+    name: str = Field(..., description="Kampanya adı")
+    kind: str = Field(..., pattern="^(percent|fixed)$", description="percent: yüzde iade, fixed: sabit iade")
+    value: float = Field(..., gt=0, le=MAX_AMOUNT, description="percent için yüzde, fixed için kuruş tutarı")
+    category: Optional[str] = Field(None, description="Yalnızca bu kategorideki ödemeler")
+    merchant_id: Optional[int] = Field(None, description="Yalnızca bu işletmedeki ödemeler")
+    channel: Optional[str] = Field(None, pattern="^(qr|direct)$", description="Yalnızca bu kanaldaki ödemeler")
+    first_payment_only: bool = Field(False, description="Kullanıcı başına yalnızca ilk ödemede")
+    max_amount: Optional[int] = Field(None, gt=0, le=MAX_AMOUNT, description="Ödeme başına en yüksek iade (kuruş)")
+
+class CampaignResponse(CampaignBase):
+    id: int = Field(..., description="Kampanya ID")
+
+@app.get(
+    "/cashback/campaigns",
+    dependencies=[Depends(require_sqlite)],
+    response_model=List[CampaignResponse],
+    summary="Aktif cashback kampanyalarını listele"
+)
+async def list_campaigns(db: Database = Depends(get_db)):
+    campaigns = await db.run(load_campaigns)
+    return [CampaignResponse(**campaign.__dict__) for campaign in campaigns]
+
+@app.post(
+    "/cashback/campaigns",
+    dependencies=[Depends(require_sqlite)],
+    response_model=CampaignResponse,
+    summary="Cashback kampanyası ekle",
+    description="Yeni kampanya ekler ve ledger'ın derlenmiş kural indeksini yeniler"
+)
+async def add_campaign(campaign: CampaignBase, db: Database = Depends(get_db)):
+    if campaign.category is not None and campaign.category not in CATEGORIES:
+        raise HTTPException(
+            status_code=400,
+            detail="Geçersiz kategori. Geçerli kategoriler: cafe, market, transport, other"
         )
-        
-        # Transfer kaydını oluştur
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS transfers (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                from_account_id INTEGER,
-                to_account_id INTEGER,
-                amount REAL,
-                created_at TEXT,
-                FOREIGN KEY (from_account_id) REFERENCES accounts (id),
-                FOREIGN KEY (to_account_id) REFERENCES accounts (id)
-            )
-        """)
-        
+    if campaign.merchant_id is not None:
+        await fetch_merchant_category(campaign.merchant_id)
+
+    def _insert(conn):
+        cursor = conn.execute(
+            "INSERT INTO cashback_campaigns (name, kind, value, category, merchant_id, channel, first_payment_only, max_amount) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (campaign.name, campaign.kind, campaign.value, campaign.category, campaign.merchant_id,
+             campaign.channel, int(campaign.first_payment_only), campaign.max_amount)
+        )
+        conn.commit()
+        return cursor.lastrowid, load_campaigns(conn)
+
+    campaign_id, campaigns = await db.run(_insert)
+    # Yeni indeks tek atamayla devreye girer; yazıcı bir sonraki ödemede kullanır
+    ledger.rules = CompiledRules(campaigns)
+    return CampaignResponse(id=campaign_id, **campaign.model_dump())
+
+# QR ödeme istekleri
+class QRIntentRequest(BaseModel):
+    merchant_id: int = Field(..., description="İşletme ID")
+    amount: int = Field(..., gt=0, le=MAX_AMOUNT, description="Ödeme tutarı (kuruş)")
+    ttl_seconds: Optional[int] = Field(None, gt=0, le=3600, description="Geçerlilik süresi (saniye)")
+
+class QRIntentResponse(BaseModel):
+    id: str = Field(..., description="Ödeme isteği ID")
+    merchant_id: int
+    category: str
+    amount: int
+    status: str = Field(..., description="pending, processing veya paid")
+    qr_payload: str = Field(..., description="QR koda yazılacak içerik")
+    created_at: datetime
+    expires_at: datetime
+    payment_id: Optional[int] = None
+
+def _intent_response(intent):
+    return QRIntentResponse(
+        id=intent.id,
+        merchant_id=intent.merchant_id,
+        category=intent.category,
+        amount=intent.amount,
+        status=intent.status,
+        qr_payload=intent.qr_payload,
+        created_at=intent.created_at,
+        expires_at=intent.expires_at,
+        payment_id=intent.payment_id
+    )
+
+def _qr_payment_response(intent, account_id, result):
+    return PaymentResponse(
+        id=result.payment_id,
+        account_id=account_id,
+        merchant_id=intent.merchant_id,
+        amount=intent.amount,
+        category=intent.category,
+        new_balance=result.new_balance,
+        created_at=result.created_at,
+        budget_alerts=result.budget_alerts,
+        cashback=result.cashback
+    )
+
+@app.post(
+    "/qr/intents",
+    dependencies=[Depends(require_sqlite)],
+    response_model=QRIntentResponse,
+    summary="QR ödeme isteği oluştur",
+    description="İşletme için süreli bir ödeme isteği oluşturur; işletme ve kategori bu aşamada doğrulanır"
+)
+async def create_qr_intent(request: QRIntentRequest):
+    category = await fetch_merchant_category(request.merchant_id)
+    intent = intent_store.create(request.merchant_id, category, request.amount, request.ttl_seconds)
+    return _intent_response(intent)
+
+@app.get(
+    "/qr/intents/{intent_id}",
+    dependencies=[Depends(require_sqlite)],
+    response_model=QRIntentResponse,
+    summary="QR ödeme isteğini görüntüle"
+)
+async def get_qr_intent(intent_id: str = Path(..., description="Ödeme isteği ID")):
+    intent = intent_store.get(intent_id)
+    if intent is None:
+        raise HTTPException(status_code=404, detail="Ödeme isteği bulunamadı veya süresi doldu")
+    return _intent_response(intent)
+
+@app.post(
+    "/qr/intents/{intent_id}/confirm",
+    dependencies=[Depends(require_sqlite)],
+    response_model=PaymentResponse,
+    summary="QR ödemesini onayla",
+    description="Ödeme isteğini oturumdaki hesaptan öder. Aynı Idempotency-Key ile tekrarlanan istekler "
+                "yeniden borçlandırılmaz, ilk ödemenin sonucunu döndürür."
+)
+async def confirm_qr_intent(
+    intent_id: str = Path(..., description="Ödeme isteği ID"),
+    idempotency_key: str = Header(..., alias="Idempotency-Key", min_length=8, max_length=128),
+    session: Session = Depends(require_session)
+):
+    intent = intent_store.get(intent_id)
+    if intent is None or intent.status != PENDING:
+        # Tekrar deneme: anahtar bu istek için tamamlandıysa kayıtlı sonucu döndür
+        stored = await database.run(fetch_idempotent_result, idempotency_key)
+        if stored is not None:
+            reference, account_id, response = stored
+            if reference != intent_id or account_id != session.user_id:
+                raise HTTPException(status_code=409, detail="Idempotency-Key başka bir istek için kullanılmış")
+            result = PaymentResult.from_json(response)
+            if intent is None:
+                raise HTTPException(status_code=410, detail="Ödeme isteğinin süresi doldu")
+            return _qr_payment_response(intent, session.user_id, result)
+        if intent is None:
+            raise HTTPException(status_code=404, detail="Ödeme isteği bulunamadı veya süresi doldu")
+        if intent.status == PROCESSING:
+            raise HTTPException(status_code=409, detail="Ödeme işleniyor, lütfen tekrar deneyin")
+        raise HTTPException(status_code=409, detail="Ödeme isteği zaten ödendi")
+
+    # Durum değişimi await'ten önce yapılır; aynı isteğe eşzamanlı ikinci onay 409 alır
+    intent.status = PROCESSING
+    try:
+        result = await ledger.payment(
+            session.user_id, intent.merchant_id, intent.category, intent.amount,
+            channel="qr", idempotency_key=idempotency_key, reference=intent_id
+        )
+    except BaseException:
+        intent.status = PENDING
+        raise
+    intent.status = PAID
+    intent.payment_id = result.payment_id
+    return _qr_payment_response(intent, session.user_id, result)
+
+# Hesap bölüşme (split)
+class SplitGroupRequest(BaseModel):
+    name: str = Field(..., description="Grup adı")
+    member_ids: List[int] = Field(..., min_length=2, max_length=1000, description="Üye hesap ID'leri")
+
+class SplitGroupResponse(BaseModel):
+    id: int = Field(..., description="Grup ID")
+    name: str
+    member_ids: List[int]
+    created_at: datetime
+
+class SplitExpenseRequest(BaseModel):
+    amount: int = Field(..., gt=0, le=MAX_AMOUNT, description="Harcama tutarı (kuruş)")
+    description: Optional[str] = Field(None, description="Açıklama")
+    participants: Optional[List[int]] = Field(None, description="Bölüşülecek üyeler (boşsa tüm grup)")
+    weights: Optional[List[float]] = Field(None, description="Ağırlıklı bölüşüm için katılımcı sırasıyla ağırlıklar")
+
+class SplitExpenseResponse(BaseModel):
+    id: int = Field(..., description="Harcama ID")
+    group_id: int
+    payer_id: int
+    amount: int
+    shares: dict = Field(..., description="Hesap ID → pay (kuruş)")
+    created_at: datetime
+
+class SplitDebt(BaseModel):
+    from_account_id: int = Field(..., description="Borçlu")
+    to_account_id: int = Field(..., description="Alacaklı")
+    amount: int = Field(..., description="Tutar (kuruş)")
+
+class SplitBalances(BaseModel):
+    group_id: int
+    balances: dict = Field(..., description="Hesap ID → net bakiye, kuruş (pozitif: alacaklı)")
+    debts: List[SplitDebt] = Field(..., description="Açık borçlar")
+    settlement: List[SplitDebt] = Field(..., description="Önerilen en az transferli hesaplaşma")
+
+class SplitSettlement(SplitDebt):
+    transfer_id: int
+
+async def fetch_split_members(db: Database, group_id: int):
+    members = await db.run(
+        lambda conn: [row[0] for row in conn.execute(
+            "SELECT account_id FROM split_members WHERE group_id = ? ORDER BY account_id", (group_id,)
+        )]
+    )
+    if not members:
+        raise HTTPException(status_code=404, detail="Grup bulunamadı")
+    return members
+
+def require_split_member(members, session: Session):
+    if session.user_id not in members:
+        raise HTTPException(status_code=403, detail="Bu grubun üyesi değilsiniz")
+
+@app.post(
+    "/splits/groups",
+    dependencies=[Depends(require_sqlite)],
+    response_model=SplitGroupResponse,
+    summary="Bölüşme grubu oluştur",
+    description="Oturumdaki hesap grubun üyelerinden biri olmalıdır"
+)
+async def create_split_group(
+    group: SplitGroupRequest,
+    db: Database = Depends(get_db),
+    session: Session = Depends(require_session)
+):
+    member_ids = sorted(set(group.member_ids))
+    require_split_member(member_ids, session)
+
+    def _create(conn):
+        found = conn.execute(
+            f"SELECT COUNT(*) FROM accounts WHERE id IN ({','.join('?' * len(member_ids))})", member_ids
+        ).fetchone()[0]
+        if found != len(member_ids):
+            return None
         created_at = datetime.now()
-        cursor.execute(
-            "INSERT INTO transfers (from_account_id, to_account_id, amount, created_at) VALUES (?, ?, ?, ?)",
-            (transfer.from_account_id, transfer.to_account_id, transfer.amount, created_at.isoformat())
+        cursor = conn.execute(
+            "INSERT INTO split_groups (name, created_at) VALUES (?, ?)", (group.name, created_at.isoformat())
+        )
+        group_id = cursor.lastrowid
+        conn.executemany(
+            "INSERT INTO split_members (group_id, account_id) VALUES (?, ?)",
+            [(group_id, account_id) for account_id in member_ids]
         )
-        
         conn.commit()
-        return TransferResponse(
-            id=cursor.lastrowid,
-            from_account_id=transfer.from_account_id,
-            to_account_id=transfer.to_account_id,
-            amount=transfer.amount,
-            created_at=created_at
+        return group_id, created_at
+
+    created = await db.run(_create)
+    if created is None:
+        raise HTTPException(status_code=404, detail="Üyelerden biri veya birkaçı bulunamadı")
+    group_id, created_at = created
+    return SplitGroupResponse(id=group_id, name=group.name, member_ids=member_ids, created_at=created_at)
+
+@app.post(
+    "/splits/groups/{group_id}/expenses",
+    dependencies=[Depends(require_sqlite)],
+    response_model=SplitExpenseResponse,
+    summary="Harcamayı bölüş",
+    description="Oturumdaki hesabın ödediği harcamayı katılımcılara eşit ya da ağırlıklı böler "
+                "ve payları ödeyene borç olarak yazar"
+)
+async def add_split_expense(
+    expense: SplitExpenseRequest,
+    group_id: int = Path(..., description="Grup ID"),
+    db: Database = Depends(get_db),
+    session: Session = Depends(require_session)
+):
+    members = set(await fetch_split_members(db, group_id))
+    require_split_member(members, session)
+    payer_id = session.user_id
+    participants = expense.participants or sorted(members)
+    if not members.issuperset(participants):
+        raise HTTPException(status_code=400, detail="Katılımcılar grubun üyesi olmalıdır")
+    if len(set(participants)) != len(participants):
+        raise HTTPException(status_code=400, detail="Katılımcılar tekrar edemez")
+    if expense.weights is not None and (
+        len(expense.weights) != len(participants) or any(w <= 0 for w in expense.weights)
+    ):
+        raise HTTPException(status_code=400, detail="Her katılımcı için pozitif bir ağırlık girilmelidir")
+
+    shares = split_shares(expense.amount, participants, expense.weights)
+
+    def _record(conn):
+        created_at = datetime.now()
+        cursor = conn.execute(
+            "INSERT INTO split_expenses (group_id, payer_id, amount, description, created_at) VALUES (?, ?, ?, ?, ?)",
+            (group_id, payer_id, expense.amount, expense.description, created_at.isoformat())
         )
+        expense_id = cursor.lastrowid
+        record_expense(cursor, group_id, payer_id, shares)
+        conn.commit()
+        return expense_id, created_at
+
+    expense_id, created_at = await db.run(_record)
+    return SplitExpenseResponse(
+        id=expense_id,
+        group_id=group_id,
+        payer_id=payer_id,
+        amount=expense.amount,
+        shares={account_id: share for account_id, share in shares},
+        created_at=created_at
+    )
+
+@app.get(
+    "/splits/groups/{group_id}/balances",
+    dependencies=[Depends(require_sqlite)],
+    response_model=SplitBalances,
+    summary="Alacak/verecek durumu",
+    description="Net bakiyeleri, açık borçları ve en az transferli hesaplaşma planını döndürür"
+)
+async def get_split_balances(
+    group_id: int = Path(..., description="Grup ID"),
+    db: Database = Depends(get_db)
+):
+    members = await fetch_split_members(db, group_id)
+
+    def _read(conn):
+        return net_balances(conn, group_id), split_debts(conn, group_id), settlement_plan(conn, group_id)
+
+    balances, open_debts, plan = await db.run(_read)
+    return SplitBalances(
+        group_id=group_id,
+        balances={account_id: balances.get(account_id, 0) for account_id in members},
+        debts=[SplitDebt(from_account_id=a, to_account_id=b, amount=amount) for a, b, amount in open_debts],
+        settlement=[SplitDebt(from_account_id=a, to_account_id=b, amount=amount) for a, b, amount in plan]
+    )
+
+@app.post(
+    "/splits/groups/{group_id}/settle",
+    dependencies=[Depends(require_sqlite)],
+    response_model=List[SplitSettlement],
+    summary="Grubu hesaplaş",
+    description="Borçları sadeleştirip en fazla N-1 transferi tek bir ledger işleminde uygular; "
+                "bir transfer bile başarısız olursa hiçbir bakiye değişmez; yalnızca grup üyeleri tetikleyebilir"
+)
+async def settle_split_group(
+    group_id: int = Path(..., description="Grup ID"),
+    db: Database = Depends(get_db),
+    session: Session = Depends(require_session)
+):
+    require_split_member(await fetch_split_members(db, group_id), session)
+    transfers = await ledger.settle_split(group_id)
+    return [
+        SplitSettlement(transfer_id=transfer_id, from_account_id=from_id, to_account_id=to_id, amount=amount)
+        for transfer_id, from_id, to_id, amount in transfers
+    ]
+
+# Bütçe modelleri
+class BudgetRequest(BaseModel):
+    monthly_limit: int = Field(..., gt=0, le=MAX_AMOUNT, description="Aylık bütçe limiti (kuruş)")
+
+class BudgetStatus(BaseModel):
+    category: str
+    monthly_limit: int
+    spent: int = Field(..., description="Seçilen ayda harcanan (kuruş)")
+    ratio: float = Field(..., description="Harcanan / limit")
+    alert_level: Optional[int] = Field(None, description="Ulaşılan eşik (%80 veya %100)")
+
+def _budget_status(row):
+    category, monthly_limit, spent = row
+    return BudgetStatus(
+        category=category,
+        monthly_limit=monthly_limit,
+        spent=spent,
+        ratio=round(spent / monthly_limit, 4),
+        alert_level=alert_level(spent, monthly_limit)
+    )
+
+@app.put(
+    "/accounts/{account_id}/budgets/{category}",
+    dependencies=[Depends(require_sqlite)],
+    response_model=BudgetStatus,
+    summary="Kategori bütçesi tanımla",
+    description="Hesap için aylık kategori bütçesi tanımlar veya günceller"
+)
+async def set_budget(
+    budget: BudgetRequest,
+    account_id: int = Path(..., description="Hesap ID"),
+    category: str = Path(..., description="Kategori (cafe, market, transport, other)"),
+    db: Database = Depends(get_db)
+):
+    if category not in CATEGORIES:
+        raise HTTPException(
+            status_code=400,
+            detail="Geçersiz kategori. Geçerli kategoriler: cafe, market, transport, other"
+        )
+    if await storage.get_account(account_id) is None:
+        raise HTTPException(status_code=404, detail="Hesap bulunamadı")
+
+    def _upsert(conn):
+        conn.execute("""
+            INSERT INTO budgets (account_id, category, monthly_limit) VALUES (?, ?, ?)
+            ON CONFLICT (account_id, category) DO UPDATE SET monthly_limit = excluded.monthly_limit
+        """, (account_id, category, budget.monthly_limit))
+        conn.commit()
+        return [row for row in budget_status(conn, account_id, month_key()) if row[0] == category][0]
+
+    return _budget_status(await db.run(_upsert))
+
+@app.get(
+    "/accounts/{account_id}/budgets",
+    dependencies=[Depends(require_sqlite)],
+    response_model=List[BudgetStatus],
+    summary="Bütçe durumunu getir",
+    description="Hesabın kategori bütçelerini ve seçilen aydaki (varsayılan: bu ay) harcamalarını listeler"
+)
+async def get_budgets(
+    account_id: int = Path(..., description="Hesap ID"),
+    month: Optional[str] = Query(None, pattern=r"^\d{4}-\d{2}$", description="YYYY-MM"),
+    db: Database = Depends(get_db)
+):
+    rows = await db.run(budget_status, account_id, month or month_key())
+    return [_budget_status(row) for row in rows]
+
+@app.get(
+    "/accounts/{account_id}/budgets/alerts",
+    dependencies=[Depends(require_sqlite)],
+    response_model=List[BudgetStatus],
+    summary="Bütçe uyarılarını getir",
+    description="%80 veya %100 eşiğini geçmiş kategori bütçelerini listeler"
+)
+async def get_budget_alerts(
+    account_id: int = Path(..., description="Hesap ID"),
+    month: Optional[str] = Query(None, pattern=r"^\d{4}-\d{2}$", description="YYYY-MM"),
+    db: Database = Depends(get_db)
+):
+    rows = await db.run(budget_status, account_id, month or month_key())
+    return [status for status in map(_budget_status, rows) if status.alert_level]
+
+# Toplu transfer (bordro, iade vb.) modelleri
+BULK_CHUNK_SIZE = 1000
+
+# Gönderen her zaman oturumdaki hesaptır
+class BulkTransferItem(BaseModel):
+    to_account_id: int = Field(..., description="Alıcı hesap ID")
+    amount: int = Field(..., gt=0, le=MAX_AMOUNT, description="Transfer miktarı (kuruş)")
+
+class BulkTransferRequest(BaseModel):
+    transfers: List[BulkTransferItem] = Field(..., min_length=1, max_length=10000, description="Transfer listesi")
+    mode: str = Field("best_effort", pattern="^(atomic|best_effort)$", description="atomic: hepsi ya da hiçbiri, best_effort: geçerli olanları uygula")
+
+class BulkTransferItemResult(BaseModel):
+    index: int = Field(..., description="İstekteki sıra numarası")
+    success: bool
+    transfer_id: Optional[int] = None
+    error: Optional[str] = None
+
+class BulkTransferResponse(BaseModel):
+    mode: str
+    accepted: int
+    rejected: int
+    results: List[BulkTransferItemResult]
+
+def _bulk_response(mode, results):
+    results.sort(key=lambda r: r.index)
+    accepted = sum(1 for r in results if r.success)
+    return BulkTransferResponse(mode=mode, accepted=accepted, rejected=len(results) - accepted, results=results)
+
+async def _apply_bulk(indexed_items, atomic, results):
+    """(sıra, (gönderen, alıcı, tutar)) listesini ledger'a gönder ve sonuçları ekle"""
+    outcomes = await ledger.bulk_transfer([item for _, item in indexed_items], atomic=atomic)
+    for (index, _), (transfer_id, error) in zip(indexed_items, outcomes):
+        results.append(BulkTransferItemResult(
+            index=index, success=transfer_id is not None, transfer_id=transfer_id, error=error
+        ))
+
+@app.post(
+    "/transfers/bulk",
+    dependencies=[Depends(require_sqlite)],
+    response_model=BulkTransferResponse,
+    summary="Toplu transfer yap",
+    description="Oturumdaki hesaptan binlerce transferi tek istekte, parça parça (chunk) işlemlerle uygular ve her öğe için sonuç döndürür"
+)
+async def create_bulk_transfer(bulk: BulkTransferRequest, session: Session = Depends(require_session)):
+    atomic = bulk.mode == "atomic"
+    items = list(enumerate((session.user_id, t.to_account_id, t.amount) for t in bulk.transfers))
+    results = []
+    try:
+        if atomic:
+            await _apply_bulk(items, True, results)
+        else:
+            for offset in range(0, len(items), BULK_CHUNK_SIZE):
+                await _apply_bulk(items[offset:offset + BULK_CHUNK_SIZE], False, results)
+    except sqlite3.Error as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    return _bulk_response(bulk.mode, results)
+
+async def _iter_upload_lines(request: Request):
+    """İstek gövdesini belleğe almadan satır satır oku"""
+    buffer = b""
+    async for chunk in request.stream():
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            if line.strip():
+                yield line.decode("utf-8").strip()
+    if buffer.strip():
+        yield buffer.decode("utf-8").strip()
+
+@app.post(
+    "/transfers/bulk/upload",
+    dependencies=[Depends(require_sqlite)],
+    response_model=BulkTransferResponse,
+    summary="Toplu transfer dosyası yükle",
+    description="NDJSON (her satır bir BulkTransferItem) veya başlıklı CSV (to_account_id,amount) gövdeyi "
+                "akış halinde işler; gönderen oturumdaki hesaptır"
+)
+async def upload_bulk_transfer(
+    request: Request,
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$", description="Gövde formatı"),
+    mode: str = Query("best_effort", pattern="^(atomic|best_effort)$", description="atomic veya best_effort"),
+    session: Session = Depends(require_session)
+):
+    atomic = mode == "atomic"
+    results = []
+    pending = []
+    header = None
+    index = 0
+    try:
+        async for line in _iter_upload_lines(request):
+            if format == "csv":
+                values = next(csv.reader([line]))
+                if header is None:
+                    header = [v.strip() for v in values]
+                    continue
+                record = dict(zip(header, values))
+            try:
+                if format == "ndjson":
+                    record = json.loads(line)
+                transfer = BulkTransferItem(**record)
+            except (ValueError, TypeError, ValidationError):
+                results.append(BulkTransferItemResult(index=index, success=False, error="Geçersiz satır"))
+            else:
+                pending.append((index, (session.user_id, transfer.to_account_id, transfer.amount)))
+            index += 1
+
+            # best_effort modunda her parça ayrı bir işlemde uygulanır
+            if not atomic and len(pending) >= BULK_CHUNK_SIZE:
+                await _apply_bulk(pending, False, results)
+                pending = []
+
+        if atomic and len(results):
+            # Geçersiz satır varsa hiçbir transfer uygulanmaz
+            results.extend(
+                BulkTransferItemResult(index=i, success=False, error="İşlem geri alındı") for i, _ in pending
+            )
+        elif pending:
+            await _apply_bulk(pending, atomic, results)
     except sqlite3.Error as e:
-        conn.rollback()
         raise HTTPException(status_code=500, detail=str(e))
+    return _bulk_response(mode, results)
+
+# CSV tohumları (tablo tanımları ve modelleri seed.py'de)
+SEED_CHUNK_SIZE = 20000
+
+@app.post(
+    "/debug/seed/{table}",
+    dependencies=[Depends(require_sqlite)],
+    summary="CSV tohum yükle",
+    description="Başlıklı CSV gövdeyi akış halinde doğrulayıp toplu yazar (yalnızca SQLite); geçmiş transferler bakiyeleri değiştirmez"
+)
+async def load_seed(
+    request: Request,
+    table: str = Path(..., pattern="^(accounts|merchants|transfers)$", description="Hedef tablo"),
+    keep_indexes: bool = Query(False, description="İndeksleri yükleme sırasında düşürme")
+):
+    conn = await run_in_threadpool(seed.connect)
+    loader = seed.SeedLoader(conn, seed.SEED_TABLES[table], defer_indexes=not keep_indexes)
+    try:
+        await run_in_threadpool(loader.start)
+        # Parça tamamen tamponlandıktan sonra yazılır; gövde beklenirken yazma kilidi tutulmaz
+        lines = []
+        async for line in _iter_upload_lines(request):
+            lines.append(line)
+            if len(lines) >= SEED_CHUNK_SIZE:
+                await run_in_threadpool(loader.load, list(csv.reader(lines)))
+                lines = []
+        if lines:
+            await run_in_threadpool(loader.load, list(csv.reader(lines)))
+        report = await run_in_threadpool(loader.finish)
+        if table == "accounts":
+            await storage.reload_phones()
+        return report
+    except BaseException:
+        await run_in_threadpool(loader.abort)
+        raise
     finally:
         conn.close()
 
+def _merchant_dict(row):
+    return {"id": row[0], "name": row[1], "category": row[2]}
+
 @app.get(
     "/merchants/",
     response_model=List[MerchantResponse],
-    summary="Tüm işletmeleri listele",
-    description="Sistemdeki tüm işletmeleri listeler"
+    summary="İşletmeleri listele",
+    description="İşletmeleri ID sırasına göre sayfalı (limit/after) veya akış olarak (stream) listeler"
 )
-async def list_merchants():
-    conn = get_merchant_db()
-    cursor = conn.cursor()
+async def list_merchants(
+    response: Response,
+    limit: int = Query(100, ge=1, le=1000, description="Sayfa başına kayıt sayısı"),
+    after: int = Query(0, ge=0, description="Bu ID'den sonraki kayıtlar (X-Next-Cursor değeri)"),
+    stream: Optional[str] = Query(None, pattern="^(ndjson|json)$", description="Tüm kayıtları akış olarak döndür (ndjson veya json)"),
+    store: Storage = Depends(get_storage)
+):
+    if stream:
+        return stream_rows(store.iter_merchants(after), _merchant_dict, stream)
+
+    rows = await store.list_merchants(after, limit)
+    if len(rows) == limit:
+        response.headers["X-Next-Cursor"] = str(rows[-1][0])
+    return [
+        MerchantResponse(id=row[0], name=row[1], category=row[2])
+        for row in rows
+    ]
+
+# Ekstre ve rapor dışa aktarımı: işler API süreçlerinden ayrı bir süreçte çalışır
+class ExportRequest(BaseModel):
+    report: str = Field(..., pattern="^(transfers|statement|settlement)$",
+                        description="transfers, statement (hesap ekstresi) veya settlement (işletme ödemeleri)")
+    format: str = Field("csv", pattern="^(csv|parquet)$", description="Çıktı biçimi")
+    after_id: int = Field(0, ge=0, description="Bu ID'den sonraki satırlar (artımlı dışa aktarımda önceki işin last_id değeri)")
+    account_id: Optional[int] = Field(None, description="Ekstresi alınacak hesap ID (statement için zorunlu)")
+    merchant_id: Optional[int] = Field(None, description="İşletme ID (settlement; boşsa tüm işletmeler)")
+    month: Optional[str] = Field(None, pattern=r"^\d{4}-\d{2}$", description="Yalnızca bu ay (YYYY-MM)")
+
+class ExportJobResponse(BaseModel):
+    id: str = Field(..., description="İş ID")
+    report: str
+    format: str
+    status: str = Field(..., description="queued, running, done veya failed")
+    after_id: int
+    last_id: Optional[int] = Field(None, description="Dışa aktarılan son satır ID'si; sonraki artımlı işin after_id değeri")
+    rows: Optional[int] = Field(None, description="Yazılan satır sayısı")
+    error: Optional[str] = None
+    created_at: datetime
+    finished_at: Optional[datetime] = None
+    download_url: Optional[str] = None
+
+def _export_job_response(job):
+    return ExportJobResponse(
+        id=job.id, report=job.report, format=job.format, status=job.status, after_id=job.after_id,
+        last_id=job.last_id, rows=job.rows, error=job.error, created_at=job.created_at,
+        finished_at=job.finished_at, download_url=f"/exports/{job.id}/download" if job.status == DONE else None
+    )
+
+def _get_export_job(job_id: str):
+    job = export_worker.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Dışa aktarım işi bulunamadı")
+    return job
+
+@app.post(
+    "/exports",
+    dependencies=[Depends(require_sqlite)],
+    response_model=ExportJobResponse,
+    status_code=202,
+    summary="Dışa aktarım başlat",
+    description="Transfer, hesap ekstresi veya işletme mutabakat raporunu arka planda CSV/Parquet olarak üretir (yalnızca SQLite)"
+)
+async def create_export(request: ExportRequest):
+    filters = {"account_id": request.account_id, "merchant_id": request.merchant_id, "month": request.month}
     try:
-        cursor.execute("SELECT * FROM merchants")
-        rows = cursor.fetchall()
-        return [
-            MerchantResponse(id=row[0], name=row[1], category=row[2])
-            for row in rows
-        ]
-    finally:
-        conn.close()
+        job = export_worker.submit(request.report, request.format, request.after_id, **filters)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return _export_job_response(job)
+
+@app.get("/exports/{job_id}", response_model=ExportJobResponse, summary="Dışa aktarım durumu")
+async def get_export(job_id: str = Path(..., description="İş ID")):
+    return _export_job_response(_get_export_job(job_id))
+
+@app.get("/exports/{job_id}/download", summary="Dışa aktarım dosyasını indir")
+async def download_export(job_id: str = Path(..., description="İş ID")):
+    job = _get_export_job(job_id)
+    if job.status != DONE:
+        raise HTTPException(status_code=409, detail=f"Dışa aktarım henüz hazır değil ({job.status})")
+    return FileResponse(job.path, media_type=MEDIA_TYPES[job.format], filename=job.filename)
@@ -0,0 +1,41 @@
+"""Event loop'u bloklamayan kuyruklu logger.
+
+Uygulama kodu `logger` üzerinden log yazar; kayıtlar `QueueHandler` ile bir
+kuyruğa eklenir ve stderr'e yazma işi `QueueListener` thread'inde yapılır.
+Böylece istek yolunda senkron stdout/stderr I/O olmaz. Seviye `LOG_LEVEL`
+ortam değişkeniyle ayarlanır (varsayılan INFO).
+"""
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+
+logger = logging.getLogger("binary_power")
+
+_listener = None
+
+
+def start_logging(level=None):
+    global _listener
+    if _listener is not None:
+        return
+    records = queue.SimpleQueue()
+    output = logging.StreamHandler(sys.stderr)
+    output.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+    _listener = logging.handlers.QueueListener(records, output)
+    _listener.start()
+    logger.addHandler(logging.handlers.QueueHandler(records))
+    logger.setLevel(level or os.environ.get("LOG_LEVEL", "INFO").upper())
+    logger.propagate = False
+
+
+def stop_logging():
+    """Kuyruktaki kayıtları yazıp listener thread'ini durdur"""
+    global _listener
+    if _listener is None:
+        return
+    _listener.stop()
+    _listener = None
+    for handler in [h for h in logger.handlers if isinstance(h, logging.handlers.QueueHandler)]:
+        logger.removeHandler(handler)
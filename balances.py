@@ -0,0 +1,217 @@
+"""Bakiye defteri (journal), snapshot'lar ve mutabakat.
+
+Bakiyeyi değiştiren her işlem, `balance_journal` tablosuna hesap başına bir
+fark satırı (tür ve ilgili transfer/ödeme ID'si ile) ekler; satır bakiye
+güncellemesiyle aynı commit'te yazılır ve tablo yalnızca eklemeyle büyür.
+`balance_snapshots` bir hesabın belirli bir defter satırına kadarki
+bakiyesini saklar. Snapshot'lar yalnızca defterden hesaplanır (bir önceki
+snapshot + aradaki farklar); `accounts.balance` okunmaz, böylece mutabakat
+bakiyeyi defterle bağımsız olarak karşılaştırabilir.
+
+Geçmiş bir andaki bakiye ve artımlı mutabakat en son snapshot'tan sonraki
+farkları toplar; tüm defteri baştan oynatmak (`--full`) yalnızca snapshot'ları
+da doğrulamak için gerekir. Defter ID'lerinin commit sırasıyla artması tek
+yazarlı ledger'a dayanır.
+
+    python balances.py snapshot                    # yeni snapshot al
+    python balances.py reconcile [--full]          # bakiyeleri defterle karşılaştır
+    python balances.py at 42 2025-01-31T23:59:59   # hesabın o andaki bakiyesi
+"""
+import argparse
+import sqlite3
+import sys
+from datetime import datetime
+from itertools import groupby
+from operator import itemgetter
+from typing import NamedTuple, Optional
+
+JOURNAL_INSERT = (
+    "INSERT INTO balance_journal (account_id, delta, kind, reference, created_at) VALUES (?, ?, ?, ?, ?)"
+)
+
+SNAPSHOT_INSERT = """
+INSERT INTO balance_snapshots (account_id, journal_id, balance, created_at)
+SELECT j.account_id, :upto,
+       COALESCE((SELECT s.balance FROM balance_snapshots s WHERE s.account_id = j.account_id
+                 ORDER BY s.journal_id DESC LIMIT 1), 0) + SUM(j.delta),
+       :now
+FROM balance_journal j
+WHERE j.id > :since AND j.id <= :upto
+GROUP BY j.account_id
+"""
+
+# Her hesap için en son snapshot ve sonrasındaki farkların toplamı
+INCREMENTAL_SQL = """
+SELECT a.id, a.balance,
+       COALESCE(s.balance, 0) + COALESCE((SELECT SUM(j.delta) FROM balance_journal j
+                                          WHERE j.account_id = a.id AND j.id > COALESCE(s.journal_id, 0)), 0)
+FROM accounts a
+LEFT JOIN balance_snapshots s
+  ON s.account_id = a.id
+ AND s.journal_id = (SELECT MAX(journal_id) FROM balance_snapshots WHERE account_id = a.id)
+ORDER BY a.id
+"""
+
+
+def record(cursor, entries, created_at):
+    """(hesap, fark, tür, referans) satırlarını deftere ekle"""
+    cursor.executemany(JOURNAL_INSERT, [(*entry, created_at) for entry in entries if entry[1]])
+
+
+def take_snapshot(cursor, now=None):
+    """Son snapshot'tan bu yana hareket gören hesapların snapshot'ını yaz.
+
+    Çağıranın yazma işlemi (BEGIN IMMEDIATE) içinde çalışmalıdır. Yazılan
+    hesap sayısını döndürür.
+    """
+    since = cursor.execute("SELECT COALESCE(MAX(journal_id), 0) FROM balance_snapshots").fetchone()[0]
+    upto = cursor.execute("SELECT COALESCE(MAX(id), 0) FROM balance_journal").fetchone()[0]
+    if upto == since:
+        return 0
+    now = (now or datetime.now()).isoformat()
+    return cursor.execute(SNAPSHOT_INSERT, {"since": since, "upto": upto, "now": now}).rowcount
+
+
+def balance_at(conn, account_id, moment):
+    """Hesabın `moment` (ISO metni) anındaki bakiyesi.
+
+    O andan önceki en son snapshot'tan başlayıp yalnızca sonrasındaki farklar
+    toplanır.
+    """
+    snapshot = conn.execute(
+        "SELECT journal_id, balance FROM balance_snapshots WHERE account_id = ? AND created_at <= ? "
+        "ORDER BY journal_id DESC LIMIT 1",
+        (account_id, moment)
+    ).fetchone()
+    journal_id, balance = snapshot or (0, 0)
+    delta = conn.execute(
+        "SELECT COALESCE(SUM(delta), 0) FROM balance_journal WHERE account_id = ? AND id > ? AND created_at <= ?",
+        (account_id, journal_id, moment)
+    ).fetchone()[0]
+    return balance + delta
+
+
+class Mismatch(NamedTuple):
+    account_id: int
+    journal_id: Optional[int]  # snapshot uyuşmazlığında snapshot'ın defter satırı, bakiyede None
+    expected: int  # defterden hesaplanan
+    actual: int  # accounts.balance ya da snapshot bakiyesi
+
+
+def _rows(cursor, chunk_size):
+    """Cursor'ı `chunk_size` satırlık parçalarla oku (bellek kullanımı sabit)"""
+    while True:
+        rows = cursor.fetchmany(chunk_size)
+        if not rows:
+            return
+        yield from rows
+
+
+def _replay(conn, chunk_size, mismatches):
+    """Defteri baştan oynatıp hesap başına (hesap, toplam) ver; snapshot'ları yol üstünde doğrula"""
+    snapshots = _rows(conn.execute(
+        "SELECT account_id, journal_id, balance FROM balance_snapshots ORDER BY account_id, journal_id"
+    ), chunk_size)
+    snapshot = next(snapshots, None)
+    journal = _rows(conn.execute(
+        "SELECT account_id, id, delta FROM balance_journal ORDER BY account_id, id"
+    ), chunk_size)
+
+    def check(total):
+        # Defter satırı olmayan hesapların snapshot'ı 0 olmalı
+        nonlocal snapshot
+        if snapshot[2] != total:
+            mismatches.append(Mismatch(snapshot[0], snapshot[1], total, snapshot[2]))
+        snapshot = next(snapshots, None)
+
+    for account_id, entries in groupby(journal, key=itemgetter(0)):
+        while snapshot and snapshot[0] < account_id:
+            check(0)
+        total = 0
+        for _, entry_id, delta in entries:
+            while snapshot and snapshot[0] == account_id and snapshot[1] < entry_id:
+                check(total)
+            total += delta
+        while snapshot and snapshot[0] == account_id:
+            check(total)
+        yield account_id, total
+    while snapshot:
+        check(0)
+
+
+def reconcile(conn, full=False, chunk_size=5000):
+    """`accounts.balance` değerlerini defterle karşılaştırıp uyuşmazlıkları ver.
+
+    Artımlı modda her hesap için en son snapshot ve sonrasındaki farklar
+    toplanır; `full=True` tüm defteri hesap sırasıyla akış halinde oynatır ve
+    snapshot'ları da doğrular. Her iki modda da bellek kullanımı `chunk_size`
+    ile sınırlıdır.
+    """
+    if not full:
+        for account_id, actual, expected in _rows(conn.execute(INCREMENTAL_SQL), chunk_size):
+            if actual != expected:
+                yield Mismatch(account_id, None, expected, actual)
+        return
+
+    mismatches = []
+    totals = _replay(conn, chunk_size, mismatches)
+    replayed = next(totals, None)
+    for account_id, actual in _rows(conn.execute("SELECT id, balance FROM accounts ORDER BY id"), chunk_size):
+        expected = 0
+        if replayed and replayed[0] == account_id:
+            expected = replayed[1]
+            replayed = next(totals, None)
+        if actual != expected:
+            yield Mismatch(account_id, None, expected, actual)
+        yield from mismatches
+        mismatches.clear()
+    # Kalan snapshot'ların doğrulaması
+    for _ in totals:
+        pass
+    yield from mismatches
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bakiye defteri, snapshot ve mutabakat")
+    parser.add_argument("--db", default=None, help="Veritabanı dosyası (varsayılan DATABASE_PATH / accounts.db)")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("snapshot", help="Son snapshot'tan sonra değişen hesapların snapshot'ını al")
+    check = commands.add_parser("reconcile", help="Bakiyeleri defterle karşılaştır")
+    check.add_argument("--full", action="store_true", help="Defteri baştan oynat ve snapshot'ları da doğrula")
+    check.add_argument("--chunk-size", type=int, default=5000)
+    check.add_argument("--limit", type=int, default=50, help="Yazdırılacak en fazla uyuşmazlık")
+    at = commands.add_parser("at", help="Hesabın geçmiş bir andaki bakiyesi")
+    at.add_argument("account_id", type=int)
+    at.add_argument("moment", type=datetime.fromisoformat, help="ISO tarih/saat")
+    args = parser.parse_args()
+
+    from migrations import DB_PATH, migrate
+    migrate(args.db)
+    conn = sqlite3.connect(args.db or DB_PATH, isolation_level=None)
+    try:
+        if args.command == "snapshot":
+            conn.execute("BEGIN IMMEDIATE")
+            count = take_snapshot(conn.cursor())
+            conn.execute("COMMIT")
+            print(f"{count} hesabın snapshot'ı alındı")
+        elif args.command == "at":
+            print(balance_at(conn, args.account_id, args.moment.isoformat()))
+        else:
+            # Tek okuma işlemi: mutabakat boyunca tutarlı görüntü
+            conn.execute("BEGIN")
+            found = 0
+            for mismatch in reconcile(conn, args.full, args.chunk_size):
+                found += 1
+                if found <= args.limit:
+                    where = f"snapshot {mismatch.journal_id}" if mismatch.journal_id else "bakiye"
+                    print(f"hesap {mismatch.account_id} ({where}): defter {mismatch.expected}, kayıtlı {mismatch.actual}")
+            conn.execute("COMMIT")
+            print("mutabakat tamam" if not found else f"{found} uyuşmazlık")
+            if found:
+                sys.exit(1)
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
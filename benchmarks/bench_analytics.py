@@ -0,0 +1,88 @@
+"""Harcama analitiği toplama testi.
+
+Sentetik ödemeleri NumPy parçaları halinde üretip `analytics.aggregate_chunks`
+ile (hesap, kategori, ay) toplamlarını hesaplar; aynı işi satır başına Python
+döngüsüyle yapan referans uygulamayla küçük bir örnek üzerinde karşılaştırır.
+`--sqlite` verilirse veriler önce geçici bir veritabanına yazılır ve toplama
+keyset'li parça okuma dahil ölçülür.
+
+    python benchmarks/bench_analytics.py --payments 10000000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def synthetic_chunks(total, chunk_size, accounts, seed=42):
+    rng = np.random.default_rng(seed)
+    for offset in range(0, total, chunk_size):
+        n = min(chunk_size, total - offset)
+        yield (
+            rng.integers(1, accounts + 1, n),
+            rng.integers(0, 4, n),
+            rng.integers(2025 * 12, 2025 * 12 + 12, n),
+            rng.integers(1, 10_000, n),
+        )
+
+
+def python_aggregate(chunks):
+    totals = {}
+    for accounts, categories, months, amounts in chunks:
+        for key in zip(accounts.tolist(), categories.tolist(), months.tolist(), amounts.tolist()):
+            k = key[:3]
+            totals[k] = totals.get(k, 0.0) + key[3]
+    return totals
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--payments", type=int, default=10_000_000)
+    parser.add_argument("--accounts", type=int, default=50_000)
+    parser.add_argument("--chunk-size", type=int, default=1_000_000)
+    parser.add_argument("--sqlite", type=int, default=0, help="Veritabanı üzerinden ölçülecek ödeme sayısı")
+    args = parser.parse_args()
+
+    from analytics import aggregate_chunks
+
+    started = time.perf_counter()
+    accounts, _, _, totals = aggregate_chunks(synthetic_chunks(args.payments, args.chunk_size, args.accounts))
+    elapsed = time.perf_counter() - started
+    print(f"numpy: {args.payments} ödeme, {len(totals)} toplam, {elapsed:.2f} sn ({args.payments / elapsed:,.0f} satır/sn)")
+
+    sample = min(args.payments, 1_000_000)
+    started = time.perf_counter()
+    python_aggregate(synthetic_chunks(sample, args.chunk_size, args.accounts))
+    elapsed = time.perf_counter() - started
+    print(f"python döngüsü: {sample} ödeme, {elapsed:.2f} sn ({sample / elapsed:,.0f} satır/sn)")
+
+    if args.sqlite:
+        os.environ["DATABASE_PATH"] = os.path.join(tempfile.mkdtemp(prefix="bp-bench-"), "accounts.db")
+        import sqlite3
+        from migrations import migrate
+        migrate()
+        from analytics import CATEGORIES, load_payment_chunks, month_label
+
+        conn = sqlite3.connect(os.environ["DATABASE_PATH"])
+        for accounts, categories, months, amounts in synthetic_chunks(args.sqlite, args.chunk_size, args.accounts):
+            conn.executemany(
+                "INSERT INTO payments (account_id, merchant_id, category, amount, created_at) VALUES (?, 1, ?, ?, ?)",
+                zip(accounts.tolist(), (CATEGORIES[c] for c in categories.tolist()), amounts.tolist(),
+                    (month_label(m) + "-15T12:00:00" for m in months.tolist()))
+            )
+        conn.commit()
+
+        started = time.perf_counter()
+        _, _, _, totals = aggregate_chunks(load_payment_chunks(conn))
+        elapsed = time.perf_counter() - started
+        print(f"sqlite + numpy: {args.sqlite} ödeme, {len(totals)} toplam, {elapsed:.2f} sn ({args.sqlite / elapsed:,.0f} satır/sn)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""Cashback kural motoru testi.
+
+Yüzlerce aktif kampanyayı derleyip ödeme başına kural eşleştirme süresini tüm
+kampanyaları tarayan yaklaşımla karşılaştırır, ardından ilk ödeme durumu ve
+iade kayıtları dahil `apply_cashback` hızını `migrations.migrate` ile kurulan
+geçici bir SQLite veritabanında ölçer.
+
+    python benchmarks/bench_cashback.py --campaigns 500 --payments 200000
+"""
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from budgets import CATEGORIES  # noqa: E402
+from cashback import Campaign, CompiledRules, apply_cashback  # noqa: E402
+
+
+def synthetic_campaigns(count, merchants, rnd):
+    campaigns = []
+    for i in range(count):
+        scope = rnd.random()
+        campaigns.append(Campaign(
+            id=i + 1,
+            name=f"kampanya {i}",
+            kind=rnd.choice(["percent", "fixed"]),
+            value=rnd.choice([1, 2, 5, 10, 500, 1000]),
+            category=rnd.choice(CATEGORIES) if 0.7 <= scope < 0.98 else None,
+            merchant_id=rnd.randint(1, merchants) if scope < 0.7 else None,
+            channel=rnd.choice([None, "qr", "direct"]),
+            first_payment_only=rnd.random() < 0.1,
+        ))
+    return campaigns
+
+
+def linear_match(campaigns, merchant_id, category, channel):
+    return [
+        c for c in campaigns
+        if (c.merchant_id is None or c.merchant_id == merchant_id)
+        and (c.category is None or c.category == category)
+        and (c.channel is None or c.channel == channel)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--campaigns", type=int, default=500)
+    parser.add_argument("--merchants", type=int, default=2000)
+    parser.add_argument("--accounts", type=int, default=10000)
+    parser.add_argument("--payments", type=int, default=200_000)
+    args = parser.parse_args()
+
+    rnd = random.Random(42)
+    campaigns = synthetic_campaigns(args.campaigns, args.merchants, rnd)
+    rules = CompiledRules(campaigns)
+    payments = [
+        (rnd.randint(1, args.accounts), rnd.randint(1, args.merchants), rnd.choice(CATEGORIES),
+         rnd.choice(["qr", "direct"]), rnd.randint(1, 20_000))
+        for _ in range(args.payments)
+    ]
+
+    started = time.perf_counter()
+    for _, merchant_id, category, channel, _ in payments:
+        linear_match(campaigns, merchant_id, category, channel)
+    linear = time.perf_counter() - started
+
+    started = time.perf_counter()
+    for _, merchant_id, category, channel, _ in payments:
+        rules.match(merchant_id, category, channel)
+    indexed = time.perf_counter() - started
+
+    print(f"{args.campaigns} kampanya, {args.payments} ödeme")
+    print(f"tüm kampanyaları tarama: {args.payments / linear:,.0f} ödeme/sn")
+    print(f"derlenmiş indeks:        {args.payments / indexed:,.0f} ödeme/sn ({linear / indexed:.1f}x)")
+
+    # İlk ödeme durumu, iade ve bakiye defteri kayıtlarıyla birlikte uçtan uca;
+    # şema uygulamanınkiyle aynı olsun diye migration'larla kurulur
+    from migrations import migrate
+    workdir = tempfile.mkdtemp(prefix="bp-bench-")
+    path = os.path.join(workdir, "accounts.db")
+    os.environ["MERCHANTS_DB"] = os.path.join(workdir, "merchants.db")
+    migrate(path)
+    conn = sqlite3.connect(path)
+    conn.executemany(
+        "INSERT INTO accounts (name, phone, created_at, balance) VALUES (?, ?, ?, 0)",
+        ((f"user{i}", f"555{i:07d}", "2024-01-01T00:00:00") for i in range(args.accounts))
+    )
+    conn.commit()
+    cursor = conn.cursor()
+    started = time.perf_counter()
+    for payment_id, (account_id, merchant_id, category, channel, amount) in enumerate(payments):
+        apply_cashback(cursor, rules, account_id, payment_id, merchant_id, category, channel, amount, "2025-01-01")
+    conn.commit()
+    elapsed = time.perf_counter() - started
+    print(f"apply_cashback (SQLite dahil): {args.payments / elapsed:,.0f} ödeme/sn")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""Eşzamanlı top-up ve transfer yük testi.
+
+Uygulamayı geçici bir veritabanına karşı süreç içinde (ASGI) çalıştırır ve
+belirtilen eşzamanlılıkta istekler gönderip saniyedeki istek sayısını ölçer.
+
+    python benchmarks/bench_concurrency.py --requests 2000 --concurrency 64
+"""
+import argparse
+import asyncio
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def seed(path, accounts):
+    from migrations import migrate
+    # ASGITransport lifespan olaylarını çalıştırmadığı için şema burada oluşturulur
+    migrate(path)
+    conn = sqlite3.connect(path)
+    conn.executemany(
+        "INSERT INTO accounts (name, phone, created_at, balance) VALUES (?, ?, ?, ?)",
+        ((f"user{i}", f"555{i:07d}", "2024-01-01T00:00:00", 100_000_000) for i in range(accounts))
+    )
+    conn.commit()
+    conn.close()
+
+
+async def run(args):
+    import httpx
+    from app import app
+    from ledger import ledger
+    from session import SESSION_COOKIE, signer
+
+    transport = httpx.ASGITransport(app=app)
+    latencies = []
+    errors = 0
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    # Lifespan çalışmadığı için ledger yazıcısı burada başlatılır
+    await ledger.start()
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def one(i):
+            nonlocal errors
+            sender = random.randint(1, args.accounts)
+            receiver = random.randint(1, args.accounts)
+            async with semaphore:
+                started = time.perf_counter()
+                if i % 2:
+                    response = await client.post(
+                        "/api/topup",
+                        json={"amount": 10},
+                        headers={"Cookie": f"{SESSION_COOKIE}={signer.issue(sender)}"},
+                    )
+                else:
+                    response = await client.post(
+                        "/transfers/",
+                        json={"from_account_id": sender, "to_account_id": receiver, "amount": 1},
+                    )
+                latencies.append(time.perf_counter() - started)
+                if response.status_code != 200:
+                    errors += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(args.requests)))
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    print(f"istek: {args.requests}  eşzamanlılık: {args.concurrency}  hata: {errors}")
+    print(f"süre: {elapsed:.2f} sn  throughput: {args.requests / elapsed:.0f} istek/sn")
+    print(f"p50: {latencies[len(latencies) // 2] * 1000:.2f} ms  p99: {latencies[int(len(latencies) * 0.99)] * 1000:.2f} ms")
+    print(f"ledger: {ledger.stats()}")
+    await ledger.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--accounts", type=int, default=100)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="bp-bench-")
+    os.environ["DATABASE_PATH"] = os.path.join(workdir, "accounts.db")
+    # İstekler tek istemciden ve az sayıda hesaptan gelir; sınırlar ölçümü bozmasın
+    os.environ.setdefault("RATE_LIMIT", "0")
+    # Depodaki eski merchants.db geçici veritabanına aktarılmasın
+    os.environ["MERCHANTS_DB"] = os.path.join(workdir, "merchants.db")
+
+    # static/ ve templates/ dizinleri göreli yollarla bağlanıyor
+    os.chdir(ROOT)
+    sys.path.insert(0, ROOT)
+    seed(os.environ["DATABASE_PATH"], args.accounts)
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+"""Tek hesaba yüklenen eşzamanlı transferlerle çift harcama testi.
+
+Birden fazla süreç aynı gönderen hesaptan (1 numara) diğer hesaplara aynı
+anda transfer yapar; toplam istek, bakiyenin karşılayabileceğinden fazladır.
+Sonunda gönderenin bakiyesinin eksiye düşmediği, tam olarak kabul edilen
+transfer kadar azaldığı, kabul sayısının bakiyenin izin verdiği üst sınırı
+geçmediği ve toplam bakiyenin korunduğu kontrol edilir.
+
+    python benchmarks/bench_double_spend.py --backend sqlite --workers 4
+    python benchmarks/bench_double_spend.py --backend postgres --dsn postgresql://localhost/bp_bench --workers 8
+
+Postgres testi için geçici bir veritabanı kullanın; tablolar boşaltılır.
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+SENDER = 1
+
+
+def configure(args):
+    os.environ["STORAGE_BACKEND"] = args.backend
+    if args.backend == "postgres":
+        os.environ["DATABASE_URL"] = args.dsn
+    else:
+        os.environ["DATABASE_PATH"] = args.path
+        os.environ["MERCHANTS_DB"] = os.path.join(os.path.dirname(args.path), "merchants.db")
+
+
+async def seed(args):
+    from storage import storage
+
+    if args.backend == "sqlite":
+        from migrations import migrate
+        migrate()
+    await storage.start()
+    if args.backend == "postgres":
+        async with storage._pool.acquire() as conn:
+            await conn.execute("TRUNCATE balance_journal, transfers, accounts RESTART IDENTITY")
+    await storage.create_account("sender", "5550000000", datetime.now(), args.balance)
+    for i in range(1, args.accounts):
+        await storage.create_account(f"user{i}", f"555{i:07d}", datetime.now(), 0)
+    await storage.close()
+
+
+async def work(args, seed_value, start_at, results):
+    from ledger import LedgerError, ledger
+    from storage import storage
+
+    rng = random.Random(seed_value)
+    if args.backend == "sqlite":
+        await ledger.start()
+    await storage.start()
+    semaphore = asyncio.Semaphore(args.concurrency)
+    latencies = []
+    accepted = insufficient = 0
+
+    async def one():
+        nonlocal accepted, insufficient
+        receiver = rng.randint(SENDER + 1, args.accounts)
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                await storage.transfer(SENDER, receiver, args.amount)
+                accepted += 1
+            except LedgerError as e:
+                if e.status_code != 400:
+                    raise
+                insufficient += 1
+            latencies.append(time.perf_counter() - started)
+
+    # Tüm süreçler aynı anda başlasın
+    await asyncio.sleep(max(0.0, start_at - time.time()))
+    await asyncio.gather(*(one() for _ in range(args.requests)))
+    await storage.close()
+    if args.backend == "sqlite":
+        await ledger.stop()
+    results.put((accepted, insufficient, latencies))
+
+
+def run_worker(args, seed_value, start_at, results):
+    configure(args)
+    asyncio.run(work(args, seed_value, start_at, results))
+
+
+async def verify(args):
+    from storage import storage
+
+    await storage.start()
+    total = negative = 0
+    sender_balance = None
+    async for rows in storage.iter_accounts(0):
+        total += sum(row[4] for row in rows)
+        negative += sum(1 for row in rows if row[4] < 0)
+        for row in rows:
+            if row[0] == SENDER:
+                sender_balance = row[4]
+    await storage.close()
+    return sender_balance, total, negative
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--backend", choices=["sqlite", "postgres"], default="sqlite")
+    parser.add_argument("--dsn", default=os.environ.get("DATABASE_URL"))
+    parser.add_argument("--workers", type=int, default=4, help="Süreç sayısı")
+    parser.add_argument("--accounts", type=int, default=20, help="Gönderen dahil hesap sayısı")
+    parser.add_argument("--balance", type=int, default=100_000, help="Gönderenin başlangıç bakiyesi (kuruş)")
+    parser.add_argument("--amount", type=int, default=100, help="Transfer tutarı (kuruş)")
+    parser.add_argument("--requests", type=int, default=1000, help="Süreç başına transfer")
+    parser.add_argument("--concurrency", type=int, default=64, help="Süreç başına eşzamanlı transfer")
+    args = parser.parse_args()
+    if args.backend == "postgres" and not args.dsn:
+        parser.error("--dsn veya DATABASE_URL gerekli")
+    args.path = os.path.join(tempfile.mkdtemp(prefix="bp-bench-"), "accounts.db")
+
+    configure(args)
+    asyncio.run(seed(args))
+
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    start_at = time.time() + 1.0
+    workers = [
+        context.Process(target=run_worker, args=(args, i, start_at, results)) for i in range(args.workers)
+    ]
+    for worker in workers:
+        worker.start()
+    outcomes = [results.get() for _ in workers]
+    for worker in workers:
+        worker.join()
+    elapsed = time.time() - start_at
+
+    accepted = sum(o[0] for o in outcomes)
+    insufficient = sum(o[1] for o in outcomes)
+    latencies = sorted(latency for o in outcomes for latency in o[2])
+    sender_balance, total, negative = asyncio.run(verify(args))
+
+    requests = args.workers * args.requests
+    limit = args.balance // args.amount
+    expected_balance = args.balance - accepted * args.amount
+    print(f"arka uç: {args.backend}  süreç: {args.workers}  transfer: {requests}  "
+          f"kabul: {accepted} (üst sınır {limit})  yetersiz bakiye: {insufficient}")
+    print(f"süre: {elapsed:.2f} sn  throughput: {requests / elapsed:.0f} transfer/sn")
+    print(f"p50: {latencies[len(latencies) // 2] * 1000:.2f} ms  p99: {latencies[int(len(latencies) * 0.99)] * 1000:.2f} ms")
+    print(f"gönderen bakiyesi: {sender_balance} (beklenen {expected_balance})  "
+          f"toplam: {total} (beklenen {args.balance})  eksi bakiye: {negative}")
+    if (negative or sender_balance != expected_balance or accepted > limit
+            or total != args.balance or accepted + insufficient != requests):
+        sys.exit("TUTARSIZLIK")
+
+
+if __name__ == "__main__":
+    main()
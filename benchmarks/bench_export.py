@@ -0,0 +1,135 @@
+"""Dışa aktarım: büyük tabloda parçalı (keyset) okuma ile tek seferde okuma.
+
+Geçici bir veritabanına `--transfers` transfer yazar, ardından her çalıştırmayı
+ayrı bir süreçte yaparak şunları raporlar:
+
+- `exports.export` ile CSV ve Parquet dışa aktarım süresi, satır/sn ve
+  sürecin en yüksek belleği (maxrss),
+- aynı sorgunun `fetchall` ile tek seferde okunup csv.writer ile yazılması
+  (karşılaştırma için),
+- dışa aktarım sürerken başka bir bağlantıdan yapılan yazma işlemlerinin
+  gecikmesi (p99) ve WAL dosyasının boyutu.
+
+    python benchmarks/bench_export.py --transfers 1000000
+"""
+import argparse
+import csv
+import multiprocessing
+import os
+import random
+import resource
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def seed(path, accounts, transfers):
+    from migrations import migrate
+    migrate(path)
+    conn = sqlite3.connect(path)
+    conn.executemany(
+        "INSERT INTO accounts (name, phone, created_at, balance) VALUES (?, ?, ?, ?)",
+        ((f"user{i}", f"555{i:07d}", "2024-01-01T00:00:00", 100_000_000) for i in range(accounts))
+    )
+    rnd = random.Random(7)
+    conn.executemany(
+        "INSERT INTO transfers (from_account_id, to_account_id, amount, created_at) VALUES (?, ?, ?, ?)",
+        ((rnd.randint(1, accounts), rnd.randint(1, accounts), rnd.randint(1, 100_000),
+          f"2024-{i % 12 + 1:02d}-15T12:00:00") for i in range(transfers))
+    )
+    conn.commit()
+    conn.close()
+
+
+def naive(database, path):
+    """Tüm sonucu belleğe alıp yaz"""
+    import exports
+    conn = exports.connect(database)
+    report = exports.REPORTS["transfers"]
+    sql, params = exports.build_query(report, {})
+    rows = conn.execute(sql, {**params, "after_id": 0, "limit": -1}).fetchall()
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(report.columns)
+        writer.writerows(rows)
+    return len(rows)
+
+
+def chunked(database, path, fmt, chunk_size):
+    import exports
+    conn = exports.connect(database)
+    return exports.export(conn, "transfers", fmt, path, chunk_size=chunk_size)["rows"]
+
+
+def child(target, args, results):
+    started = time.perf_counter()
+    rows = target(*args)
+    results.put((rows, time.perf_counter() - started, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024))
+
+
+def measure(name, target, args, database):
+    ctx = multiprocessing.get_context("spawn")
+    results = ctx.Queue()
+    process = ctx.Process(target=child, args=(target, args, results))
+
+    # Dışa aktarım sürerken yazıcı gecikmesi ve WAL boyutu
+    stop = threading.Event()
+    latencies = []
+    wal = [0]
+
+    def writer():
+        conn = sqlite3.connect(database, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        while not stop.is_set():
+            started = time.perf_counter()
+            conn.execute("UPDATE accounts SET balance = balance WHERE id = 1")
+            conn.commit()
+            latencies.append(time.perf_counter() - started)
+            wal[0] = max(wal[0], os.path.getsize(database + "-wal") if os.path.exists(database + "-wal") else 0)
+            time.sleep(0.005)
+        conn.close()
+
+    thread = threading.Thread(target=writer)
+    thread.start()
+    process.start()
+    rows, seconds, maxrss = results.get()
+    process.join()
+    stop.set()
+    thread.join()
+
+    latencies.sort()
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000 if latencies else 0
+    print(f"{name:16s} {rows:9d} satır  {seconds:6.2f} sn  {rows / seconds:9.0f} satır/sn  "
+          f"maxrss {maxrss:6.0f} MB  yazma p99 {p99:6.2f} ms  WAL {wal[0] / 1024 / 1024:.1f} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--accounts", type=int, default=10_000)
+    parser.add_argument("--transfers", type=int, default=1_000_000)
+    parser.add_argument("--chunk-size", type=int, default=50_000)
+    parser.add_argument("--parquet", action="store_true", help="Parquet çıktısını da ölç (pyarrow gerekir)")
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="export_bench_")
+    database = os.path.join(tmp, "accounts.db")
+    os.environ["DATABASE_PATH"] = database
+    os.environ["MERCHANTS_DB"] = os.path.join(tmp, "merchants.db")
+    started = time.perf_counter()
+    seed(database, args.accounts, args.transfers)
+    print(f"tohum: {args.transfers} transfer {time.perf_counter() - started:.1f} sn")
+
+    measure("fetchall csv", naive, (database, os.path.join(tmp, "naive.csv")), database)
+    measure("parçalı csv", chunked, (database, os.path.join(tmp, "out.csv"), "csv", args.chunk_size), database)
+    if args.parquet:
+        measure("parçalı parquet", chunked,
+                (database, os.path.join(tmp, "out.parquet"), "parquet", args.chunk_size), database)
+
+
+if __name__ == "__main__":
+    main()
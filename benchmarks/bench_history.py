@@ -0,0 +1,72 @@
+"""Transfer geçmişi sorgusu gecikme testi.
+
+Geçici bir veritabanına sentetik transferler yükler ve rastgele hesaplar için
+ilk sayfa, imleçli sonraki sayfa ve tarih aralıklı sorguların süresini ölçer.
+
+    python benchmarks/bench_history.py --transfers 1000000 --accounts 1000
+"""
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def seed(conn, transfers, accounts, chunk=100_000):
+    rnd = random.Random(42)
+    for offset in range(0, transfers, chunk):
+        conn.executemany(
+            "INSERT INTO transfers (from_account_id, to_account_id, amount, created_at) VALUES (?, ?, ?, ?)",
+            (
+                (
+                    rnd.randint(1, accounts),
+                    rnd.randint(1, accounts),
+                    100,
+                    f"2025-{rnd.randint(1, 12):02d}-{rnd.randint(1, 28):02d}T{rnd.randint(0, 23):02d}:{rnd.randint(0, 59):02d}:00",
+                )
+                for _ in range(min(chunk, transfers - offset))
+            ),
+        )
+        conn.commit()
+
+
+def measure(label, fn, runs):
+    started = time.perf_counter()
+    for i in range(runs):
+        fn(i)
+    elapsed = (time.perf_counter() - started) / runs
+    print(f"{label:<28} {elapsed * 1000:.3f} ms/sorgu")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--transfers", type=int, default=1_000_000)
+    parser.add_argument("--accounts", type=int, default=1000)
+    parser.add_argument("--runs", type=int, default=2000)
+    args = parser.parse_args()
+
+    os.environ["DATABASE_PATH"] = os.path.join(tempfile.mkdtemp(prefix="bp-bench-"), "accounts.db")
+    sys.path.insert(0, ROOT)
+    from migrations import migrate
+    migrate()
+    from history import encode_cursor, fetch_history
+
+    conn = sqlite3.connect(os.environ["DATABASE_PATH"])
+    started = time.perf_counter()
+    seed(conn, args.transfers, args.accounts)
+    print(f"{args.transfers} transfer yüklendi ({time.perf_counter() - started:.1f} sn)")
+
+    accounts = [random.randint(1, args.accounts) for _ in range(args.runs)]
+    cursors = [encode_cursor(fetch_history(conn, a, 50)[-1]) for a in accounts[:100]]
+
+    measure("ilk sayfa (50)", lambda i: fetch_history(conn, accounts[i], 50), args.runs)
+    measure("imleçli sonraki sayfa", lambda i: fetch_history(conn, accounts[i % 100], 50, cursors[i % 100]), args.runs)
+    measure("tarih aralığı (1 ay)", lambda i: fetch_history(conn, accounts[i], 50, None, "2025-06-01", "2025-07-01"), args.runs)
+
+
+if __name__ == "__main__":
+    main()
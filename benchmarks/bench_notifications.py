@@ -0,0 +1,225 @@
+"""Canlı bildirimler: tek worker'da binlerce boşta bağlantı.
+
+Geçici bir veritabanıyla ayrı bir süreçte tek worker'lı uvicorn başlatır,
+her biri farklı bir hesaba ait `--connections` SSE (ya da `--transport ws`
+ile WebSocket) bağlantısı açar ve şunları raporlar:
+
+- bağlantıların açılma süresi ve sunucunun bağlantı başına bellek artışı (RSS),
+- bağlantılar boştayken sunucunun CPU kullanımı,
+- rastgele bir hesaba para yükleme isteğinden olayın o hesabın bağlantısına
+  ulaşmasına kadar geçen süre (p50/p99),
+- `--fanout` hesaba tek toplu transferle para gönderildiğinde tüm olayların
+  ulaşma süresi.
+
+    python benchmarks/bench_notifications.py --connections 10000
+    python benchmarks/bench_notifications.py --connections 10000 --transport ws
+
+Açık dosya sınırı (`ulimit -n`) bağlantı sayısından büyük olmalıdır.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import resource
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+SECRET = "bench-notifications"
+
+
+def seed(path, accounts):
+    from migrations import migrate
+    migrate(path)
+    conn = sqlite3.connect(path)
+    conn.executemany(
+        "INSERT INTO accounts (name, phone, created_at, balance) VALUES (?, ?, ?, ?)",
+        ((f"user{i}", f"555{i:07d}", "2024-01-01T00:00:00", 100_000_000) for i in range(accounts))
+    )
+    conn.commit()
+    conn.close()
+
+
+def process_stats(pid):
+    """(RSS MB, kullanıcı + sistem CPU sn) /proc üzerinden"""
+    with open(f"/proc/{pid}/status") as f:
+        rss = next(int(line.split()[1]) for line in f if line.startswith("VmRSS:"))
+    with open(f"/proc/{pid}/stat") as f:
+        fields = f.read().rpartition(")")[2].split()
+    return rss / 1024, (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))] * 1000
+
+
+class Listener:
+    """Bir hesabın bildirim bağlantısı; gelen olayları bekleyenlere iletir"""
+
+    def __init__(self, account_id):
+        self.account_id = account_id
+        self.waiters = {}  # olay türü -> Future
+        self.ready = asyncio.get_running_loop().create_future()
+
+    def deliver(self, text):
+        event = json.loads(text)
+        if not self.ready.done():
+            self.ready.set_result(event)
+            return
+        waiter = self.waiters.pop(event["type"], None)
+        if waiter is not None and not waiter.done():
+            waiter.set_result(time.perf_counter())
+
+    def wait(self, kind):
+        waiter = self.waiters[kind] = asyncio.get_running_loop().create_future()
+        return waiter
+
+    async def run_sse(self, port, cookie):
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        writer.write(f"GET /api/events HTTP/1.1\r\nHost: bench\r\nCookie: {cookie}\r\n\r\n".encode())
+        try:
+            # Parçalı (chunked) gövdenin boyut satırları yok sayılır; yalnızca data: satırları okunur
+            while line := await reader.readline():
+                if line.startswith(b"data: "):
+                    self.deliver(line[6:].decode())
+        finally:
+            writer.close()
+
+    async def run_ws(self, port, cookie):
+        import websockets
+        async with websockets.connect(
+            f"ws://127.0.0.1:{port}/ws/events", additional_headers={"Cookie": cookie},
+            ping_interval=None, open_timeout=60
+        ) as ws:
+            async for message in ws:
+                self.deliver(message)
+
+
+async def run(args, server):
+    import httpx
+    from session import SessionSigner
+
+    signer = SessionSigner(SECRET.encode())
+    loop = asyncio.get_running_loop()
+    rss_before, _ = process_stats(server.pid)
+
+    listeners = [Listener(account_id) for account_id in range(1, args.connections + 1)]
+    semaphore = asyncio.Semaphore(500)  # dinleme kuyruğunu taşırmamak için
+
+    async def connect(listener):
+        async with semaphore:
+            cookie = f"session={signer.issue(listener.account_id)}"
+            run_listener = listener.run_sse if args.transport == "sse" else listener.run_ws
+            task = loop.create_task(run_listener(args.port, cookie))
+            await asyncio.wait([listener.ready, task], return_when=asyncio.FIRST_COMPLETED)
+            if not listener.ready.done():
+                task.result()
+            return task
+
+    started = time.perf_counter()
+    tasks = await asyncio.gather(*(connect(listener) for listener in listeners))
+    print(f"{args.connections} {args.transport} bağlantısı: {time.perf_counter() - started:.2f} sn")
+
+    rss, cpu = process_stats(server.pid)
+    print(f"sunucu RSS: {rss_before:.0f} MB -> {rss:.0f} MB "
+          f"({(rss - rss_before) * 1024 / args.connections:.1f} KB/bağlantı)")
+    await asyncio.sleep(args.idle)
+    _, cpu_after = process_stats(server.pid)
+    print(f"boşta CPU: %{(cpu_after - cpu) / args.idle * 100:.1f} ({args.idle:.0f} sn)")
+
+    rnd = random.Random(7)
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{args.port}", timeout=30) as client:
+        latencies = []
+        for _ in range(args.events):
+            listener = rnd.choice(listeners)
+            arrived = listener.wait("topup")
+            sent = time.perf_counter()
+            response = await client.post(
+                "/api/topup", json={"amount": 1}, headers={"Cookie": f"session={signer.issue(listener.account_id)}"}
+            )
+            response.raise_for_status()
+            latencies.append(await asyncio.wait_for(arrived, 10) - sent)
+        print(f"yükleme -> olay ({args.events} örnek): p50 {percentile(latencies, 0.5):.2f} ms  "
+              f"p99 {percentile(latencies, 0.99):.2f} ms")
+
+        receivers = listeners[1:args.fanout + 1]
+        waits = [listener.wait("balance") for listener in receivers]
+        sent = time.perf_counter()
+        response = await client.post(
+            "/transfers/bulk",
+            json={"transfers": [{"to_account_id": listener.account_id, "amount": 1} for listener in receivers]},
+            headers={"Cookie": f"session={signer.issue(listeners[0].account_id)}"}
+        )
+        response.raise_for_status()
+        arrivals = await asyncio.wait_for(asyncio.gather(*waits), 30)
+        print(f"toplu transfer -> {len(receivers)} bağlantı: son olay {(max(arrivals) - sent) * 1000:.1f} ms")
+
+        print((await client.get("/debug/pool-stats")).json()["notifications"])
+
+        # Sunucu kapanmadan önce bağlantıları kapat ve aboneliklerin bırakılmasını bekle
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        started = time.perf_counter()
+        while (await client.get("/debug/pool-stats")).json()["notifications"]["connections"]:
+            if time.perf_counter() - started > 10:
+                break
+            await asyncio.sleep(0.1)
+        print(f"bağlantılar kapandı: {time.perf_counter() - started:.2f} sn")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Canlı bildirim bağlantı testi")
+    parser.add_argument("--connections", type=int, default=10_000)
+    parser.add_argument("--transport", choices=("sse", "ws"), default="sse")
+    parser.add_argument("--events", type=int, default=200)
+    parser.add_argument("--fanout", type=int, default=1000)
+    parser.add_argument("--idle", type=float, default=5.0, help="Boşta CPU ölçüm süresi (sn)")
+    parser.add_argument("--port", type=int, default=8799)
+    args = parser.parse_args()
+    args.fanout = min(args.fanout, args.connections - 1)
+
+    # İstemci ve sunucu süreçlerinin her biri bağlantı başına bir soket açar
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft < hard:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+
+    tmp = tempfile.mkdtemp(prefix="notify_bench_")
+    env = dict(
+        os.environ,
+        DATABASE_PATH=os.path.join(tmp, "accounts.db"),
+        MERCHANTS_DB=os.path.join(tmp, "merchants.db"),
+        SESSION_SECRET=SECRET,
+        RATE_LIMIT="0",
+        NOTIFY_MAX_CONNECTIONS=str(args.connections + 100),
+    )
+    seed(env["DATABASE_PATH"], args.connections)
+
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app:app", "--port", str(args.port),
+         "--log-level", "warning", "--backlog", "4096", "--timeout-graceful-shutdown", "1"],
+        cwd=ROOT, env=env
+    )
+    try:
+        import httpx
+        for _ in range(100):
+            try:
+                httpx.get(f"http://127.0.0.1:{args.port}/")
+                break
+            except httpx.TransportError:
+                time.sleep(0.1)
+        asyncio.run(run(args, server))
+    finally:
+        server.terminate()
+        server.wait()
+
+
+if __name__ == "__main__":
+    main()
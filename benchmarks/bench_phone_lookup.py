@@ -0,0 +1,111 @@
+"""Telefonla hesap bulma ve rehber eşleştirme gecikme testi.
+
+Geçici bir veritabanına sentetik hesaplar yükler; rehber sorgusunu (çoğu
+numarası kayıtsız `--batch` numara) telefon filtresiyle ve filtresiz, tek
+numara çözümlemeyi tekil indeksle ve indekssiz ham `phone` kolonunda
+(eski tam tablo taraması) ölçer.
+
+    python benchmarks/bench_phone_lookup.py --accounts 1000000 --batch 500 --hit-rate 0.05
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def seed(conn, accounts, chunk=100_000):
+    from phones import normalize_phone
+
+    for offset in range(0, accounts, chunk):
+        rows = []
+        for i in range(offset + 1, min(offset + chunk, accounts) + 1):
+            phone = f"05{i:09d}"
+            rows.append((f"user{i}", phone, "2024-01-01T00:00:00", 0, normalize_phone(phone)))
+        conn.executemany(
+            "INSERT INTO accounts (name, phone, created_at, balance, phone_normalized) VALUES (?, ?, ?, ?, ?)", rows
+        )
+        conn.commit()
+
+
+def contacts(rnd, accounts, batch, hit_rate):
+    # Kayıtlı numaralar 05000000001.. aralığında; kayıtsızlar 06... ile başlar
+    return [
+        f"05{rnd.randint(1, accounts):09d}" if rnd.random() < hit_rate else f"06{rnd.randint(1, 10 ** 9 - 1):09d}"
+        for _ in range(batch)
+    ]
+
+
+async def measure(label, fn, runs):
+    started = time.perf_counter()
+    for i in range(runs):
+        await fn(i)
+    elapsed = time.perf_counter() - started
+    print(f"{label:40s} {elapsed / runs * 1000:8.3f} ms/istek")
+
+
+async def run(args):
+    from db_pool import database
+    from ledger import ledger
+    from phones import normalize_phone
+    from storage import SQLiteStorage
+
+    store = SQLiteStorage(database, ledger)
+    started = time.perf_counter()
+    await store.reload_phones()
+    print(f"filtre kurulumu: {time.perf_counter() - started:.2f} sn, {store.phones.stats()['bytes'] / 1e6:.1f} MB")
+
+    rnd = random.Random(7)
+    batches = [[normalize_phone(p) for p in contacts(rnd, args.accounts, args.batch, args.hit_rate)]
+               for _ in range(args.runs)]
+    phones = store.phones
+    matches = 0
+    for batch in batches:
+        matches += len(await store.find_accounts_by_phone(batch))
+    print(f"eşleşen: {matches} / {args.runs * args.batch}")
+
+    await measure(f"rehber ({args.batch} numara), filtreli", lambda i: store.find_accounts_by_phone(batches[i]), args.runs)
+    store.phones = None
+    await measure(f"rehber ({args.batch} numara), filtresiz", lambda i: store.find_accounts_by_phone(batches[i]), args.runs)
+    store.phones = phones
+
+    hits = [f"05{rnd.randint(1, args.accounts):09d}" for _ in range(args.runs)]
+    misses = [f"06{rnd.randint(1, 10 ** 9 - 1):09d}" for _ in range(args.runs)]
+    await measure("tek numara, kayıtlı", lambda i: store.find_account_by_phone(hits[i]), args.runs)
+    await measure("tek numara, kayıtsız", lambda i: store.find_account_by_phone(misses[i]), args.runs)
+    scans = max(1, args.runs // 100)
+    await measure("tek numara, ham kolonda tarama", lambda i: database.run(
+        lambda conn: conn.execute("SELECT id FROM accounts WHERE phone = ?", (hits[i],)).fetchone()
+    ), scans)
+    print(store.phones.stats())
+    database.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Telefonla hesap bulma testi")
+    parser.add_argument("--accounts", type=int, default=200_000)
+    parser.add_argument("--batch", type=int, default=500)
+    parser.add_argument("--hit-rate", type=float, default=0.05)
+    parser.add_argument("--runs", type=int, default=200)
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="phone_bench_")
+    os.environ["DATABASE_PATH"] = os.path.join(tmp, "accounts.db")
+    os.environ["MERCHANTS_DB"] = os.path.join(tmp, "merchants.db")
+
+    import sqlite3
+    from migrations import DB_PATH, migrate
+    migrate()
+    conn = sqlite3.connect(DB_PATH)
+    seed(conn, args.accounts)
+    conn.close()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
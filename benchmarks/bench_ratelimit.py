@@ -0,0 +1,107 @@
+"""Hız sınırlayıcının etkisi: tek hesaptan gelen istek seli.
+
+Uygulamayı geçici bir veritabanına karşı süreç içinde (ASGI) çalıştırır. Bir
+"kötü" hesap `/api/transfer`e sınırsız istek gönderirken diğer hesaplar
+normal hızda transfer yapar. Kabul/ret sayılarını, reddedilen isteklerin
+gecikmesini ve reddedilen istekler sırasında bağlantı havuzundan alınan
+bağlantı sayısını (0 olmalı) raporlar.
+
+    python benchmarks/bench_ratelimit.py --flood 5000 --concurrency 64
+"""
+import argparse
+import asyncio
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+ATTACKER = 1
+
+
+def seed(path, accounts):
+    from migrations import migrate
+    # ASGITransport lifespan olaylarını çalıştırmadığı için şema burada oluşturulur
+    migrate(path)
+    conn = sqlite3.connect(path)
+    conn.executemany(
+        "INSERT INTO accounts (name, phone, created_at, balance) VALUES (?, ?, ?, ?)",
+        ((f"user{i}", f"555{i:07d}", "2024-01-01T00:00:00", 100_000_000) for i in range(accounts))
+    )
+    conn.commit()
+    conn.close()
+
+
+async def run(args):
+    import httpx
+    from app import app
+    from db_pool import database
+    from ledger import ledger
+    from session import SESSION_COOKIE, signer
+
+    transport = httpx.ASGITransport(app=app)
+    semaphore = asyncio.Semaphore(args.concurrency)
+    results = {"flood": [], "normal": []}
+
+    # Lifespan çalışmadığı için ledger yazıcısı burada başlatılır
+    await ledger.start()
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def transfer(kind, sender, i):
+            async with semaphore:
+                started = time.perf_counter()
+                response = await client.post(
+                    "/api/transfer",
+                    json={"to_user_id": 2 + i % (args.accounts - 2), "amount": 1},
+                    headers={"Cookie": f"{SESSION_COOKIE}={signer.issue(sender)}"},
+                )
+                results[kind].append((response.status_code, time.perf_counter() - started))
+
+        checkouts = database.stats()["checkouts"]
+        started = time.perf_counter()
+        await asyncio.gather(
+            *(transfer("flood", ATTACKER, i) for i in range(args.flood)),
+            *(transfer("normal", 2 + i % (args.accounts - 2), i) for i in range(args.normal)),
+        )
+        elapsed = time.perf_counter() - started
+        checkouts = database.stats()["checkouts"] - checkouts
+    await ledger.stop()
+
+    accepted = 0
+    for kind, rows in results.items():
+        ok = [latency for status, latency in rows if status == 200]
+        rejected = sorted(latency for status, latency in rows if status == 429)
+        accepted += len(ok)
+        line = f"{kind:7s} istek: {len(rows):6d}  kabul: {len(ok):6d}  429: {len(rejected):6d}"
+        if rejected:
+            line += f"  429 p50: {rejected[len(rejected) // 2] * 1000:.2f} ms"
+        print(line)
+    print(f"süre: {elapsed:.2f} sn  havuzdan alınan bağlantı: {checkouts} (kabul edilen istek: {accepted})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--accounts", type=int, default=50)
+    parser.add_argument("--flood", type=int, default=5000)
+    parser.add_argument("--normal", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=64)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="bp-bench-")
+    os.environ["DATABASE_PATH"] = os.path.join(workdir, "accounts.db")
+    os.environ["MERCHANTS_DB"] = os.path.join(workdir, "merchants.db")
+    os.environ["RATE_LIMIT"] = "1"
+    # Tüm istekler aynı istemci IP'sinden gelir; burada yalnızca hesap sınırı ölçülür
+    os.environ.setdefault("RATE_LIMIT_IP_RATE", "1000000")
+    os.environ.setdefault("RATE_LIMIT_IP_BURST", "1000000")
+
+    # static/ ve templates/ dizinleri göreli yollarla bağlanıyor
+    os.chdir(ROOT)
+    sys.path.insert(0, ROOT)
+    seed(os.environ["DATABASE_PATH"], args.accounts)
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""CSV tohum yükleyicisi hız ve bellek testi.
+
+Geçici bir dizinde sentetik hesap ve geçmiş transfer CSV'leri üretir, boş bir
+veritabanına `seed.load_file` ile yükler ve satır/sn ile tepe bellek
+kullanımını (maxrss) raporlar. `--keep-indexes` indeksleri düşürmeden
+yüklemenin farkını görmek içindir; `--invalid` her N satırda bir hatalı satır
+ekleyerek doğrulama yolunu da ölçer.
+
+    python benchmarks/bench_seed.py --accounts 200000 --transfers 2000000
+    python benchmarks/bench_seed.py --transfers 2000000 --keep-indexes
+"""
+import argparse
+import csv
+import os
+import random
+import resource
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def write_accounts(path, count, invalid):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["name", "phone", "created_at", "balance"])
+        for i in range(1, count + 1):
+            balance = -1 if invalid and i % invalid == 0 else 100_000
+            writer.writerow([f"Kullanıcı {i}", f"5{i:09d}", "2024-01-01T00:00:00", balance])
+
+
+def write_transfers(path, count, accounts, invalid):
+    rnd = random.Random(42)
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["from_account_id", "to_account_id", "amount", "created_at"])
+        for i in range(1, count + 1):
+            amount = "abc" if invalid and i % invalid == 0 else rnd.randint(1, 50_000)
+            writer.writerow([
+                rnd.randint(1, accounts), rnd.randint(1, accounts), amount,
+                f"2025-{rnd.randint(1, 12):02d}-{rnd.randint(1, 28):02d}T{rnd.randint(0, 23):02d}:{rnd.randint(0, 59):02d}:00",
+            ])
+
+
+def maxrss_mb():
+    # Linux'ta KB, macOS'ta bayt
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="CSV tohum yükleme testi")
+    parser.add_argument("--accounts", type=int, default=100_000)
+    parser.add_argument("--transfers", type=int, default=1_000_000)
+    parser.add_argument("--chunk-size", type=int, default=50_000)
+    parser.add_argument("--keep-indexes", action="store_true")
+    parser.add_argument("--invalid", type=int, default=0, help="Her N satırda bir hatalı satır (0: yok)")
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="seed_bench_")
+    os.environ["DATABASE_PATH"] = os.path.join(tmp, "accounts.db")
+    os.environ["MERCHANTS_DB"] = os.path.join(tmp, "merchants.db")
+
+    import migrations
+    import seed
+
+    migrations.migrate()
+    accounts_csv = os.path.join(tmp, "accounts.csv")
+    transfers_csv = os.path.join(tmp, "transfers.csv")
+    started = time.perf_counter()
+    write_accounts(accounts_csv, args.accounts, args.invalid)
+    write_transfers(transfers_csv, args.transfers, args.accounts, args.invalid)
+    print(f"CSV üretimi: {time.perf_counter() - started:.1f} sn "
+          f"({(os.path.getsize(accounts_csv) + os.path.getsize(transfers_csv)) / 1e6:.0f} MB)")
+    baseline = maxrss_mb()
+
+    conn = seed.connect()
+    for table, path in (("accounts", accounts_csv), ("transfers", transfers_csv)):
+        with open(path, newline="", encoding="utf-8") as f:
+            report = seed.load_file(conn, seed.SEED_TABLES[table], f, args.chunk_size, not args.keep_indexes)
+        print(f"{table:10s} {report['accepted']:>9d} yüklendi {report['rejected']:>6d} reddedildi "
+              f"{report['seconds']:>7.2f} sn {report['rows_per_second']:>8d} satır/sn "
+              f"(indeks {report['index_seconds']:.2f} sn)")
+    print(f"maxrss: {maxrss_mb():.0f} MB (yükleme öncesi {baseline:.0f} MB)")
+
+    journal = conn.execute("SELECT COUNT(*) FROM balance_journal").fetchone()[0]
+    indexes = conn.execute("SELECT COUNT(*) FROM sqlite_master WHERE type = 'index' AND name LIKE 'idx_%'").fetchone()[0]
+    print(f"defter satırı: {journal}, indeks: {indexes}/{len(migrations.INDEXES) + 1}")  # + tekil telefon indeksi
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
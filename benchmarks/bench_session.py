@@ -0,0 +1,69 @@
+"""Oturum doğrulama maliyeti mikro testi.
+
+İstek başına kimlik doğrulama yolunu karşılaştırır: eski "id:isim:bakiye"
+çerezini ayrıştırıp hesabı SQLite'tan okumak, HMAC anahtarını her seferinde
+yeniden işleyerek doğrulamak ve önbelleğe alınmış HMAC durumuyla doğrulamak.
+
+    python benchmarks/bench_session.py --iterations 200000
+"""
+import argparse
+import base64
+import hashlib
+import hmac
+import os
+import sqlite3
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from session import SessionSigner  # noqa: E402
+
+SECRET = b"bench-secret-0123456789abcdef0123"
+
+
+def legacy(conn, cookie):
+    user_id, _, _ = cookie.split(":")
+    return conn.execute("SELECT id, name, phone, created_at, balance FROM accounts WHERE id = ?", (int(user_id),)).fetchone()
+
+
+class UncachedSigner(SessionSigner):
+    """Anahtarı her imzada hmac.new ile yeniden işleyen karşılaştırma sürümü"""
+
+    def _signature(self, payload):
+        return base64.urlsafe_b64encode(hmac.new(SECRET, payload, hashlib.sha256).digest()).rstrip(b"=")
+
+
+def measure(label, fn, iterations):
+    started = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    elapsed = time.perf_counter() - started
+    print(f"{label:<34} {elapsed / iterations * 1e6:7.2f} µs/istek")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=200_000)
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE accounts (id INTEGER PRIMARY KEY, name TEXT, phone TEXT, created_at TEXT, balance INTEGER)")
+    conn.executemany("INSERT INTO accounts VALUES (?, 'user', '555', '2024-01-01', 10000)", ((i,) for i in range(1, 10001)))
+
+    signer = SessionSigner(SECRET)
+    uncached = UncachedSigner(SECRET)
+    token = signer.issue(4242)
+    # Önbellekli durumlar standart HMAC ile aynı imzayı üretmeli
+    assert uncached.issue(4242, now=0) == signer.issue(4242, now=0)
+    assert signer.verify(token).user_id == 4242
+
+    measure("eski çerez + SQLite sorgusu", lambda: legacy(conn, "4242:Ali Veli:100.0"), args.iterations)
+    measure("HMAC (anahtar her istekte işlenir)", lambda: uncached.verify(token), args.iterations)
+    measure("HMAC (önbellekli anahtar)", lambda: signer.verify(token), args.iterations)
+    measure("belirteç üretimi", lambda: signer.issue(4242), args.iterations)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""Hesap bölüşme borç sadeleştirme testi.
+
+Binlerce açık borcu (IOU) olan bir grup oluşturur; borçların çift başına tek
+satıra yazılma hızını, net bakiye + heap eşleştirme süresini ve hesaplaşmanın
+ledger üzerinden tek işlemde uygulanma süresini geçici bir veritabanında ölçer.
+Üretilen transfer sayısı ham borç sayısıyla karşılaştırılır (en fazla N-1).
+
+    python benchmarks/bench_split.py --members 500 --ious 200000
+"""
+import argparse
+import asyncio
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--members", type=int, default=500)
+    parser.add_argument("--ious", type=int, default=200_000)
+    args = parser.parse_args()
+
+    os.environ["DATABASE_PATH"] = os.path.join(tempfile.mkdtemp(prefix="bp-bench-"), "accounts.db")
+    from migrations import migrate
+    migrate()
+    from ledger import LedgerWriter
+    from splits import add_debts, net_balances, settlement_plan, simplify
+
+    conn = sqlite3.connect(os.environ["DATABASE_PATH"])
+    conn.executemany(
+        "INSERT INTO accounts (name, phone, created_at, balance) VALUES (?, ?, ?, ?)",
+        ((f"user{i}", f"555{i:07d}", "2024-01-01T00:00:00", 100_000_000) for i in range(args.members))
+    )
+    conn.execute("INSERT INTO split_groups (name, created_at) VALUES ('bench', '2024-01-01T00:00:00')")
+    conn.executemany(
+        "INSERT INTO split_members (group_id, account_id) VALUES (1, ?)", ((i,) for i in range(1, args.members + 1))
+    )
+    conn.commit()
+
+    rnd = random.Random(42)
+    ious = [
+        (rnd.randint(1, args.members), rnd.randint(1, args.members), rnd.randint(1, 5000))
+        for _ in range(args.ious)
+    ]
+    started = time.perf_counter()
+    add_debts(conn.cursor(), 1, ious)
+    conn.commit()
+    elapsed = time.perf_counter() - started
+    edges = conn.execute("SELECT COUNT(*) FROM split_debts WHERE group_id = 1").fetchone()[0]
+    print(f"{args.ious} borç kaydı: {elapsed:.2f} sn ({args.ious / elapsed:,.0f} borç/sn), {edges} çift satırı")
+
+    started = time.perf_counter()
+    balances = net_balances(conn, 1)
+    read = time.perf_counter() - started
+    started = time.perf_counter()
+    transfers = simplify(balances)
+    matched = time.perf_counter() - started
+    print(f"net bakiye: {read * 1000:.1f} ms, heap eşleştirme: {matched * 1000:.1f} ms")
+    print(f"transfer sayısı: {len(transfers)} (ham borç {args.ious}, çift {edges}, üye sınırı {args.members - 1})")
+    assert len(transfers) <= args.members - 1
+    assert len(settlement_plan(conn, 1)) == len(transfers)
+    conn.close()
+
+    async def settle():
+        writer = LedgerWriter(os.environ["DATABASE_PATH"])
+        await writer.start()
+        started = time.perf_counter()
+        result = await writer.settle_split(1)
+        elapsed = time.perf_counter() - started
+        await writer.stop()
+        return result, elapsed
+
+    result, elapsed = asyncio.run(settle())
+    print(f"ledger hesaplaşma: {len(result)} transfer tek işlemde, {elapsed * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
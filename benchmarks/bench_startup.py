@@ -0,0 +1,83 @@
+"""Uygulama açılışında şema hazırlama maliyeti.
+
+Eski düzende her import, tüm CREATE TABLE / CREATE INDEX ifadelerini iki ayrı
+veritabanına karşı yeniden çalıştırıyordu. Sürümlü migration çalıştırıcısı
+ise şema güncelse yalnızca `PRAGMA user_version` okur. Bu betik ilk kurulumu,
+sonraki açılışları ve her açılışta DDL'i yeniden çalıştırmayı karşılaştırır;
+her açılışta çalışan DDL ifadelerini de sayar.
+
+    python benchmarks/bench_startup.py --iterations 200
+"""
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+os.environ["MERCHANTS_DB"] = os.path.join(tempfile.mkdtemp(prefix="bp-bench-"), "merchants.db")
+
+import migrations  # noqa: E402
+
+DDL_PREFIXES = ("CREATE", "ALTER", "DROP")
+
+
+def count_ddl(fn):
+    """`sqlite3.connect` ile açılan bağlantılarda çalışan DDL ifadelerini say"""
+    statements = []
+    connect = sqlite3.connect
+
+    def traced(*args, **kwargs):
+        conn = connect(*args, **kwargs)
+        conn.set_trace_callback(statements.append)
+        return conn
+
+    sqlite3.connect = traced
+    try:
+        fn()
+    finally:
+        sqlite3.connect = connect
+    return sum(1 for sql in statements if sql.lstrip().upper().startswith(DDL_PREFIXES))
+
+
+def rerun_ddl(path):
+    """Eski davranış: her açılışta tüm tablo ve indeks tanımlarını çalıştır"""
+    conn = sqlite3.connect(path)
+    for ddl in migrations.TABLES.values():
+        conn.execute(ddl)
+    for ddl in migrations.INDEXES:
+        conn.execute(ddl)
+    conn.commit()
+    conn.close()
+
+
+def measure(label, fn, iterations):
+    started = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    elapsed = time.perf_counter() - started
+    print(f"{label:<32} {elapsed / iterations * 1000:8.3f} ms/açılış")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=200)
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(prefix="bp-bench-"), "accounts.db")
+
+    started = time.perf_counter()
+    ddl = count_ddl(lambda: migrations.migrate(path))
+    print(f"{'ilk kurulum':<32} {(time.perf_counter() - started) * 1000:8.3f} ms  ({ddl} DDL)")
+
+    print(f"sonraki açılışta DDL: migrate={count_ddl(lambda: migrations.migrate(path))}  "
+          f"eski={count_ddl(lambda: rerun_ddl(path))}")
+    measure("migrate (şema güncel)", lambda: migrations.migrate(path), args.iterations)
+    measure("her açılışta DDL", lambda: rerun_ddl(path), args.iterations)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+"""Storage arka uçları için eşzamanlı transfer testi.
+
+Birden fazla süreç (uvicorn worker'ları / sunucular gibi) aynı hesaplar
+arasında rastgele transferler yapar. Sonunda toplam bakiyenin korunduğu,
+hiçbir bakiyenin eksiye düşmediği ve kabul edilen transfer sayısının tabloyla
+tuttuğu ve bakiyelerin bakiye defteriyle uyuştuğu kontrol edilir.
+
+    python benchmarks/bench_storage.py --backend sqlite --workers 4
+    python benchmarks/bench_storage.py --backend postgres --dsn postgresql://localhost/bp_bench --workers 4
+
+Postgres testi için geçici bir veritabanı kullanın; tablolar boşaltılır.
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def configure(args):
+    os.environ["STORAGE_BACKEND"] = args.backend
+    if args.backend == "postgres":
+        os.environ["DATABASE_URL"] = args.dsn
+    else:
+        os.environ["DATABASE_PATH"] = args.path
+        os.environ["MERCHANTS_DB"] = os.path.join(os.path.dirname(args.path), "merchants.db")
+
+
+async def seed(args):
+    from storage import storage
+
+    if args.backend == "sqlite":
+        from migrations import migrate
+        migrate()
+    await storage.start()
+    if args.backend == "postgres":
+        async with storage._pool.acquire() as conn:
+            await conn.execute("TRUNCATE balance_journal, transfers, accounts RESTART IDENTITY")
+    for i in range(args.accounts):
+        await storage.create_account(f"user{i}", f"555{i:07d}", datetime.now(), args.balance)
+    await storage.close()
+
+
+async def work(args, seed_value, results):
+    from ledger import LedgerError, ledger
+    from storage import storage
+
+    rng = random.Random(seed_value)
+    if args.backend == "sqlite":
+        await ledger.start()
+    await storage.start()
+    semaphore = asyncio.Semaphore(args.concurrency)
+    latencies = []
+    accepted = rejected = 0
+
+    async def one():
+        nonlocal accepted, rejected
+        sender, receiver = rng.sample(range(1, args.accounts + 1), 2)
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                await storage.transfer(sender, receiver, rng.randint(1, args.max_amount))
+                accepted += 1
+            except LedgerError:
+                rejected += 1
+            latencies.append(time.perf_counter() - started)
+
+    await asyncio.gather(*(one() for _ in range(args.requests)))
+    await storage.close()
+    if args.backend == "sqlite":
+        await ledger.stop()
+    results.put((accepted, rejected, latencies))
+
+
+def run_worker(args, seed_value, results):
+    configure(args)
+    asyncio.run(work(args, seed_value, results))
+
+
+async def verify(args):
+    from storage import storage
+
+    await storage.start()
+    total = negative = count = 0
+    async for rows in storage.iter_accounts(0):
+        total += sum(row[4] for row in rows)
+        negative += sum(1 for row in rows if row[4] < 0)
+    if args.backend == "postgres":
+        count = await storage._pool.fetchval("SELECT COUNT(*) FROM transfers")
+        unreconciled = await storage._pool.fetchval(
+            "SELECT COUNT(*) FROM accounts a WHERE balance <> "
+            "(SELECT COALESCE(SUM(delta), 0) FROM balance_journal j WHERE j.account_id = a.id)"
+        )
+    else:
+        from balances import reconcile
+        count = await storage.database.run(lambda conn: conn.execute("SELECT COUNT(*) FROM transfers").fetchone()[0])
+        unreconciled = await storage.database.run(lambda conn: sum(1 for _ in reconcile(conn, full=True)))
+    await storage.close()
+    return total, negative, count, unreconciled
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--backend", choices=["sqlite", "postgres"], default="sqlite")
+    parser.add_argument("--dsn", default=os.environ.get("DATABASE_URL"))
+    parser.add_argument("--workers", type=int, default=4, help="Süreç sayısı")
+    parser.add_argument("--accounts", type=int, default=50)
+    parser.add_argument("--balance", type=int, default=10_000)
+    parser.add_argument("--max-amount", type=int, default=5_000)
+    parser.add_argument("--requests", type=int, default=2000, help="Süreç başına transfer")
+    parser.add_argument("--concurrency", type=int, default=32, help="Süreç başına eşzamanlı transfer")
+    args = parser.parse_args()
+    if args.backend == "postgres" and not args.dsn:
+        parser.error("--dsn veya DATABASE_URL gerekli")
+    args.path = os.path.join(tempfile.mkdtemp(prefix="bp-bench-"), "accounts.db")
+
+    configure(args)
+    asyncio.run(seed(args))
+
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    started = time.perf_counter()
+    workers = [context.Process(target=run_worker, args=(args, i, results)) for i in range(args.workers)]
+    for worker in workers:
+        worker.start()
+    outcomes = [results.get() for _ in workers]
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - started
+
+    accepted = sum(o[0] for o in outcomes)
+    rejected = sum(o[1] for o in outcomes)
+    latencies = sorted(latency for o in outcomes for latency in o[2])
+    total, negative, count, unreconciled = asyncio.run(verify(args))
+
+    requests = args.workers * args.requests
+    print(f"arka uç: {args.backend}  süreç: {args.workers}  transfer: {requests}  kabul: {accepted}  red: {rejected}")
+    print(f"süre: {elapsed:.2f} sn  throughput: {requests / elapsed:.0f} transfer/sn")
+    print(f"p50: {latencies[len(latencies) // 2] * 1000:.2f} ms  p99: {latencies[int(len(latencies) * 0.99)] * 1000:.2f} ms")
+    expected = args.accounts * args.balance
+    print(f"toplam bakiye: {total} (beklenen {expected})  eksi bakiye: {negative}  transfer satırı: {count}  "
+          f"defterle uyuşmayan hesap: {unreconciled}")
+    if total != expected or negative or count != accepted or unreconciled:
+        sys.exit("TUTARSIZLIK")
+
+
+if __name__ == "__main__":
+    main()
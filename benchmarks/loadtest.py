@@ -0,0 +1,355 @@
+"""Ödeme API'si için tekrarlanabilir yük testi.
+
+Sentetik hesap ve işletmeleri (10 bin - 10 milyon satır) bir SQLite
+veritabanına yükler, ardından /api/topup, /transfers/, /login, /accounts/ ve
+/merchants/ uçlarına ayarlanabilir bir karışımla istek gönderir. İstekler
+süreç içinde (ASGI) ya da gerçek bir HTTP sunucusuna gönderilebilir. Sonuç
+(throughput, p50/p95/p99 gecikme, durum kodları, kilit/kuyruk hataları)
+commit bilgisiyle birlikte JSON olarak yazılır. `--baseline` ile önceki bir
+sonuçla karşılaştırılır; gerileme eşiği aşılırsa çıkış kodu 1 olur.
+
+    python benchmarks/loadtest.py --accounts 100000 --requests 20000 --concurrency 64 --output run.json
+    python benchmarks/loadtest.py --target http --spawn 4 --mix topup=50,transfer=50
+    python benchmarks/loadtest.py --target http --url http://localhost:8000 --db accounts.db --reuse
+    python benchmarks/loadtest.py --baseline main.json --max-regression 0.15
+
+Harici sunucuya karşı çalışırken sunucu aynı `--db` dosyasını (DATABASE_PATH)
+ve aynı SESSION_SECRET değerini kullanmalıdır; `--spawn` bunu kendisi ayarlar.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+OPERATIONS = ("topup", "transfer", "login", "accounts", "merchants")
+DEFAULT_MIX = "topup=30,transfer=30,login=10,accounts=20,merchants=10"
+CATEGORIES = ("cafe", "market", "transport", "other")
+
+# Kilit çekişmesi / kuyruk doluluğu belirtileri (DatabaseBusy, PoolTimeout, "database is locked")
+CONTENTION_STATUS = 503
+CONTENTION_TEXT = "locked"
+
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in OPERATIONS:
+            raise argparse.ArgumentTypeError(f"bilinmeyen işlem: {name} ({', '.join(OPERATIONS)})")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def seed(path, accounts, merchants, balance, chunk_size=100_000, reuse=False):
+    """Şemayı kur ve eksik hesap/işletme satırlarını tek işlemde parça parça ekle"""
+    from migrations import migrate
+
+    migrate(path)
+    conn = sqlite3.connect(path, isolation_level=None)
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute("PRAGMA synchronous = OFF")
+    timings = {}
+    for table, target, rows in (
+        ("accounts", accounts, lambda start, stop: (
+            (f"user{i}", f"5{i:09d}", "2024-01-01T00:00:00", balance) for i in range(start, stop))),
+        ("merchants", merchants, lambda start, stop: (
+            (f"merchant{i}", CATEGORIES[i % len(CATEGORIES)]) for i in range(start, stop))),
+    ):
+        existing = conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+        if existing and not reuse:
+            raise SystemExit(f"{path} zaten {existing} {table} satırı içeriyor (--reuse ile kullanın)")
+        started = time.perf_counter()
+        sql = ("INSERT INTO accounts (name, phone, created_at, balance) VALUES (?, ?, ?, ?)"
+               if table == "accounts" else "INSERT INTO merchants (name, category) VALUES (?, ?)")
+        conn.execute("BEGIN")
+        for offset in range(existing, target, chunk_size):
+            conn.executemany(sql, rows(offset, min(offset + chunk_size, target)))
+        conn.execute("COMMIT")
+        timings[table] = {
+            "rows": max(target, existing),
+            "inserted": max(target - existing, 0),
+            "seconds": round(time.perf_counter() - started, 3),
+        }
+    conn.close()
+    return timings
+
+
+def percentile(values, q):
+    """Sıralı listede en yakın sıra yöntemiyle yüzdelik"""
+    if not values:
+        return None
+    return values[min(len(values) - 1, max(0, int(round(q / 100 * len(values))) - 1))]
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies = {op: [] for op in OPERATIONS}
+        self.status = {op: {} for op in OPERATIONS}
+        self.contention = {op: 0 for op in OPERATIONS}
+        self.transport_errors = {op: 0 for op in OPERATIONS}
+
+    def record(self, op, latency, status, body=""):
+        self.latencies[op].append(latency)
+        key = str(status)
+        self.status[op][key] = self.status[op].get(key, 0) + 1
+        if status == CONTENTION_STATUS or (status >= 500 and CONTENTION_TEXT in body):
+            self.contention[op] += 1
+
+    def summary(self, elapsed, ops=OPERATIONS):
+        """Verilen işlemlerin birleşik özeti"""
+        latencies = sorted(latency for op in ops for latency in self.latencies[op])
+        status = {}
+        for op in ops:
+            for code, count in self.status[op].items():
+                status[code] = status.get(code, 0) + count
+        transport_errors = sum(self.transport_errors[op] for op in ops)
+        errors = sum(n for code, n in status.items() if not code.startswith(("2", "3")))
+        return {
+            "requests": len(latencies),
+            "errors": errors + transport_errors,
+            "contention_errors": sum(self.contention[op] for op in ops),
+            "transport_errors": transport_errors,
+            "throughput_rps": round(len(latencies) / elapsed, 1) if elapsed else None,
+            "p50_ms": _ms(percentile(latencies, 50)),
+            "p95_ms": _ms(percentile(latencies, 95)),
+            "p99_ms": _ms(percentile(latencies, 99)),
+            "max_ms": _ms(latencies[-1] if latencies else None),
+            "status": status,
+        }
+
+
+def _ms(seconds):
+    return round(seconds * 1000, 3) if seconds is not None else None
+
+
+def build_request(op, rng, args, signer):
+    """(metot, yol, httpx kwargs) üret; hesap seçimi `--hot-accounts` ile daraltılabilir"""
+    pool = args.hot_accounts or args.accounts
+    account_id = rng.randint(1, pool)
+    if op == "topup":
+        return "POST", "/api/topup", {
+            "json": {"amount": rng.randint(1, 10_000)},
+            "headers": {"Cookie": f"session={signer.issue(account_id)}"},
+        }
+    if op == "transfer":
+        to_account_id = rng.randint(1, pool - 1)
+        if to_account_id >= account_id:
+            to_account_id += 1
+        return "POST", "/transfers/", {"json": {
+            "from_account_id": account_id, "to_account_id": to_account_id, "amount": rng.randint(1, 1_000),
+        }}
+    if op == "login":
+        return "POST", "/login", {"json": {"user_id": account_id}}
+    if op == "accounts":
+        if rng.random() < 0.5:
+            return "GET", f"/accounts/{account_id}", {}
+        return "GET", "/accounts/", {"params": {"after": rng.randint(0, args.accounts), "limit": 50}}
+    return "GET", "/merchants/", {"params": {"after": rng.randint(0, args.merchants), "limit": 50}}
+
+
+async def drive(client, args, recorder, signer):
+    """Kapalı döngü yük: `concurrency` işçi sıradaki isteği alıp yanıtı bekler"""
+    rng = random.Random(args.seed)
+    names = list(args.mix)
+    ops = rng.choices(names, weights=[args.mix[n] for n in names], k=args.warmup + args.requests)
+    requests = [(op, build_request(op, rng, args, signer)) for op in ops]
+
+    async def phase(items, record):
+        queue = iter(items)
+
+        async def worker():
+            for op, (method, path, kwargs) in queue:
+                started = time.perf_counter()
+                try:
+                    response = await client.request(method, path, **kwargs)
+                except Exception:
+                    if record:
+                        recorder.transport_errors[op] += 1
+                    continue
+                if record:
+                    body = response.text if response.status_code >= 500 else ""
+                    recorder.record(op, time.perf_counter() - started, response.status_code, body)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+        return time.perf_counter() - started
+
+    # Isınma istekleri ölçüme girmez; süre yalnızca ölçülen kısım için tutulur
+    await phase(requests[:args.warmup], record=False)
+    return await phase(requests[args.warmup:], record=True)
+
+
+async def run_asgi(args, recorder, signer):
+    import httpx
+    from app import app
+
+    # ASGITransport lifespan olaylarını çalıştırmadığı için startup/shutdown burada yapılır
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://loadtest") as client:
+            return await drive(client, args, recorder, signer)
+
+
+async def run_http(args, recorder, signer):
+    import httpx
+
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=args.url, limits=limits, timeout=args.timeout) as client:
+        return await drive(client, args, recorder, signer)
+
+
+def spawn_server(args, env):
+    """uvicorn'u verilen worker sayısıyla başlat ve hazır olmasını bekle"""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app:app", "--host", "127.0.0.1", "--port", str(port),
+         "--workers", str(args.spawn), "--log-level", "warning", "--no-access-log"],
+        cwd=ROOT, env=env,
+    )
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.5):
+                break
+        except OSError:
+            if process.poll() is not None:
+                raise SystemExit("uvicorn başlatılamadı")
+            time.sleep(0.1)
+    else:
+        process.terminate()
+        raise SystemExit("uvicorn 30 sn içinde hazır olmadı")
+    return process, f"http://127.0.0.1:{port}"
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(report, baseline, threshold):
+    """Throughput düşüşü veya p95 artışı eşiği aşan metrikleri listele"""
+    regressions = []
+    pairs = [("total", report["total"], baseline["total"])]
+    pairs += [(op, report["operations"][op], baseline["operations"][op])
+              for op in report["operations"] if op in baseline.get("operations", {})]
+    for name, current, previous in pairs:
+        if previous.get("throughput_rps") and current["throughput_rps"] < previous["throughput_rps"] * (1 - threshold):
+            regressions.append(f"{name}: throughput {previous['throughput_rps']} -> {current['throughput_rps']} istek/sn")
+        if previous.get("p95_ms") and current["p95_ms"] and current["p95_ms"] > previous["p95_ms"] * (1 + threshold):
+            regressions.append(f"{name}: p95 {previous['p95_ms']} -> {current['p95_ms']} ms")
+        if current["contention_errors"] > previous.get("contention_errors", 0):
+            regressions.append(f"{name}: kilit hatası {previous.get('contention_errors', 0)} -> {current['contention_errors']}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--target", choices=["asgi", "http"], default="asgi")
+    parser.add_argument("--url", help="Harici sunucu adresi (--target http)")
+    parser.add_argument("--spawn", type=int, default=0, help="Bu sayıda worker ile uvicorn başlat (--target http)")
+    parser.add_argument("--db", help="Veritabanı dosyası (varsayılan: geçici dizin)")
+    parser.add_argument("--reuse", action="store_true", help="Mevcut satırları kullan, yalnızca eksikleri ekle")
+    parser.add_argument("--accounts", type=int, default=10_000)
+    parser.add_argument("--merchants", type=int, default=1_000)
+    parser.add_argument("--balance", type=int, default=1_000_000, help="Başlangıç bakiyesi (kuruş)")
+    parser.add_argument("--hot-accounts", type=int, default=0, help="Hareketleri ilk N hesapta yoğunlaştır")
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix(DEFAULT_MIX), help=f"Varsayılan: {DEFAULT_MIX}")
+    parser.add_argument("--requests", type=int, default=10_000)
+    parser.add_argument("--warmup", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--seed", type=int, default=1, help="Rastgele üreteç tohumu (aynı tohum aynı istek dizisi)")
+    parser.add_argument("--session-secret", default=os.environ.get("SESSION_SECRET", "loadtest-secret"))
+    parser.add_argument("--output", help="JSON raporu bu dosyaya yaz (varsayılan: stdout)")
+    parser.add_argument("--baseline", help="Karşılaştırılacak önceki JSON raporu")
+    parser.add_argument("--max-regression", type=float, default=0.15, help="İzin verilen göreli gerileme")
+    args = parser.parse_args()
+    if args.target == "http" and not (args.url or args.spawn):
+        parser.error("--target http için --url veya --spawn gerekli")
+    if args.hot_accounts > args.accounts:
+        parser.error("--hot-accounts hesap sayısından büyük olamaz")
+
+    args.db = os.path.abspath(args.db or os.path.join(tempfile.mkdtemp(prefix="bp-load-"), "accounts.db"))
+    os.environ["DATABASE_PATH"] = args.db
+    # Depodaki eski merchants.db test veritabanına aktarılmasın
+    os.environ.setdefault("MERCHANTS_DB", os.path.join(os.path.dirname(args.db), "merchants.db"))
+    os.environ["SESSION_SECRET"] = args.session_secret
+    # Tüm istekler tek IP'den gelir; sınırları ölçmek için RATE_LIMIT=1 verin
+    os.environ.setdefault("RATE_LIMIT", "0")
+    os.chdir(ROOT)
+
+    print(f"veri hazırlanıyor: {args.db}", file=sys.stderr)
+    seeded = seed(args.db, args.accounts, args.merchants, args.balance, reuse=args.reuse)
+
+    from session import signer
+
+    recorder = Recorder()
+    server = None
+    try:
+        if args.target == "asgi":
+            elapsed = asyncio.run(run_asgi(args, recorder, signer))
+        else:
+            if args.spawn:
+                server, args.url = spawn_server(args, dict(os.environ))
+            elapsed = asyncio.run(run_http(args, recorder, signer))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    operations = {op: recorder.summary(elapsed, (op,)) for op in OPERATIONS if recorder.latencies[op]}
+    report = {
+        "commit": git_commit(),
+        "timestamp": datetime.now().isoformat(),
+        "target": args.target if not args.url else args.url,
+        "config": {
+            "accounts": args.accounts, "merchants": args.merchants, "hot_accounts": args.hot_accounts,
+            "mix": args.mix, "requests": args.requests, "warmup": args.warmup,
+            "concurrency": args.concurrency, "workers": args.spawn or 1, "seed": args.seed,
+        },
+        "seed": seeded,
+        "elapsed_s": round(elapsed, 3),
+        "total": recorder.summary(elapsed),
+        "operations": operations,
+    }
+
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    total = report["total"]
+    print(f"{total['requests']} istek, {total['throughput_rps']} istek/sn, p50 {total['p50_ms']} ms, "
+          f"p95 {total['p95_ms']} ms, p99 {total['p99_ms']} ms, hata {total['errors']} "
+          f"(kilit {total['contention_errors']})", file=sys.stderr)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare(report, json.load(f), args.max_regression)
+        for line in regressions:
+            print(f"GERİLEME {line}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""Aylık kategori bütçeleri ve harcama toplamları.
+
+Limitler ve toplamlar tamsayı kuruştur. Her ödeme `spending_totals` tablosundaki (hesap, kategori, ay) toplamını aynı
+işlem içinde artırır; bütçe durumu ve eşik uyarıları bu hazır toplamlardan tek
+satır okunarak hesaplanır.
+"""
+from datetime import datetime
+
+CATEGORIES = ("cafe", "market", "transport", "other")
+
+# Uyarı eşikleri (bütçenin yüzdesi)
+THRESHOLDS = (80, 100)
+
+SPENDING_UPSERT = """
+INSERT INTO spending_totals (account_id, category, month, total) VALUES (?, ?, ?, ?)
+ON CONFLICT (account_id, category, month) DO UPDATE SET total = total + excluded.total
+"""
+
+
+def month_key(moment=None):
+    """'YYYY-MM' biçiminde ay anahtarı"""
+    return (moment or datetime.now()).strftime("%Y-%m")
+
+
+def crossed_thresholds(before, after, limit):
+    """Harcama `before` değerinden `after` değerine çıkarken geçilen eşikler"""
+    if not limit:
+        return []
+    return [t for t in THRESHOLDS if before * 100 < limit * t <= after * 100]
+
+
+def alert_level(spent, limit):
+    """Ulaşılan en yüksek eşik (yoksa None)"""
+    reached = [t for t in THRESHOLDS if limit and spent * 100 >= limit * t]
+    return reached[-1] if reached else None
+
+
+def apply_spending(cursor, account_id, category, amount, moment):
+    """Ödemeyi aylık toplama ekle ve geçilen bütçe eşiklerini döndür"""
+    month = month_key(moment)
+    cursor.execute(
+        "SELECT total FROM spending_totals WHERE account_id = ? AND category = ? AND month = ?",
+        (account_id, category, month)
+    )
+    row = cursor.fetchone()
+    before = row[0] if row else 0
+    cursor.execute(SPENDING_UPSERT, (account_id, category, month, amount))
+
+    cursor.execute(
+        "SELECT monthly_limit FROM budgets WHERE account_id = ? AND category = ?",
+        (account_id, category)
+    )
+    budget = cursor.fetchone()
+    return crossed_thresholds(before, before + amount, budget[0] if budget else None)
+
+
+def budget_status(conn, account_id, month):
+    """Hesabın tüm kategorileri için (kategori, limit, harcanan) satırları"""
+    return conn.execute("""
+        SELECT b.category, b.monthly_limit, COALESCE(s.total, 0)
+        FROM budgets b
+        LEFT JOIN spending_totals s
+          ON s.account_id = b.account_id AND s.category = b.category AND s.month = ?
+        WHERE b.account_id = ?
+        ORDER BY b.category
+    """, (month, account_id)).fetchall()
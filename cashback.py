@@ -0,0 +1,121 @@
+"""Cashback kampanya kuralları.
+
+Kampanyalar `cashback_campaigns` tablosunda veri olarak tanımlanır ve
+uygulama başlarken bir kez işletme ID'si / kategori anahtarlı bir indekse
+derlenir. Bir ödeme için yalnızca o işletmeye, o kategoriye veya tüm
+ödemelere bağlı kurallar değerlendirilir; aktif kampanya sayısı arttıkça ödeme
+başına maliyet artmaz. "İlk ödeme" kampanyalarının durumu
+`cashback_first_payments` tablosunda (hesap, kampanya) birincil anahtarıyla
+tutulur.
+"""
+from dataclasses import dataclass
+from typing import Optional
+
+from balances import record
+
+# Tablo boşsa eklenen varsayılan kampanyalar (README'deki örnekler)
+DEFAULT_CAMPAIGNS = (
+    ("Kafe kategorisinde %5 iade", "percent", 5.0, "cafe", None, None, 0, None),
+    ("İlk QR ödeme 20 TL iade", "fixed", 2000, None, None, "qr", 1, None),
+)
+
+CAMPAIGN_COLUMNS = "id, name, kind, value, category, merchant_id, channel, first_payment_only, max_amount"
+
+
+@dataclass(frozen=True)
+class Campaign:
+    id: int
+    name: str
+    kind: str  # "percent" veya "fixed"
+    value: float  # percent: yüzde, fixed: kuruş
+    category: Optional[str] = None
+    merchant_id: Optional[int] = None
+    channel: Optional[str] = None  # "qr", "direct" veya tümü için None
+    first_payment_only: bool = False
+    max_amount: Optional[int] = None  # kuruş
+
+    def amount_for(self, payment_amount):
+        """Kuruş cinsinden ödeme için kuruş cinsinden iade"""
+        if self.kind == "percent":
+            amount = round(payment_amount * self.value / 100)
+        else:
+            amount = int(self.value)
+        if self.max_amount is not None:
+            amount = min(amount, self.max_amount)
+        return min(amount, payment_amount)
+
+
+class CompiledRules:
+    """Kampanyaların işletme ve kategori anahtarlı indeksi"""
+
+    def __init__(self, campaigns):
+        self.by_merchant = {}
+        self.by_category = {}
+        self.unscoped = []
+        for campaign in campaigns:
+            if campaign.merchant_id is not None:
+                self.by_merchant.setdefault(campaign.merchant_id, []).append(campaign)
+            elif campaign.category is not None:
+                self.by_category.setdefault(campaign.category, []).append(campaign)
+            else:
+                self.unscoped.append(campaign)
+        self.size = len(campaigns)
+
+    def match(self, merchant_id, category, channel):
+        """Ödemeye uyan kampanyalar; yalnızca ilgili indeks kovaları taranır"""
+        matched = []
+        for bucket in (
+            self.by_merchant.get(merchant_id, ()),
+            self.by_category.get(category, ()),
+            self.unscoped,
+        ):
+            for campaign in bucket:
+                # İşletmeye bağlı kampanya ayrıca kategori şartı taşıyabilir
+                if campaign.category is not None and campaign.category != category:
+                    continue
+                if campaign.channel is None or campaign.channel == channel:
+                    matched.append(campaign)
+        return matched
+
+
+def load_campaigns(conn):
+    """Aktif kampanyaları oku; tablo hiç doldurulmamışsa varsayılanları ekle"""
+    if conn.execute("SELECT COUNT(*) FROM cashback_campaigns").fetchone()[0] == 0:
+        conn.executemany(
+            "INSERT INTO cashback_campaigns (name, kind, value, category, merchant_id, channel, first_payment_only, max_amount) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            DEFAULT_CAMPAIGNS
+        )
+        conn.commit()
+    rows = conn.execute(f"SELECT {CAMPAIGN_COLUMNS} FROM cashback_campaigns WHERE active = 1 ORDER BY id").fetchall()
+    return [Campaign(*row[:7], bool(row[7]), row[8]) for row in rows]
+
+
+def apply_cashback(cursor, rules, account_id, payment_id, merchant_id, category, channel, amount, created_at):
+    """Uyan kampanyaların iadesini hesapla, kaydet ve toplam iadeyi döndür.
+
+    Bakiye güncellemesi çağıranın işlemi içinde yapılır; böylece iade ödemeyle
+    aynı commit'te cüzdana yansır.
+    """
+    total = 0
+    for campaign in rules.match(merchant_id, category, channel):
+        if campaign.first_payment_only:
+            cursor.execute(
+                "INSERT OR IGNORE INTO cashback_first_payments (account_id, campaign_id) VALUES (?, ?)",
+                (account_id, campaign.id)
+            )
+            if cursor.rowcount == 0:
+                continue
+        credit = campaign.amount_for(amount)
+        if credit <= 0:
+            continue
+        cursor.execute(
+            "INSERT INTO cashback_credits (payment_id, account_id, campaign_id, amount, created_at) VALUES (?, ?, ?, ?, ?)",
+            (payment_id, account_id, campaign.id, credit, created_at)
+        )
+        total += credit
+
+    if total:
+        cursor.execute("UPDATE accounts SET balance = balance + ? WHERE id = ?", (total, account_id))
+        record(cursor, [(account_id, total, "cashback", payment_id)], created_at)
+    return total
@@ -4,12 +4,12 @@ conn = sqlite3.connect('accounts.db')
 cursor = conn.cursor()
 
 # Tüm iş yerlerini çekme
-cursor.execute("SELECT * FROM account")
+cursor.execute("SELECT id, name, phone, created_at, balance FROM accounts ORDER BY id")
 rows = cursor.fetchall()
 
-# Verileri yazdırma
+# Verileri yazdırma (bakiye kuruş cinsinden)
 for row in rows:
-    print(f"ID: {row[0]}, İsim: {row[2]}, Telefon: {row[3]}, Bakiye: {row[5]}")
+    print(f"ID: {row[0]}, İsim: {row[1]}, Telefon: {row[2]}, Bakiye: {row[4] / 100:.2f} TL")
 
 # Veritabanını kapat
 conn.close(),
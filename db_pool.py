@@ -0,0 +1,228 @@
+import asyncio
+import contextvars
+import os
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+import metrics
+import migrations
+
+# Her yeni bağlantıda bir kez çalıştırılan PRAGMA ayarları
+DEFAULT_PRAGMAS = (
+    'PRAGMA encoding = "UTF-8"',
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA cache_size = -16000",
+    "PRAGMA mmap_size = 268435456",
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA busy_timeout = 5000",
+    "PRAGMA foreign_keys = ON",
+)
+
+
+class PoolTimeout(Exception):
+    """Havuzdan belirtilen süre içinde bağlantı alınamadı"""
+
+
+class DatabaseBusy(Exception):
+    """Veritabanı iş kuyruğu dolu"""
+
+
+class ConnectionPool:
+    """Sınırlı boyutlu, checkout tabanlı SQLite bağlantı havuzu.
+
+    Bağlantılar uzun ömürlüdür; PRAGMA ayarları yalnızca bağlantı açılırken
+    uygulanır ve sqlite3'ün `cached_statements` önbelleği sayesinde aynı SQL
+    metinleri tekrar derlenmez.
+    """
+
+    def __init__(self, database, size=8, timeout=5.0, cached_statements=256, pragmas=DEFAULT_PRAGMAS):
+        self.database = database
+        self.size = size
+        self.timeout = timeout
+        self.cached_statements = cached_statements
+        self.pragmas = pragmas
+        self._idle = queue.LifoQueue(maxsize=size)
+        self._lock = threading.Lock()
+        self._created = 0
+        self._closed = False
+
+        # Havuz metrikleri
+        self.checkouts = 0
+        self.waits = 0
+        self.wait_time = 0.0
+        self.timeouts = 0
+
+    def _connect(self):
+        conn = sqlite3.connect(
+            self.database,
+            timeout=self.timeout,
+            check_same_thread=False,
+            cached_statements=self.cached_statements,
+        )
+        for pragma in self.pragmas:
+            conn.execute(pragma)
+        # Çalışan her ifade, aktif isteğin SQL sayacına yazılır
+        conn.set_trace_callback(metrics.count_statement)
+        return conn
+
+    def acquire(self):
+        """Havuzdan bir bağlantı al, gerekirse yeni bağlantı aç veya bekle"""
+        if self._closed:
+            raise PoolTimeout("Bağlantı havuzu kapatıldı")
+
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            conn = None
+            with self._lock:
+                if self._created < self.size:
+                    self._created += 1
+                    create = True
+                else:
+                    create = False
+            if create:
+                try:
+                    conn = self._connect()
+                except Exception:
+                    with self._lock:
+                        self._created -= 1
+                    raise
+            else:
+                started = time.perf_counter()
+                try:
+                    conn = self._idle.get(timeout=self.timeout)
+                except queue.Empty:
+                    with self._lock:
+                        self.timeouts += 1
+                    raise PoolTimeout(f"{self.database} için {self.timeout} sn içinde bağlantı alınamadı")
+                finally:
+                    with self._lock:
+                        self.waits += 1
+                        self.wait_time += time.perf_counter() - started
+
+        with self._lock:
+            self.checkouts += 1
+        return conn
+
+    def release(self, conn):
+        """Bağlantıyı havuza geri bırak; yarım kalan işlemleri geri al"""
+        if conn.in_transaction:
+            conn.rollback()
+        if self._closed:
+            conn.close()
+            return
+        self._idle.put_nowait(conn)
+
+    @contextmanager
+    def connection(self):
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "database": self.database,
+                "size": self.size,
+                "open": self._created,
+                "idle": self._idle.qsize(),
+                "checkouts": self.checkouts,
+                "waits": self.waits,
+                "wait_time_ms": round(self.wait_time * 1000, 3),
+                "timeouts": self.timeouts,
+            }
+
+    def close(self):
+        """Boştaki tüm bağlantıları kapat"""
+        self._closed = True
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            conn.close()
+            with self._lock:
+                self._created -= 1
+
+
+class Database:
+    """Bir bağlantı havuzunu, event loop'u bloklamayan async arayüzle sarar.
+
+    Her iş kendi thread havuzunda (havuz boyutu kadar worker) çalışır; aynı
+    anda bekleyen iş sayısı `max_pending` ile sınırlıdır ve kuyruk dolduğunda
+    istek beklemek yerine `DatabaseBusy` ile reddedilir.
+    """
+
+    def __init__(self, pool, max_pending=256):
+        self.pool = pool
+        self.max_pending = max_pending
+        self._executor = ThreadPoolExecutor(max_workers=pool.size, thread_name_prefix=f"db-{pool.database}")
+        self._pending = 0
+        self.rejected = 0
+
+    def _call(self, fn, args):
+        started = time.perf_counter()
+        conn = self.pool.acquire()
+        acquired = time.perf_counter()
+        try:
+            return fn(conn, *args)
+        finally:
+            self.pool.release(conn)
+            metrics.record_db_job(acquired - started, time.perf_counter() - acquired)
+
+    async def run(self, fn, *args):
+        """`fn(conn, *args)` fonksiyonunu DB thread'inde çalıştır ve sonucunu döndür"""
+        if self._pending >= self.max_pending:
+            self.rejected += 1
+            raise DatabaseBusy(f"{self.pool.database} kuyruğu dolu ({self.max_pending})")
+        self._pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            # İstek bağlamı (metrik sayaçları) DB thread'ine taşınır
+            context = contextvars.copy_context()
+            return await loop.run_in_executor(self._executor, context.run, self._call, fn, args)
+        finally:
+            self._pending -= 1
+
+    def iterate_chunks(self, sql, params=(), chunk_size=500):
+        """Sorgu sonucunu cursor'dan `chunk_size` satırlık parçalar halinde okuyan senkron generator.
+
+        StreamingResponse bu generator'ı thread havuzunda tükettiği için event
+        loop bloklanmaz; bağlantı akış bitene (veya istemci kopana) kadar
+        havuzdan alınmış olarak kalır.
+        """
+        with self.pool.connection() as conn:
+            cursor = conn.execute(sql, params)
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                yield rows
+
+    def stats(self):
+        stats = self.pool.stats()
+        stats.update({"pending": self._pending, "max_pending": self.max_pending, "rejected": self.rejected})
+        return stats
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+        self.pool.close()
+
+
+POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", "8"))
+MAX_PENDING = int(os.environ.get("DB_MAX_PENDING", "256"))
+
+pool = ConnectionPool(migrations.DB_PATH, size=POOL_SIZE)
+database = Database(pool, max_pending=MAX_PENDING)
+
+
+# FastAPI bağımlılığı
+def get_db():
+    return database
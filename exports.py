@@ -0,0 +1,421 @@
+"""Hesap ekstresi ve işletme mutabakat raporlarının dışa aktarımı (CSV/Parquet).
+
+Raporlar:
+
+- `transfers`: transferler, gönderen ve alıcı hesap adlarıyla
+- `statement`: bir hesabın bakiye defteri (açılış, yükleme, transfer, ödeme,
+  iade) karşı taraf hesap/işletme adı ve hareket sonrası bakiyeyle;
+  `account_id` zorunludur
+- `settlement`: işletme ödemeleri, işletme ve ödeyen hesap adlarıyla
+
+Satırlar ID sırasıyla, keyset (`id > son ID LIMIT n`) sorgularıyla parça
+parça okunup doğrudan çıktıya yazılır: CSV satırları dosyaya, Parquet her
+parçayı bir row group olarak. Bellek kullanımı parça boyutuyla sınırlıdır ve
+her parça ayrı bir okuma olduğundan uzun bir dışa aktarım WAL'ın
+checkpoint'ini bekletmez. ID'ler tek yazarlı ledger'da commit sırasıyla
+arttığından sonraki bir dışa aktarım `after_id` olarak öncekinin `last_id`
+değerini alıp yalnızca yeni satırları yazar (artımlı/kaldığı yerden devam).
+Çıktı önce `.part` dosyasına yazılır ve yalnızca tamamlanınca yerine taşınır.
+
+Parquet için `pyarrow` gerekir (isteğe bağlı). API'de işler `ExportWorker`
+ile ayrı bir süreçte çalışır; CLI doğrudan çalıştırır:
+
+    python exports.py transfers transfers.csv --state transfers.state
+    python exports.py statement ekstre.parquet --account-id 42 --month 2025-10
+    python exports.py settlement odemeler.csv --merchant-id 3 --after-id 1200
+"""
+import argparse
+import csv
+import json
+import multiprocessing
+import os
+import secrets
+import sqlite3
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import NamedTuple, Optional
+
+from migrations import DB_PATH
+
+# İş durumları
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+FORMATS = ("csv", "parquet")
+MEDIA_TYPES = {"csv": "text/csv; charset=utf-8", "parquet": "application/vnd.apache.parquet"}
+
+
+class Report(NamedTuple):
+    name: str
+    sql: str  # {where} yer tutuculu SELECT
+    id_column: str
+    columns: tuple  # (kolon adı, pyarrow tür adı)
+    filters: dict  # filtre adı -> SQL koşulu (adlandırılmış parametreyle)
+    required: tuple = ()
+    running_balance: bool = False  # satırlara hareket sonrası bakiye eklenir
+
+
+TRANSFERS = Report(
+    "transfers",
+    """
+    SELECT t.id, t.created_at, t.from_account_id, f.name, t.to_account_id, r.name, t.amount
+    FROM transfers t
+    LEFT JOIN accounts f ON f.id = t.from_account_id
+    LEFT JOIN accounts r ON r.id = t.to_account_id
+    WHERE {where}
+    ORDER BY t.id
+    LIMIT :limit
+    """,
+    "t.id",
+    (("id", "int64"), ("created_at", "string"), ("from_account_id", "int64"), ("from_name", "string"),
+     ("to_account_id", "int64"), ("to_name", "string"), ("amount", "int64")),
+    {"month": "t.created_at >= :month_start AND t.created_at < :month_end"},
+)
+
+# Transfer satırında karşı taraf, hesabın gönderen olup olmadığına göre seçilir
+STATEMENT = Report(
+    "statement",
+    """
+    SELECT j.id, j.created_at, j.kind, j.reference,
+           CASE WHEN t.id IS NOT NULL THEN c.id ELSE p.merchant_id END,
+           CASE WHEN t.id IS NOT NULL THEN c.name ELSE m.name END,
+           j.delta
+    FROM balance_journal j
+    LEFT JOIN transfers t ON j.kind = 'transfer' AND t.id = j.reference
+    LEFT JOIN accounts c
+      ON c.id = CASE WHEN t.from_account_id = j.account_id THEN t.to_account_id ELSE t.from_account_id END
+    LEFT JOIN payments p ON j.kind IN ('payment', 'cashback') AND p.id = j.reference
+    LEFT JOIN merchants m ON m.id = p.merchant_id
+    WHERE {where}
+    ORDER BY j.id
+    LIMIT :limit
+    """,
+    "j.id",
+    (("id", "int64"), ("created_at", "string"), ("kind", "string"), ("reference", "int64"),
+     ("counterparty_id", "int64"), ("counterparty_name", "string"), ("amount", "int64"), ("balance", "int64")),
+    {
+        "account_id": "j.account_id = :account_id",
+        "month": "j.created_at >= :month_start AND j.created_at < :month_end",
+    },
+    required=("account_id",),
+    running_balance=True,
+)
+
+SETTLEMENT = Report(
+    "settlement",
+    """
+    SELECT p.id, p.created_at, p.merchant_id, m.name, p.category, p.account_id, a.name, p.channel, p.amount
+    FROM payments p
+    LEFT JOIN merchants m ON m.id = p.merchant_id
+    LEFT JOIN accounts a ON a.id = p.account_id
+    WHERE {where}
+    ORDER BY p.id
+    LIMIT :limit
+    """,
+    "p.id",
+    (("id", "int64"), ("created_at", "string"), ("merchant_id", "int64"), ("merchant_name", "string"),
+     ("category", "string"), ("account_id", "int64"), ("account_name", "string"), ("channel", "string"),
+     ("amount", "int64")),
+    {
+        "merchant_id": "p.merchant_id = :merchant_id",
+        "month": "p.created_at >= :month_start AND p.created_at < :month_end",
+    },
+)
+
+REPORTS = {report.name: report for report in (TRANSFERS, STATEMENT, SETTLEMENT)}
+
+
+def month_range(month):
+    """'2025-10' için ISO metin karşılaştırmasına uygun [başlangıç, bitiş) aralığı"""
+    try:
+        start = datetime.strptime(month, "%Y-%m")
+    except ValueError:
+        raise ValueError("Ay YYYY-MM biçiminde olmalı")
+    year, index = divmod(start.month, 12)
+    return f"{start.year:04d}-{start.month:02d}", f"{start.year + year:04d}-{index + 1:02d}"
+
+
+def build_query(report, filters):
+    """Rapor ve verilen filtreler için (SQL, parametreler); geçersiz filtrede ValueError"""
+    filters = {name: value for name, value in filters.items() if value is not None}
+    missing = [name for name in report.required if name not in filters]
+    if missing:
+        raise ValueError(f"{report.name} raporu için {', '.join(missing)} gerekli")
+    unknown = [name for name in filters if name not in report.filters]
+    if unknown:
+        raise ValueError(f"{report.name} raporu {', '.join(unknown)} filtresini desteklemiyor")
+    conditions = [f"{report.id_column} > :after_id"] + [report.filters[name] for name in filters]
+    params = dict(filters)
+    if "month" in params:
+        params["month_start"], params["month_end"] = month_range(params.pop("month"))
+    return report.sql.format(where=" AND ".join(conditions)), params
+
+
+def _pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise RuntimeError("Parquet dışa aktarımı için pyarrow kurulu olmalı (pip install pyarrow)")
+    return pyarrow, pyarrow.parquet
+
+
+class CsvWriter:
+    def __init__(self, path, columns):
+        self.file = open(path, "w", newline="", encoding="utf-8")
+        self.writer = csv.writer(self.file)
+        self.writer.writerow([name for name, _ in columns])
+
+    def write(self, rows):
+        self.writer.writerows(rows)
+
+    def close(self):
+        self.file.close()
+
+
+class ParquetWriter:
+    """Her parçayı tek row group olarak yazan sütunlu çıktı"""
+
+    def __init__(self, path, columns):
+        self.pa, parquet = _pyarrow()
+        self.schema = self.pa.schema([(name, getattr(self.pa, kind)()) for name, kind in columns])
+        self.writer = parquet.ParquetWriter(path, self.schema, compression="zstd")
+
+    def write(self, rows):
+        # Satırlar yalnızca bu parça için sütunlara çevrilir
+        arrays = [self.pa.array(values, type=column.type) for values, column in zip(zip(*rows), self.schema)]
+        self.writer.write_table(self.pa.Table.from_arrays(arrays, schema=self.schema))
+
+    def close(self):
+        self.writer.close()
+
+
+WRITERS = {"csv": CsvWriter, "parquet": ParquetWriter}
+
+
+def _with_balance(conn, rows, balance, account_id):
+    """Defter satırlarına hareket sonrası bakiyeyi ekle; (satırlar, son bakiye)"""
+    if balance is None:
+        # İlk parçadan önceki hareketlerin toplamı: (account_id, id) indeksinde aralık taraması
+        balance = conn.execute(
+            "SELECT COALESCE(SUM(delta), 0) FROM balance_journal WHERE account_id = ? AND id < ?",
+            (account_id, rows[0][0])
+        ).fetchone()[0]
+    result = []
+    for row in rows:
+        balance += row[6]
+        result.append((*row, balance))
+    return result, balance
+
+
+def export(conn, report, fmt, path, after_id=0, chunk_size=50_000, **filters):
+    """Raporu `path`e yaz ve özetini döndür (yazılan satır, son ID, süre)"""
+    report = REPORTS[report] if isinstance(report, str) else report
+    sql, params = build_query(report, filters)
+    started = time.perf_counter()
+    partial = path + ".part"
+    writer = WRITERS[fmt](partial, report.columns)
+    rows_written, last_id, balance = 0, after_id, None
+    try:
+        while True:
+            rows = conn.execute(sql, {**params, "after_id": last_id, "limit": chunk_size}).fetchall()
+            if not rows:
+                break
+            if report.running_balance:
+                rows, balance = _with_balance(conn, rows, balance, filters["account_id"])
+            writer.write(rows)
+            rows_written += len(rows)
+            last_id = rows[-1][0]
+        writer.close()
+    except BaseException:
+        writer.close()
+        os.remove(partial)
+        raise
+    os.replace(partial, path)
+    seconds = time.perf_counter() - started
+    return {
+        "report": report.name,
+        "format": fmt,
+        "rows": rows_written,
+        "after_id": after_id,
+        "last_id": last_id,
+        "seconds": round(seconds, 3),
+        "rows_per_second": int(rows_written / seconds) if seconds else 0,
+    }
+
+
+def connect(path):
+    """Dışa aktarım için salt okunur bağlantı (ledger yazıcısıyla WAL üzerinden eşzamanlı)"""
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    conn.execute("PRAGMA busy_timeout=5000")
+    return conn
+
+
+def run_export(database, report, fmt, path, after_id, chunk_size, filters):
+    """Ayrı süreçte çalışan iş gövdesi"""
+    conn = connect(database)
+    try:
+        return export(conn, report, fmt, path, after_id, chunk_size, **filters)
+    finally:
+        conn.close()
+
+
+@dataclass
+class ExportJob:
+    id: str
+    report: str
+    format: str
+    after_id: int
+    filters: dict
+    path: str
+    created_at: datetime
+    status: str = QUEUED
+    finished_at: Optional[datetime] = None
+    rows: Optional[int] = None
+    last_id: Optional[int] = None
+    error: Optional[str] = None
+    future: Optional[Future] = field(default=None, repr=False)
+
+    @property
+    def filename(self):
+        return f"{self.report}-{self.after_id}-{self.last_id}.{self.format}"
+
+    def _finished(self, future):
+        self.finished_at = datetime.now()
+        if future.cancelled():
+            self.status, self.error = FAILED, "İptal edildi"
+        elif future.exception() is not None:
+            self.status, self.error = FAILED, str(future.exception())
+        else:
+            result = future.result()
+            self.status, self.rows, self.last_id = DONE, result["rows"], result["last_id"]
+
+
+class ExportWorker:
+    """Dışa aktarım işlerini API süreçlerinden ayrı bir süreç havuzunda çalıştırır.
+
+    CSV/Parquet üretimi CPU yoğundur; aynı süreçteki bir thread GIL
+    üzerinden istekleri yavaşlatacağından işler `spawn` ile açılan ayrı
+    süreçlerde yürür. İş kayıtları bellektedir; en fazla `keep` iş tutulur ve
+    daha eski bitmiş işlerin dosyaları silinir.
+    """
+
+    def __init__(self, database, directory, workers=1, chunk_size=50_000, keep=100):
+        self.database = database
+        self.directory = directory
+        self.workers = workers
+        self.chunk_size = chunk_size
+        self.keep = keep
+        self._jobs = {}
+        self._executor = None
+
+    def submit(self, report, fmt, after_id=0, **filters):
+        """İşi kuyruğa ekle; geçersiz rapor/filtre ya da eksik bağımlılıkta ValueError"""
+        if report not in REPORTS:
+            raise ValueError(f"Bilinmeyen rapor: {report}")
+        if fmt not in FORMATS:
+            raise ValueError(f"Bilinmeyen biçim: {fmt}")
+        build_query(REPORTS[report], filters)
+        if fmt == "parquet":
+            try:
+                _pyarrow()
+            except RuntimeError as e:
+                raise ValueError(str(e))
+
+        if self._executor is None:
+            os.makedirs(self.directory, exist_ok=True)
+            self._executor = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"))
+        job_id = secrets.token_urlsafe(12)
+        job = ExportJob(
+            id=job_id, report=report, format=fmt, after_id=after_id, filters=filters,
+            path=os.path.join(self.directory, f"{job_id}.{fmt}"), created_at=datetime.now(),
+        )
+        # concurrent.futures.Future: running() ile kuyruktan çıkıp başladığı görülebilir
+        job.future = self._executor.submit(
+            run_export, self.database, report, fmt, job.path, after_id, self.chunk_size, filters
+        )
+        job.future.add_done_callback(job._finished)
+        self._jobs[job.id] = job
+        self._trim()
+        return job
+
+    def get(self, job_id):
+        job = self._jobs.get(job_id)
+        if job is not None and job.status == QUEUED and job.future.running():
+            job.status = RUNNING
+        return job
+
+    def _trim(self):
+        finished = [job for job in self._jobs.values() if job.status in (DONE, FAILED)]
+        for job in finished[:max(0, len(self._jobs) - self.keep)]:
+            del self._jobs[job.id]
+            if os.path.exists(job.path):
+                os.remove(job.path)
+
+    async def close(self):
+        if self._executor is not None:
+            # Bekleyen işler iptal edilir; çalışan iş tamamlanınca süreç kapanır
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def stats(self):
+        stats = {QUEUED: 0, RUNNING: 0, DONE: 0, FAILED: 0}
+        for job in self._jobs.values():
+            stats[job.status] += 1
+        return stats
+
+
+export_worker = ExportWorker(
+    DB_PATH,
+    os.environ.get("EXPORT_DIR", "exports"),
+    workers=int(os.environ.get("EXPORT_WORKERS", "1")),
+    chunk_size=int(os.environ.get("EXPORT_CHUNK_SIZE", "50000")),
+)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ekstre ve rapor dışa aktarımı")
+    parser.add_argument("report", choices=sorted(REPORTS))
+    parser.add_argument("output", help="Çıktı dosyası (.csv ya da .parquet)")
+    parser.add_argument("--format", choices=FORMATS, help="Varsayılan: dosya uzantısından")
+    parser.add_argument("--after-id", type=int, help="Bu ID'den sonraki satırlar (varsayılan: 0 ya da --state)")
+    parser.add_argument("--state", help="Son dışa aktarılan ID'nin okunup yazıldığı dosya (artımlı çalıştırma)")
+    parser.add_argument("--account-id", type=int)
+    parser.add_argument("--merchant-id", type=int)
+    parser.add_argument("--month", help="YYYY-MM")
+    parser.add_argument("--chunk-size", type=int, default=50_000)
+    parser.add_argument("--db", help="Veritabanı dosyası (varsayılan: DATABASE_PATH)")
+    args = parser.parse_args()
+
+    fmt = args.format or ("parquet" if args.output.endswith(".parquet") else "csv")
+    after_id = args.after_id
+    if after_id is None and args.state and os.path.exists(args.state):
+        with open(args.state, encoding="utf-8") as f:
+            after_id = json.load(f)["last_id"]
+
+    conn = connect(args.db or DB_PATH)
+    try:
+        summary = export(
+            conn, args.report, fmt, args.output, after_id or 0, args.chunk_size,
+            account_id=args.account_id, merchant_id=args.merchant_id, month=args.month,
+        )
+    except (ValueError, RuntimeError) as e:
+        parser.error(str(e))
+    finally:
+        conn.close()
+
+    if args.state:
+        partial = args.state + ".part"
+        with open(partial, "w", encoding="utf-8") as f:
+            json.dump({"report": summary["report"], "last_id": summary["last_id"]}, f)
+        os.replace(partial, args.state)
+    print(f"{summary['report']}: {summary['rows']} satır ({summary['after_id']} < id <= {summary['last_id']}) "
+          f"{summary['seconds']:.2f} sn, {summary['rows_per_second']} satır/sn -> {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""Hesap bazlı transfer geçmişi sorguları.
+
+Gelen ve giden transferler iki ayrı (hesap, created_at) indeksinden en fazla
+`limit` satır okunarak birleştirilir; sıralama indeks sırasından geldiği için
+tablo büyüklüğünden bağımsız olarak yalnızca sayfa kadar satır taranır.
+
+Hesabın kendisine yaptığı transfer hem 'out' hem 'in' satırı olarak aynı
+(created_at, id) ile döner; sıralama ve imleç bu yüzden yönü de içerir
+('out' önce), sayfa iki satırın arasında bitse de 'in' satırı kaybolmaz.
+Kayıtlar yerel saatle, saat dilimi olmadan tutulur; tarih sınırları
+sorgudan önce aynı biçime çevrilir.
+"""
+from datetime import datetime
+
+HISTORY_SQL = """
+SELECT * FROM (
+    SELECT id, 'out', to_account_id, amount, created_at FROM transfers
+    WHERE from_account_id = :account_id
+      AND created_at >= :start AND created_at < :end
+      AND (created_at, id) <= (:cursor_at, :cursor_id)
+      AND (created_at, id, 'out') < (:cursor_at, :cursor_id, :cursor_dir)
+    ORDER BY created_at DESC, id DESC LIMIT :limit
+)
+UNION ALL
+SELECT * FROM (
+    SELECT id, 'in', from_account_id, amount, created_at FROM transfers
+    WHERE to_account_id = :account_id
+      AND created_at >= :start AND created_at < :end
+      AND (created_at, id) <= (:cursor_at, :cursor_id)
+      AND (created_at, id, 'in') < (:cursor_at, :cursor_id, :cursor_dir)
+    ORDER BY created_at DESC, id DESC LIMIT :limit
+)
+ORDER BY 5 DESC, 1 DESC, 2 DESC
+LIMIT :limit
+"""
+
+# Tarih filtresi verilmediğinde kullanılan sınırlar (ISO metinleriyle karşılaştırılır)
+MIN_DATE = ""
+MAX_DATE = "\uffff"
+
+DIRECTIONS = ("in", "out")
+
+
+def local_naive(moment):
+    """Saat dilimli anı kayıtlarla karşılaştırılabilir yerel, dilimsiz zamana çevir"""
+    if moment is not None and moment.tzinfo is not None:
+        return moment.astimezone().replace(tzinfo=None)
+    return moment
+
+
+def encode_cursor(row):
+    """Sayfanın son satırından bir sonraki sayfanın imlecini üret"""
+    return f"{row[4]}|{row[0]}|{row[1]}"
+
+
+def decode_cursor(cursor):
+    """(created_at, id, yön); yönsüz eski imleçlerde yön "" (o satır dahil edilmez)"""
+    rest, _, direction = cursor.rpartition("|")
+    if direction not in DIRECTIONS:
+        rest, direction = cursor, ""
+    created_at, _, transfer_id = rest.rpartition("|")
+    return created_at, int(transfer_id), direction
+
+
+def fetch_history(conn, account_id, limit=50, cursor=None, start=None, end=None):
+    """(id, yön, karşı hesap, tutar, tarih) satırlarını yeniden eskiye döndür"""
+    if cursor:
+        cursor_at, cursor_id, cursor_dir = decode_cursor(cursor)
+    else:
+        cursor_at, cursor_id, cursor_dir = MAX_DATE, 0, ""
+    params = {
+        "account_id": account_id,
+        "start": start or MIN_DATE,
+        "end": end or MAX_DATE,
+        "cursor_at": cursor_at,
+        "cursor_id": cursor_id,
+        "cursor_dir": cursor_dir,
+        "limit": limit,
+    }
+    return conn.execute(HISTORY_SQL, params).fetchall()
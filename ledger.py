@@ -0,0 +1,563 @@
+import asyncio
+import json
+import os
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import List, NamedTuple, Optional
+
+import metrics
+import migrations
+from applog import logger
+from balances import record, take_snapshot
+from budgets import apply_spending
+from cashback import CompiledRules, apply_cashback, load_campaigns
+from splits import clear_debts, settlement_plan
+from account_cache import ACCOUNT_COLUMNS, account_cache
+from db_pool import DEFAULT_PRAGMAS, DatabaseBusy
+from notifications import hub
+
+
+class LedgerError(Exception):
+    """Tek bir kaydın (posting) iş kuralı nedeniyle reddedilmesi"""
+
+    def __init__(self, status_code, detail):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+# Taşan bakiye toplamı SQLite'ta REAL'e döner ve accounts tablosundaki bu kısıta takılır
+BALANCE_CHECK = "balance_integer"
+BALANCE_OVERFLOW = "Bakiye üst sınırı aşılıyor"
+
+
+@dataclass
+class Posting:
+    """Ledger kuyruğuna eklenen tek bir bakiye hareketi"""
+    kind: str  # "topup", "transfer", "payment", "bulk", "settle" veya "snapshot"
+    account_id: int
+    amount: int  # kuruş
+    to_account_id: Optional[int] = None
+    merchant_id: Optional[int] = None
+    category: Optional[str] = None
+    channel: str = "direct"
+    items: Optional[list] = field(default=None, repr=False)  # bulk: (gönderen, alıcı, tutar) listesi
+    atomic: bool = False
+    idempotency_key: Optional[str] = None
+    reference: Optional[str] = None  # idempotency anahtarının bağlı olduğu istek (ör. QR intent ID)
+    group_id: Optional[int] = None  # settle: hesaplaşılacak bölüşme grubu
+    future: Optional[asyncio.Future] = field(default=None, repr=False)
+
+
+class PaymentResult(NamedTuple):
+    payment_id: int
+    new_balance: int
+    created_at: datetime
+    budget_alerts: List[int]
+    cashback: int
+
+    def to_json(self):
+        return json.dumps({**self._asdict(), "created_at": self.created_at.isoformat()})
+
+    @classmethod
+    def from_json(cls, text):
+        data = json.loads(text)
+        data["created_at"] = datetime.fromisoformat(data["created_at"])
+        return cls(**data)
+
+
+def posting_events(posting, result, rows):
+    """Kabul edilen kaydın (hesap ID, olay türü, veri) bildirimleri.
+
+    Her olay hesabın hareket sonrası bakiyesini taşır. Toplu transfer ve
+    hesaplaşmada tek tek transferler yerine değişen her hesap için bir
+    `balance` olayı üretilir; tekrarlanan (idempotent) ödeme olay üretmez.
+    """
+    if posting.kind == "topup":
+        return [(posting.account_id, "topup", {"amount": posting.amount, "balance": result})]
+    if posting.kind == "transfer":
+        transfer_id, _, created_at = result
+        sender, receiver = rows
+        common = {"transfer_id": transfer_id, "amount": posting.amount, "created_at": created_at.isoformat()}
+        return [
+            (posting.account_id, "transfer_out",
+             {**common, "to_account_id": posting.to_account_id, "balance": sender[4]}),
+            (posting.to_account_id, "transfer_in",
+             {**common, "from_account_id": posting.account_id, "balance": receiver[4]}),
+        ]
+    if posting.kind == "payment":
+        if not rows:
+            return []
+        return [(posting.account_id, "payment", {
+            "payment_id": result.payment_id, "merchant_id": posting.merchant_id, "category": posting.category,
+            "amount": posting.amount, "cashback": result.cashback, "budget_alerts": result.budget_alerts,
+            "balance": result.new_balance, "created_at": result.created_at.isoformat(),
+        })]
+    return [(row[0], "balance", {"balance": row[4]}) for row in rows]
+
+
+class LedgerWriter:
+    """Tüm bakiye hareketlerini tek bir yazıcıdan geçiren group-commit motoru.
+
+    İstekler kayıtlarını kuyruğa ekler; yazıcı kuyruktakileri en fazla
+    `max_batch` kayıtlık gruplar halinde tek bir işlemde (tek fsync) uygular.
+    Her kayıt kendi SAVEPOINT'i içinde çalıştığı için bakiye kontrolü
+    başarısız olan kayıt yalnızca kendisini geri alır. Commit sonrası
+    değişen hesap satırları önbelleğe yazılır ve `hub` verilmişse kabul
+    edilen kayıtların bildirimleri yayınlanır. `snapshot_interval` verilirse
+    bakiye snapshot'ı o aralıkla yazıcı kuyruğu üzerinden alınır.
+
+    Kuyruk en fazla `max_queue` kayıt tutar; doluysa yeni kayıt beklemeden
+    DatabaseBusy (503) ile reddedilir.
+    """
+
+    def __init__(self, database, max_batch=256, max_latency=0.0, cache=None, snapshot_interval=0.0, hub=None,
+                 max_queue=10_000):
+        self.database = database
+        self.cache = cache
+        self.hub = hub
+        self.max_batch = max_batch
+        self.max_latency = max_latency
+        self.max_queue = max_queue
+        self.snapshot_interval = snapshot_interval
+        self._queue = None
+        self._task = None
+        self._snapshot_task = None
+        self._executor = None
+        self._conn = None
+        self.rules = CompiledRules([])
+
+        # Yazıcı metrikleri
+        self.batches = 0
+        self.postings = 0
+        self.largest_batch = 0
+        self.snapshots = 0
+        self.rejected = 0
+
+    def _connect(self):
+        conn = sqlite3.connect(self.database, isolation_level=None, check_same_thread=False)
+        for pragma in DEFAULT_PRAGMAS:
+            conn.execute(pragma)
+        self.rules = CompiledRules(load_campaigns(conn))
+        return conn
+
+    async def start(self):
+        """Yazıcı bağlantısını aç ve görevini çalışan event loop üzerinde başlat (uygulama açılışında)"""
+        if self._task is not None:
+            return
+        loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue(self.max_queue)
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ledger-writer")
+        self._conn = await loop.run_in_executor(self._executor, self._connect)
+        self._task = loop.create_task(self._run())
+        if self.snapshot_interval:
+            self._snapshot_task = loop.create_task(self._snapshot_loop())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        if self._snapshot_task is not None:
+            self._snapshot_task.cancel()
+            try:
+                await self._snapshot_task
+            except asyncio.CancelledError:
+                pass
+            self._snapshot_task = None
+        # Uygulanmakta olan grup tamamlanır; kuyrukta bekleyen kayıtlar hatayla sonlanır
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        pending = []
+        while not self._queue.empty():
+            pending.append(self._queue.get_nowait())
+        self._fail(pending, DatabaseBusy("Ledger yazıcısı durduruldu"))
+        self._executor.submit(self._conn.close).result()
+        self._executor.shutdown(wait=True)
+        self._task = None
+
+    async def submit(self, posting):
+        """Kaydı kuyruğa ekle ve kendi sonucunu bekle"""
+        if self._task is None:
+            raise RuntimeError("Ledger yazıcısı başlatılmadı")
+        posting.future = asyncio.get_running_loop().create_future()
+        try:
+            self._queue.put_nowait(posting)
+        except asyncio.QueueFull:
+            self.rejected += 1
+            raise DatabaseBusy("Ledger kuyruğu dolu")
+        started = time.perf_counter()
+        try:
+            return await posting.future
+        finally:
+            metrics.record_ledger_wait(time.perf_counter() - started)
+
+    async def topup(self, account_id, amount):
+        return await self.submit(Posting("topup", account_id, amount))
+
+    async def transfer(self, from_account_id, to_account_id, amount):
+        return await self.submit(Posting("transfer", from_account_id, amount, to_account_id))
+
+    async def payment(self, account_id, merchant_id, category, amount, channel="direct",
+                      idempotency_key=None, reference=None):
+        return await self.submit(Posting(
+            "payment", account_id, amount, merchant_id=merchant_id, category=category, channel=channel,
+            idempotency_key=idempotency_key, reference=reference
+        ))
+
+    async def bulk_transfer(self, items, atomic=False):
+        """Toplu transferleri tek kayıt olarak uygula; her öğe için (transfer_id, hata) döndür"""
+        return await self.submit(Posting("bulk", 0, 0, items=items, atomic=atomic))
+
+    async def settle_split(self, group_id):
+        """Bölüşme grubunun borçlarını sadeleştirip tek işlemde öde"""
+        return await self.submit(Posting("settle", 0, 0, group_id=group_id))
+
+    async def snapshot(self):
+        """Bakiye snapshot'ını yazıcı sırasında al; snapshot'ı yazılan hesap sayısını döndür"""
+        return await self.submit(Posting("snapshot", 0, 0))
+
+    async def _snapshot_loop(self):
+        while True:
+            await asyncio.sleep(self.snapshot_interval)
+            try:
+                await self.snapshot()
+            except Exception:
+                logger.exception("bakiye snapshot'ı alınamadı")
+                continue
+            self.snapshots += 1
+
+    @staticmethod
+    def _fail(postings, error):
+        for posting in postings:
+            if not posting.future.done():
+                posting.future.set_exception(error)
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            if self.max_latency:
+                try:
+                    await asyncio.sleep(self.max_latency)
+                except asyncio.CancelledError:
+                    self._fail(batch, DatabaseBusy("Ledger yazıcısı durduruldu"))
+                    raise
+            while len(batch) < self.max_batch and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+
+            # Kapanışta (stop) başlamış grup yarıda bırakılmaz; sonuçlar sahiplerine iletilir
+            apply = loop.create_task(self._apply(batch))
+            try:
+                await asyncio.shield(apply)
+            except asyncio.CancelledError:
+                await apply
+                raise
+
+    async def _apply(self, batch):
+        events = []
+        try:
+            results = await asyncio.get_running_loop().run_in_executor(
+                self._executor, self._apply_batch, batch, events
+            )
+        except Exception as e:
+            # BEGIN/COMMIT hatası: grubun tamamı geri alındı
+            results = [e] * len(batch)
+            events = []
+
+        for posting, result in zip(batch, results):
+            if posting.future.done():
+                continue
+            if isinstance(result, Exception):
+                posting.future.set_exception(result)
+            else:
+                posting.future.set_result(result)
+
+        # Yayın event loop'ta ve commit'ten sonra; aboneler yalnızca kalıcı hareketleri görür
+        for account_id, kind, data in events:
+            self.hub.publish(account_id, kind, data)
+
+    def _apply_batch(self, batch, events=None):
+        cursor = self._conn.cursor()
+        results = []
+        touched = {}
+        cursor.execute("BEGIN IMMEDIATE")
+        try:
+            for posting in batch:
+                rows = []
+                cursor.execute("SAVEPOINT posting")
+                try:
+                    if posting.kind == "topup":
+                        results.append(self._apply_topup(cursor, posting, rows))
+                    elif posting.kind == "payment":
+                        results.append(self._apply_payment(cursor, posting, rows))
+                    elif posting.kind == "bulk":
+                        results.append(self._apply_bulk(cursor, posting, rows))
+                    elif posting.kind == "settle":
+                        results.append(self._apply_settle(cursor, posting, rows))
+                    elif posting.kind == "snapshot":
+                        results.append(take_snapshot(cursor))
+                    else:
+                        results.append(self._apply_transfer(cursor, posting, rows))
+                    cursor.execute("RELEASE posting")
+                except Exception as e:
+                    # Beklenmeyen hata da (ör. taşma) yalnızca bu kaydı geri alır; işlem
+                    # düşmüşse (bağlantı/disk hatası) grubun tamamı dışarıda geri alınır
+                    if not self._conn.in_transaction:
+                        raise
+                    cursor.execute("ROLLBACK TO posting")
+                    cursor.execute("RELEASE posting")
+                    if isinstance(e, sqlite3.IntegrityError) and BALANCE_CHECK in str(e):
+                        e = LedgerError(400, BALANCE_OVERFLOW)
+                    if not isinstance(e, LedgerError):
+                        logger.exception("ledger kaydı uygulanamadı: %s", posting.kind)
+                    results.append(e)
+                    continue
+                for row in rows:
+                    touched[row[0]] = row
+                if self.hub is not None and events is not None:
+                    events.extend(posting_events(posting, results[-1], rows))
+            cursor.execute("COMMIT")
+        except Exception:
+            if self._conn.in_transaction:
+                cursor.execute("ROLLBACK")
+            raise
+
+        if self.cache is not None:
+            for row in touched.values():
+                self.cache.put(row)
+
+        self.batches += 1
+        self.postings += len(batch)
+        self.largest_batch = max(self.largest_batch, len(batch))
+        return results
+
+    def _account_row(self, cursor, account_id):
+        cursor.execute(f"SELECT {ACCOUNT_COLUMNS} FROM accounts WHERE id = ?", (account_id,))
+        return cursor.fetchone()
+
+    def _apply_topup(self, cursor, posting, rows):
+        cursor.execute(
+            "UPDATE accounts SET balance = balance + ? WHERE id = ?",
+            (posting.amount, posting.account_id)
+        )
+        if cursor.rowcount == 0:
+            raise LedgerError(404, "Hesap bulunamadı")
+        record(cursor, [(posting.account_id, posting.amount, "topup", None)], datetime.now().isoformat())
+        row = self._account_row(cursor, posting.account_id)
+        rows.append(row)
+        return row[4]
+
+    def _debit(self, cursor, account_id, amount, missing):
+        """Bakiyeyi yalnızca yeterliyse tek ifadede düş ve güncel satırı döndür.
+
+        Kontrol ve düşüm aynı UPDATE'in WHERE koşulunda yapıldığı için okuma ile
+        yazma arasında başka bir yazıcı (başka süreç/sunucu) araya giremez.
+        Satır güncellenmezse hesap yok (404) ya da bakiye yetersizdir (400).
+        """
+        cursor.execute(
+            f"UPDATE accounts SET balance = balance - ? WHERE id = ? AND balance >= ? RETURNING {ACCOUNT_COLUMNS}",
+            (amount, account_id, amount)
+        )
+        row = cursor.fetchone()
+        if row is None:
+            cursor.execute("SELECT 1 FROM accounts WHERE id = ?", (account_id,))
+            if cursor.fetchone() is None:
+                raise LedgerError(404, missing)
+            raise LedgerError(400, "Yetersiz bakiye")
+        return row
+
+    def _apply_transfer(self, cursor, posting, rows):
+        # Koşullu düşüm; alıcı yoksa SAVEPOINT'e dönülerek düşüm de geri alınır
+        sender_row = self._debit(cursor, posting.account_id, posting.amount, "Gönderen hesap bulunamadı")
+        cursor.execute(
+            f"UPDATE accounts SET balance = balance + ? WHERE id = ? RETURNING {ACCOUNT_COLUMNS}",
+            (posting.amount, posting.to_account_id)
+        )
+        receiver_row = cursor.fetchone()
+        if receiver_row is None:
+            raise LedgerError(404, "Alıcı hesap bulunamadı")
+        if posting.to_account_id == posting.account_id:
+            sender_row = receiver_row
+
+        created_at = datetime.now()
+        cursor.execute(
+            "INSERT INTO transfers (from_account_id, to_account_id, amount, created_at) VALUES (?, ?, ?, ?)",
+            (posting.account_id, posting.to_account_id, posting.amount, created_at.isoformat())
+        )
+        transfer_id = cursor.lastrowid
+        record(cursor, [
+            (posting.account_id, -posting.amount, "transfer", transfer_id),
+            (posting.to_account_id, posting.amount, "transfer", transfer_id),
+        ], created_at.isoformat())
+
+        rows.append(sender_row)
+        rows.append(receiver_row)
+        return transfer_id, sender_row[4], created_at
+
+    def _apply_payment(self, cursor, posting, rows):
+        # Aynı anahtarla tamamlanmış ödeme varsa tekrar borçlandırmadan sonucunu döndür
+        if posting.idempotency_key:
+            cursor.execute(
+                "SELECT reference, account_id, response FROM idempotency_keys WHERE key = ?",
+                (posting.idempotency_key,)
+            )
+            stored = cursor.fetchone()
+            if stored:
+                if stored[0] != posting.reference or stored[1] != posting.account_id:
+                    raise LedgerError(409, "Idempotency-Key başka bir istek için kullanılmış")
+                return PaymentResult.from_json(stored[2])
+
+        self._debit(cursor, posting.account_id, posting.amount, "Hesap bulunamadı")
+        created_at = datetime.now()
+        cursor.execute(
+            "INSERT INTO payments (account_id, merchant_id, category, amount, channel, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+            (posting.account_id, posting.merchant_id, posting.category, posting.amount, posting.channel, created_at.isoformat())
+        )
+        payment_id = cursor.lastrowid
+        record(cursor, [(posting.account_id, -posting.amount, "payment", payment_id)], created_at.isoformat())
+
+        # Aylık harcama toplamını artır, geçilen bütçe eşiklerini al
+        alerts = apply_spending(cursor, posting.account_id, posting.category, posting.amount, created_at)
+
+        # Uyan kampanyaların iadesi aynı işlemde cüzdana yansır
+        cashback = apply_cashback(
+            cursor, self.rules, posting.account_id, payment_id, posting.merchant_id,
+            posting.category, posting.channel, posting.amount, created_at.isoformat()
+        )
+
+        row = self._account_row(cursor, posting.account_id)
+        rows.append(row)
+        result = PaymentResult(payment_id, row[4], created_at, alerts, cashback)
+
+        # Sonuç ödemeyle aynı commit'te kaydedilir; tekrar denemeler bunu okur
+        if posting.idempotency_key:
+            cursor.execute(
+                "INSERT INTO idempotency_keys (key, account_id, reference, response, created_at) VALUES (?, ?, ?, ?, ?)",
+                (posting.idempotency_key, posting.account_id, posting.reference, result.to_json(), created_at.isoformat())
+            )
+        return result
+
+    def _apply_bulk(self, cursor, posting, rows, chunk_size=500):
+        """Toplu transferleri bellekte doğrulayıp executemany ile yaz.
+
+        İlgili hesapların bakiyeleri tek seferde okunur, transferler sırayla
+        bellekte uygulanarak create_transfer ile aynı kurallar (hesaplar mevcut,
+        bakiye yeterli) denetlenir; ardından net bakiye farkları ve kabul edilen
+        transfer kayıtları executemany ile yazılır.
+        """
+        account_ids = list({i for item in posting.items for i in item[:2]})
+        balances = {}
+        for offset in range(0, len(account_ids), chunk_size):
+            chunk = account_ids[offset:offset + chunk_size]
+            cursor.execute(
+                f"SELECT id, balance FROM accounts WHERE id IN ({','.join('?' * len(chunk))})", chunk
+            )
+            balances.update(cursor.fetchall())
+
+        deltas = {}
+        accepted = []
+        outcomes = []
+        for from_id, to_id, amount in posting.items:
+            if from_id not in balances:
+                outcomes.append("Gönderen hesap bulunamadı")
+            elif to_id not in balances:
+                outcomes.append("Alıcı hesap bulunamadı")
+            elif balances[from_id] < amount:
+                outcomes.append("Yetersiz bakiye")
+            else:
+                balances[from_id] -= amount
+                balances[to_id] += amount
+                deltas[from_id] = deltas.get(from_id, 0) - amount
+                deltas[to_id] = deltas.get(to_id, 0) + amount
+                accepted.append((from_id, to_id, amount))
+                outcomes.append(None)
+
+        if posting.atomic and len(accepted) != len(posting.items):
+            return [(None, error or "İşlem geri alındı") for error in outcomes]
+
+        # Bakiyeler işlem içinde okunup doğrulandı; koşul yine de eksiye düşen
+        # bir yazımı veritabanı düzeyinde engeller
+        changes = [(delta, account_id, delta) for account_id, delta in deltas.items() if delta]
+        cursor.executemany(
+            "UPDATE accounts SET balance = balance + ? WHERE id = ? AND balance + ? >= 0",
+            changes
+        )
+        if cursor.rowcount != len(changes):
+            raise LedgerError(409, "Bakiye işlem sırasında değişti")
+
+        # AUTOINCREMENT ID'leri tek yazıcı altında ardışıktır
+        cursor.execute("SELECT seq FROM sqlite_sequence WHERE name = 'transfers'")
+        row = cursor.fetchone()
+        next_id = (row[0] if row else 0) + 1
+        created_at = datetime.now().isoformat()
+        cursor.executemany(
+            "INSERT INTO transfers (from_account_id, to_account_id, amount, created_at) VALUES (?, ?, ?, ?)",
+            [(from_id, to_id, amount, created_at) for from_id, to_id, amount in accepted]
+        )
+
+        results = []
+        for error in outcomes:
+            if error is None:
+                results.append((next_id, None))
+                next_id += 1
+            else:
+                results.append((None, error))
+        transfer_ids = [transfer_id for transfer_id, _ in results if transfer_id is not None]
+        entries = []
+        for (from_id, to_id, amount), transfer_id in zip(accepted, transfer_ids):
+            entries.append((from_id, -amount, "transfer", transfer_id))
+            entries.append((to_id, amount, "transfer", transfer_id))
+        record(cursor, entries, created_at)
+
+        changed = [account_id for account_id, delta in deltas.items() if delta]
+        for offset in range(0, len(changed), chunk_size):
+            chunk = changed[offset:offset + chunk_size]
+            cursor.execute(
+                f"SELECT {ACCOUNT_COLUMNS} FROM accounts WHERE id IN ({','.join('?' * len(chunk))})", chunk
+            )
+            rows.extend(cursor.fetchall())
+        return results
+
+    def _apply_settle(self, cursor, posting, rows):
+        """Grubun borç planını yazıcı içinde hesaplayıp atomik toplu transferle uygula.
+
+        Plan commit ile aynı işlemde okunduğu için arada eklenen harcamalar
+        kaçırılmaz; transferlerden biri bile reddedilirse grup borçları
+        olduğu gibi kalır.
+        """
+        plan = settlement_plan(cursor, posting.group_id)
+        if not plan:
+            return []
+        results = self._apply_bulk(cursor, Posting("bulk", 0, 0, items=plan, atomic=True), rows)
+        for (from_id, _, _), (_, error) in zip(plan, results):
+            if error and error != "İşlem geri alındı":
+                raise LedgerError(400, f"Hesap {from_id}: {error}")
+        clear_debts(cursor, posting.group_id)
+        return [(transfer_id, *item) for item, (transfer_id, _) in zip(plan, results)]
+
+    def stats(self):
+        return {
+            "queued": self._queue.qsize() if self._queue else 0,
+            "batches": self.batches,
+            "postings": self.postings,
+            "avg_batch": round(self.postings / self.batches, 2) if self.batches else 0,
+            "largest_batch": self.largest_batch,
+            "snapshots": self.snapshots,
+            "rejected": self.rejected,
+        }
+
+
+ledger = LedgerWriter(
+    migrations.DB_PATH,
+    max_batch=int(os.environ.get("LEDGER_MAX_BATCH", "256")),
+    max_latency=float(os.environ.get("LEDGER_MAX_LATENCY_MS", "0")) / 1000,
+    cache=account_cache,
+    snapshot_interval=float(os.environ.get("BALANCE_SNAPSHOT_INTERVAL", "3600")),
+    hub=hub,
+    max_queue=int(os.environ.get("LEDGER_MAX_QUEUE", "10000")),
+)
@@ -0,0 +1,229 @@
+"""İstek düzeyinde ölçümler ve Prometheus metin formatında dışa aktarım.
+
+`MetricsMiddleware` her HTTP isteği için route şablonuna göre gecikme
+histogramı, durum kodu sayaçları ve istek boyunca çalışan SQL ifadesi
+sayısı / DB iş süresi / bağlantı bekleme süresini kaydeder. İsteğe ait
+sayaçlar bir `ContextVar` içinde tutulur; `Database.run` bağlamı DB
+thread'ine taşıdığı için bağlantılara kurulan trace callback her ifadeyi
+doğru isteğe yazar. Ledger yazıcısında (gruplanmış işlemler) geçen süre
+ayrıca `ledger` süresi olarak ölçülür.
+
+Harici bağımlılık yoktur; `/metrics` ucu `registry.render()` çıktısını döndürür.
+"""
+import threading
+import time
+from contextvars import ContextVar
+
+DURATION_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 500)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=""):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = sorted(self._values.items())
+        lines.extend(f"{self.name}{_labels(self.labelnames, labels)} {_number(value)}" for labels, value in items)
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help, labelnames=(), buckets=DURATION_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                # [kova sayaçları..., toplam, adet]
+                series = self._series[labels] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+                    break
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted((labels, list(series)) for labels, series in self._series.items())
+        for labels, series in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), series[:len(self.buckets)] + [0]):
+                cumulative += count
+                le = 'le="%s"' % _number(bound)
+                total = series[-1] if bound == float("inf") else cumulative
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, labels, le)} {total}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {_number(series[-2])}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {series[-1]}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+        self._gauges = []
+
+    def counter(self, name, help, labelnames=()):
+        metric = Counter(name, help, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name, help, labelnames=(), buckets=DURATION_BUCKETS):
+        metric = Histogram(name, help, labelnames, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def gauges(self, prefix, source):
+        """`source()` sözlüğündeki sayısal değerleri `<prefix>_<anahtar>` gauge'ları olarak yayınla"""
+        self._gauges.append((prefix, source))
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        for prefix, source in self._gauges:
+            for key, value in source().items():
+                if isinstance(value, (int, float)):
+                    name = f"{prefix}_{key}"
+                    lines.append(f"# TYPE {name} gauge")
+                    lines.append(f"{name} {_number(value)}")
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+REQUESTS = registry.counter(
+    "http_requests_total", "Tamamlanan HTTP istekleri", ("method", "route", "status"))
+EXCEPTIONS = registry.counter(
+    "http_exceptions_total", "Yakalanmamış istisnayla biten istekler", ("route", "exception"))
+LATENCY = registry.histogram(
+    "http_request_duration_seconds", "İstek süresi", ("method", "route"))
+SQL_QUERIES = registry.histogram(
+    "http_request_sql_queries", "İstek başına çalışan SQL ifadesi", ("route",), QUERY_BUCKETS)
+SQL_SECONDS = registry.histogram(
+    "http_request_sql_seconds", "İstek başına bağlantı havuzunda geçen DB iş süresi", ("route",))
+LEDGER_SECONDS = registry.histogram(
+    "http_request_ledger_seconds", "İstek başına ledger yazıcısında beklenen süre", ("route",))
+DB_WAIT = registry.histogram(
+    "db_connection_wait_seconds", "Havuzdan bağlantı alma süresi")
+
+
+class RequestStats:
+    __slots__ = ("sql_queries", "sql_seconds", "ledger_seconds")
+
+    def __init__(self):
+        self.sql_queries = 0
+        self.sql_seconds = 0.0
+        self.ledger_seconds = 0.0
+
+
+current_request = ContextVar("current_request", default=None)
+
+
+def count_statement(_sql):
+    """sqlite3 trace callback'i: ifadeyi aktif isteğin sayacına ekle"""
+    stats = current_request.get()
+    if stats is not None:
+        stats.sql_queries += 1
+
+
+def record_db_job(wait, elapsed):
+    DB_WAIT.observe(wait)
+    stats = current_request.get()
+    if stats is not None:
+        stats.sql_seconds += elapsed
+
+
+def record_ledger_wait(elapsed):
+    stats = current_request.get()
+    if stats is not None:
+        stats.ledger_seconds += elapsed
+
+
+def route_label(scope):
+    """Kardinaliteyi sınırlamak için yol yerine route şablonu (/accounts/{account_id})"""
+    route = scope.get("route")
+    if route is not None:
+        return route.path
+    if "endpoint" in scope:
+        # Mount edilmiş alt uygulama (ör. /static)
+        return scope.get("root_path") or "mount"
+    return "unmatched"
+
+
+class MetricsMiddleware:
+    """Saf ASGI middleware (BaseHTTPMiddleware'in ek görev/kuyruk maliyeti yok)"""
+
+    def __init__(self, app, profiler=None):
+        self.app = app
+        self.profiler = profiler
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        stats = RequestStats()
+        token = current_request.set(stats)
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except Exception as e:
+            EXCEPTIONS.inc(route_label(scope), type(e).__name__)
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            current_request.reset(token)
+            route = route_label(scope)
+            REQUESTS.inc(scope["method"], route, str(status))
+            LATENCY.observe(elapsed, scope["method"], route)
+            SQL_QUERIES.observe(stats.sql_queries, route)
+            SQL_SECONDS.observe(stats.sql_seconds, route)
+            if stats.ledger_seconds:
+                LEDGER_SECONDS.observe(stats.ledger_seconds, route)
+            if self.profiler is not None and elapsed >= self.profiler.threshold:
+                self.profiler.dump(started, started + elapsed, f"{scope['method']} {route}")
@@ -0,0 +1,178 @@
+"""Para kolonlarını REAL (TL) tipinden INTEGER (kuruş) tipine taşıma.
+
+SQLite kolon tipini yerinde değiştiremediği için her tablo yeni tipli bir
+kopyaya (`<tablo>__kurus`) rowid sırasıyla parça parça aktarılır. Her parça
+ayrı commit edildiğinden WAL dosyası parça boyutuyla sınırlı kalır ve yarıda
+kesilen taşıma kaldığı yerden devam eder. Kopya tamamlanınca eski tablo
+silinir, kopya yeniden adlandırılır ve indeksleri yeniden oluşturulur; bu son
+adım tek işlemdir. Taşıma sırasında uygulama çalışmamalıdır; kopyalanmış
+satırlarda sonradan yapılan değişiklikler yeni tabloya yansımaz.
+
+Taşıma, `migrations.py` içindeki temel şema migration'ının parçası olarak
+bir kez çalışır; büyük veritabanları önceden şu komutla çevrilebilir:
+
+    python migrate_money.py --db accounts.db --chunk-size 50000
+"""
+import argparse
+import os
+import re
+import sqlite3
+
+from applog import logger, start_logging, stop_logging
+
+KURUS = "CAST(ROUND({column} * 100) AS INTEGER)"
+
+# Tablo → (INTEGER'a çevrilecek kolonlar, dönüştürülecek tüm kolonların ifadeleri)
+MONEY_COLUMNS = {
+    "accounts": (("balance",), {"balance": KURUS}),
+    "transfers": (("amount",), {"amount": KURUS}),
+    "payments": (("amount",), {"amount": KURUS}),
+    "budgets": (("monthly_limit",), {"monthly_limit": KURUS}),
+    "spending_totals": (("total",), {"total": KURUS}),
+    # value yüzde de olabildiği için REAL kalır; yalnızca sabit tutarlar kuruşa çevrilir
+    "cashback_campaigns": (("max_amount",), {
+        "max_amount": KURUS,
+        "value": "CASE WHEN kind = 'fixed' THEN ROUND(value * 100) ELSE value END",
+    }),
+    "cashback_credits": (("amount",), {"amount": KURUS}),
+    "split_expenses": (("amount",), {"amount": KURUS}),
+    "split_debts": (("amount",), {"amount": KURUS}),
+}
+
+# Ödeme sonuçlarının saklanan JSON kopyaları (idempotent tekrar denemeler için)
+IDEMPOTENCY_RESPONSES = """
+UPDATE idempotency_keys SET response = json_set(
+    response,
+    '$.new_balance', CAST(ROUND(json_extract(response, '$.new_balance') * 100) AS INTEGER),
+    '$.cashback', CAST(ROUND(json_extract(response, '$.cashback') * 100) AS INTEGER)
+)
+"""
+
+
+def _column_types(conn, table):
+    return {row[1]: row[2].upper() for row in conn.execute(f"PRAGMA table_info({table})")}
+
+
+def needs_migration(conn, table):
+    types = _column_types(conn, table)
+    retyped, _ = MONEY_COLUMNS[table]
+    return any(types.get(column) == "REAL" for column in retyped)
+
+
+def _target_ddl(conn, table, target):
+    sql = conn.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)).fetchone()[0]
+    sql = re.sub(rf'^CREATE TABLE\s+(IF NOT EXISTS\s+)?"?{table}"?', f"CREATE TABLE {target}", sql, count=1)
+    for column in MONEY_COLUMNS[table][0]:
+        sql = re.sub(rf"\b({column})\s+REAL(\s+[^,\n]*?)DEFAULT\s+0\.0\b", r"\1 INTEGER\2DEFAULT 0", sql)
+        sql = re.sub(rf"\b({column})\s+REAL\b", r"\1 INTEGER", sql)
+    return sql
+
+
+def _integer_primary_key(conn, table):
+    """Tablonun rowid takma adı olan INTEGER PRIMARY KEY kolonu (yoksa None)"""
+    pk = [(row[1], row[2].upper()) for row in conn.execute(f"PRAGMA table_info({table})") if row[5]]
+    without_rowid = "WITHOUT ROWID" in conn.execute(
+        "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)
+    ).fetchone()[0].upper()
+    if len(pk) == 1 and pk[0][1] == "INTEGER" and not without_rowid:
+        return pk[0][0]
+    return None
+
+
+def migrate_table(conn, table, chunk_size=50_000, progress=None):
+    """Tek tabloyu kuruşa taşı; çağıran bağlantı autocommit (isolation_level=None) olmalı"""
+    target = f"{table}__kurus"
+    _, expressions = MONEY_COLUMNS[table]
+    columns = list(_column_types(conn, table))
+    select = ", ".join(expressions[c].format(column=c) if c in expressions else c for c in columns)
+    insert = f"INSERT INTO {target} ({', '.join(columns)}) SELECT {select} FROM {table}"
+
+    if not conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (target,)).fetchone():
+        conn.execute(_target_ddl(conn, table, target))
+    key = _integer_primary_key(conn, table)
+    copied = 0
+    if key is None:
+        # WITHOUT ROWID tablolar tek ifadede kopyalanır; yarım kalan deneme temizlenir
+        conn.execute("BEGIN")
+        conn.execute(f"DELETE FROM {target}")
+        copied = conn.execute(insert).rowcount
+        conn.execute("COMMIT")
+    else:
+        # Kaldığı yerden devam: kopyadaki en büyük anahtardan sonrası aktarılır
+        after = conn.execute(f"SELECT COALESCE(MAX({key}), 0) FROM {target}").fetchone()[0]
+        while True:
+            conn.execute("BEGIN")
+            count = conn.execute(f"{insert} WHERE {key} > ? ORDER BY {key} LIMIT ?", (after, chunk_size)).rowcount
+            if count:
+                after = conn.execute(f"SELECT MAX({key}) FROM {target}").fetchone()[0]
+            conn.execute("COMMIT")
+            copied += count
+            if progress:
+                progress(table, copied)
+            if count < chunk_size:
+                break
+
+    # Eski tabloyu kopyayla değiştir (indeksler ve AUTOINCREMENT sayacı korunur)
+    conn.execute("BEGIN IMMEDIATE")
+    indexes = [row[0] for row in conn.execute(
+        "SELECT sql FROM sqlite_master WHERE type = 'index' AND tbl_name = ? AND sql IS NOT NULL", (table,)
+    )]
+    sequence = None
+    if conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'sqlite_sequence'").fetchone():
+        row = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = ?", (table,)).fetchone()
+        sequence = row[0] if row else None
+    conn.execute(f"DROP TABLE {table}")
+    conn.execute(f"ALTER TABLE {target} RENAME TO {table}")
+    for sql in indexes:
+        conn.execute(sql)
+    if sequence is not None:
+        conn.execute("UPDATE sqlite_sequence SET seq = MAX(seq, ?) WHERE name = ?", (sequence, table))
+    if table == "payments" and conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'idempotency_keys'"
+    ).fetchone():
+        conn.execute(IDEMPOTENCY_RESPONSES)
+    conn.execute("COMMIT")
+    return copied
+
+
+def migrate_money(conn, chunk_size=50_000, progress=None):
+    """REAL para kolonu kalan tüm tabloları taşı; taşınan tabloları döndür"""
+    existing = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    pending = [table for table in MONEY_COLUMNS if table in existing and needs_migration(conn, table)]
+    if not pending:
+        return []
+
+    isolation_level = conn.isolation_level
+    conn.commit()
+    conn.isolation_level = None
+    conn.execute("PRAGMA foreign_keys = OFF")
+    try:
+        for table in pending:
+            copied = migrate_table(conn, table, chunk_size, progress)
+            logger.info("%s: %d satır kuruşa taşındı", table, copied)
+    finally:
+        conn.isolation_level = isolation_level
+    return pending
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Para kolonlarını kuruşa taşı")
+    parser.add_argument("--db", default=None, help="Veritabanı dosyası (varsayılan DATABASE_PATH / accounts.db)")
+    parser.add_argument("--chunk-size", type=int, default=50_000)
+    args = parser.parse_args()
+
+    start_logging()
+    conn = sqlite3.connect(args.db or os.environ.get("DATABASE_PATH", "accounts.db"))
+    try:
+        migrated = migrate_money(
+            conn, args.chunk_size,
+            progress=lambda table, copied: print(f"{table}: {copied} satır...", end="\r", flush=True)
+        )
+    finally:
+        conn.close()
+        stop_logging()
+    print("taşınacak tablo yok" if not migrated else f"taşınan tablolar: {', '.join(migrated)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,488 @@
+"""Veritabanı şeması ve sürümlü migration çalıştırıcısı.
+
+Hesaplar, işletmeler ve tüm hareketler tek bir SQLite dosyasında tutulur.
+Şemanın sürümü `PRAGMA user_version` içinde saklanır; uygulama açılışında
+`migrate()` yalnızca bu değeri ve mevcut indeks adlarını okur; şema güncel ve
+indeksler yerindeyse hiçbir DDL çalıştırmaz.
+Bekleyen migration'lar sırayla uygulanır ve her biri, yarıda kesilirse
+yeniden çalıştırılabilecek şekilde idempotent yazılmıştır.
+
+    python migrations.py            # bekleyen migration'ları uygula
+    python migrations.py --status   # mevcut sürümü göster
+"""
+import argparse
+import os
+import re
+import sqlite3
+from datetime import datetime
+
+from applog import logger, start_logging, stop_logging
+from migrate_money import migrate_money
+from phones import assign_normalized
+
+# Tek veritabanı dosyası (benchmark ve testlerde ortam değişkeniyle değiştirilebilir)
+DB_PATH = os.environ.get("DATABASE_PATH", "accounts.db")
+
+# Ayrı dosyada tutulan eski işletme veritabanı (migration 2 ile içe aktarılır)
+LEGACY_MERCHANTS_DB = os.environ.get("MERCHANTS_DB", "merchants.db")
+
+# Migration 1'in kurduğu şema (tüm para tutarları tamsayı kuruş). Bu tanımlar
+# değiştirilmez: yeni tablo ve kolonlar kendi migration'larıyla eklenir ve
+# güncel halleri aşağıdaki TABLES'a yazılır
+BASELINE_TABLES = {
+    "accounts": """
+    CREATE TABLE IF NOT EXISTS accounts (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT NOT NULL,
+        phone TEXT NOT NULL,
+        created_at TEXT NOT NULL,
+        balance INTEGER DEFAULT 0
+    )""",
+    "merchants": """
+    CREATE TABLE IF NOT EXISTS merchants (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT NOT NULL,
+        category TEXT CHECK (category IN ('cafe', 'market', 'transport', 'other'))
+    )""",
+    "transfers": """
+    CREATE TABLE IF NOT EXISTS transfers (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        from_account_id INTEGER,
+        to_account_id INTEGER,
+        amount INTEGER,
+        created_at TEXT,
+        FOREIGN KEY (from_account_id) REFERENCES accounts (id),
+        FOREIGN KEY (to_account_id) REFERENCES accounts (id)
+    )""",
+    # Kategori, bütçe hesapları için ödeme anında işletmeden kopyalanır
+    "payments": """
+    CREATE TABLE IF NOT EXISTS payments (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        account_id INTEGER NOT NULL,
+        merchant_id INTEGER NOT NULL,
+        category TEXT NOT NULL,
+        amount INTEGER NOT NULL,
+        channel TEXT NOT NULL DEFAULT 'direct',
+        created_at TEXT NOT NULL,
+        FOREIGN KEY (account_id) REFERENCES accounts (id),
+        FOREIGN KEY (merchant_id) REFERENCES merchants (id)
+    )""",
+    # Aylık kategori bütçeleri ve ödeme başına güncellenen harcama toplamları
+    "budgets": """
+    CREATE TABLE IF NOT EXISTS budgets (
+        account_id INTEGER NOT NULL,
+        category TEXT NOT NULL CHECK (category IN ('cafe', 'market', 'transport', 'other')),
+        monthly_limit INTEGER NOT NULL,
+        PRIMARY KEY (account_id, category),
+        FOREIGN KEY (account_id) REFERENCES accounts (id)
+    ) WITHOUT ROWID""",
+    "spending_totals": """
+    CREATE TABLE IF NOT EXISTS spending_totals (
+        account_id INTEGER NOT NULL,
+        category TEXT NOT NULL,
+        month TEXT NOT NULL,
+        total INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (account_id, category, month),
+        FOREIGN KEY (account_id) REFERENCES accounts (id)
+    ) WITHOUT ROWID""",
+    # Cashback kampanyaları (veri olarak tanımlanır), ilk ödeme durumu ve iade kayıtları
+    "cashback_campaigns": """
+    CREATE TABLE IF NOT EXISTS cashback_campaigns (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT NOT NULL,
+        kind TEXT NOT NULL CHECK (kind IN ('percent', 'fixed')),
+        value REAL NOT NULL,  -- percent: yüzde, fixed: kuruş
+        category TEXT,
+        merchant_id INTEGER,
+        channel TEXT,
+        first_payment_only INTEGER NOT NULL DEFAULT 0,
+        max_amount INTEGER,
+        active INTEGER NOT NULL DEFAULT 1,
+        FOREIGN KEY (merchant_id) REFERENCES merchants (id)
+    )""",
+    "cashback_first_payments": """
+    CREATE TABLE IF NOT EXISTS cashback_first_payments (
+        account_id INTEGER NOT NULL,
+        campaign_id INTEGER NOT NULL,
+        PRIMARY KEY (account_id, campaign_id),
+        FOREIGN KEY (account_id) REFERENCES accounts (id),
+        FOREIGN KEY (campaign_id) REFERENCES cashback_campaigns (id)
+    ) WITHOUT ROWID""",
+    "cashback_credits": """
+    CREATE TABLE IF NOT EXISTS cashback_credits (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        payment_id INTEGER NOT NULL,
+        account_id INTEGER NOT NULL,
+        campaign_id INTEGER NOT NULL,
+        amount INTEGER NOT NULL,
+        created_at TEXT NOT NULL,
+        FOREIGN KEY (payment_id) REFERENCES payments (id),
+        FOREIGN KEY (account_id) REFERENCES accounts (id),
+        FOREIGN KEY (campaign_id) REFERENCES cashback_campaigns (id)
+    )""",
+    # Idempotency anahtarları (QR ödeme onayı vb. tekrar denemeleri için)
+    "idempotency_keys": """
+    CREATE TABLE IF NOT EXISTS idempotency_keys (
+        key TEXT PRIMARY KEY,
+        account_id INTEGER NOT NULL,
+        reference TEXT,
+        response TEXT NOT NULL,
+        created_at TEXT NOT NULL,
+        FOREIGN KEY (account_id) REFERENCES accounts (id)
+    ) WITHOUT ROWID""",
+    # Hesap bölüşme grupları ve borç grafiği
+    "split_groups": """
+    CREATE TABLE IF NOT EXISTS split_groups (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT NOT NULL,
+        created_at TEXT NOT NULL
+    )""",
+    "split_members": """
+    CREATE TABLE IF NOT EXISTS split_members (
+        group_id INTEGER NOT NULL,
+        account_id INTEGER NOT NULL,
+        PRIMARY KEY (group_id, account_id),
+        FOREIGN KEY (group_id) REFERENCES split_groups (id),
+        FOREIGN KEY (account_id) REFERENCES accounts (id)
+    ) WITHOUT ROWID""",
+    "split_expenses": """
+    CREATE TABLE IF NOT EXISTS split_expenses (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        group_id INTEGER NOT NULL,
+        payer_id INTEGER NOT NULL,
+        amount INTEGER NOT NULL,
+        description TEXT,
+        created_at TEXT NOT NULL,
+        FOREIGN KEY (group_id) REFERENCES split_groups (id),
+        FOREIGN KEY (payer_id) REFERENCES accounts (id)
+    )""",
+    # Her hesap çifti için tek satır: amount > 0 ise account_a, account_b'ye borçlu
+    "split_debts": """
+    CREATE TABLE IF NOT EXISTS split_debts (
+        group_id INTEGER NOT NULL,
+        account_a INTEGER NOT NULL,
+        account_b INTEGER NOT NULL,
+        amount INTEGER NOT NULL,
+        PRIMARY KEY (group_id, account_a, account_b),
+        CHECK (account_a < account_b),
+        FOREIGN KEY (group_id) REFERENCES split_groups (id),
+        FOREIGN KEY (account_a) REFERENCES accounts (id),
+        FOREIGN KEY (account_b) REFERENCES accounts (id)
+    ) WITHOUT ROWID""",
+}
+
+BASELINE_INDEXES = (
+    # Hesap bazlı geçmiş sorguları için (hesap, tarih) indeksleri
+    "CREATE INDEX IF NOT EXISTS idx_transfers_from_created ON transfers (from_account_id, created_at)",
+    "CREATE INDEX IF NOT EXISTS idx_transfers_to_created ON transfers (to_account_id, created_at)",
+    "CREATE INDEX IF NOT EXISTS idx_payments_account_created ON payments (account_id, created_at)",
+    "CREATE INDEX IF NOT EXISTS idx_payments_merchant_created ON payments (merchant_id, created_at)",
+    "CREATE INDEX IF NOT EXISTS idx_cashback_credits_account ON cashback_credits (account_id, created_at)",
+)
+
+# Migration 4: bakiye defteri ve snapshot'lar
+JOURNAL_TABLES = {
+    # Her bakiye değişikliği için yalnızca eklenen defter satırı (fark, tür, ilgili hareket ID'si)
+    "balance_journal": """
+    CREATE TABLE IF NOT EXISTS balance_journal (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        account_id INTEGER NOT NULL,
+        delta INTEGER NOT NULL,
+        kind TEXT NOT NULL,
+        reference INTEGER,
+        created_at TEXT NOT NULL,
+        FOREIGN KEY (account_id) REFERENCES accounts (id)
+    )""",
+    # Hesabın journal_id'ye kadarki (dahil) hareketlerden hesaplanan bakiyesi
+    "balance_snapshots": """
+    CREATE TABLE IF NOT EXISTS balance_snapshots (
+        account_id INTEGER NOT NULL,
+        journal_id INTEGER NOT NULL,
+        balance INTEGER NOT NULL,
+        created_at TEXT NOT NULL,
+        PRIMARY KEY (account_id, journal_id),
+        FOREIGN KEY (account_id) REFERENCES accounts (id)
+    ) WITHOUT ROWID""",
+}
+
+JOURNAL_INDEXES = (
+    "CREATE INDEX IF NOT EXISTS idx_balance_journal_account ON balance_journal (account_id, id)",
+    "CREATE INDEX IF NOT EXISTS idx_balance_snapshots_journal ON balance_snapshots (journal_id)",
+)
+
+# Güncel tablo tanımları: migration 5 telefon kolonunu, migration 6 bakiye kısıtını ekler
+TABLES = {
+    **BASELINE_TABLES,
+    "accounts": """
+    CREATE TABLE IF NOT EXISTS accounts (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT NOT NULL,
+        phone TEXT NOT NULL,
+        created_at TEXT NOT NULL,
+        balance INTEGER DEFAULT 0 CONSTRAINT balance_integer CHECK (typeof(balance) = 'integer'),
+        phone_normalized TEXT  -- phones.normalize_phone; yinelenen/geçersiz numaralarda boş
+    )""",
+    **JOURNAL_TABLES,
+}
+
+INDEXES = BASELINE_INDEXES + JOURNAL_INDEXES
+
+# Telefonla hesap bulma; toplu yüklemede düşürülmez (tekillik yükleme sırasında denetlenir)
+PHONE_INDEX = "CREATE UNIQUE INDEX IF NOT EXISTS idx_accounts_phone ON accounts (phone_normalized)"
+
+
+def index_name(ddl):
+    return re.search(r"INDEX IF NOT EXISTS (\w+)", ddl).group(1)
+
+
+def restore_indexes(conn):
+    """Eksik ikincil indeksleri kur (ör. yarıda kesilen bir toplu yüklemenin düşürdükleri)"""
+    existing = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    missing = [ddl for ddl in INDEXES if index_name(ddl) not in existing]
+    if not missing:
+        return []
+    conn.execute("BEGIN IMMEDIATE")
+    for ddl in missing:
+        conn.execute(ddl)
+    conn.execute("COMMIT")
+    logger.warning("eksik indeksler yeniden kuruldu: %s", ", ".join(map(index_name, missing)))
+    return missing
+
+
+def _columns(conn, table):
+    return [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]
+
+
+def _baseline(conn):
+    """Temel tabloları oluştur; eski accounts.db dosyalarını bu şemaya getir"""
+    conn.execute("BEGIN IMMEDIATE")
+    for ddl in BASELINE_TABLES.values():
+        conn.execute(ddl)
+
+    # Eski /api/transfer şemasındaki kolon adlarını düzelt
+    if "from_user_id" in _columns(conn, "transfers"):
+        conn.execute("ALTER TABLE transfers RENAME COLUMN from_user_id TO from_account_id")
+        conn.execute("ALTER TABLE transfers RENAME COLUMN to_user_id TO to_account_id")
+    if "channel" not in _columns(conn, "payments"):
+        conn.execute("ALTER TABLE payments ADD COLUMN channel TEXT NOT NULL DEFAULT 'direct'")
+    for ddl in BASELINE_INDEXES:
+        conn.execute(ddl)
+    conn.execute("COMMIT")
+
+    # Eski (REAL, TL) para kolonlarını kuruşa çevir
+    migrate_money(conn)
+
+
+def _has_table(conn, schema, table):
+    return conn.execute(
+        f"SELECT 1 FROM {schema}.sqlite_master WHERE type = 'table' AND name = ?", (table,)
+    ).fetchone() is not None
+
+
+def _import_singular_merchants(conn, schema):
+    """İlk sürümün `merchant` (merchant_id, name, category) tablosundaki işletmeleri ekle.
+
+    Bu tabloya hiçbir hareket bağlı değildir; ID'si `merchants`ta boşsa korunur,
+    doluysa yeni ID verilir. Aynı ad ve kategorideki işletme yeniden eklenmez.
+    """
+    if not _has_table(conn, schema, "merchant"):
+        return 0
+    copied = 0
+    rows = conn.execute(f"SELECT merchant_id, name, category FROM {schema}.merchant ORDER BY merchant_id").fetchall()
+    for merchant_id, name, category in rows:
+        if conn.execute(
+            "SELECT 1 FROM merchants WHERE name = ? AND category IS ?", (name, category)
+        ).fetchone():
+            continue
+        if conn.execute("SELECT 1 FROM merchants WHERE id = ?", (merchant_id,)).fetchone():
+            merchant_id = None
+        conn.execute("INSERT INTO merchants (id, name, category) VALUES (?, ?, ?)", (merchant_id, name, category))
+        copied += 1
+    return copied
+
+
+def _import_merchants(conn, legacy_path=None):
+    """Ayrı merchants.db dosyasındaki ve eski `merchant` tablolarındaki işletmeleri taşı.
+
+    `merchants` satırları ID'leriyle birlikte taşınır (ödemeler bu ID'lere
+    bağlıdır); ilk sürümün `merchant` tablosu ondan sonra eklenir.
+    """
+    legacy_path = legacy_path or LEGACY_MERCHANTS_DB
+    database = conn.execute("PRAGMA database_list").fetchone()[2]
+    attach = os.path.exists(legacy_path) and not (database and os.path.samefile(legacy_path, database))
+
+    if attach:
+        conn.execute("ATTACH DATABASE ? AS legacy", (legacy_path,))
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        copied = 0
+        if attach and _has_table(conn, "legacy", "merchants"):
+            copied += conn.execute(
+                "INSERT OR IGNORE INTO merchants (id, name, category) SELECT id, name, category FROM legacy.merchants"
+            ).rowcount
+        if attach:
+            copied += _import_singular_merchants(conn, "legacy")
+        copied += _import_singular_merchants(conn, "main")
+        conn.execute("COMMIT")
+        if copied:
+            logger.info("%s: %d işletme taşındı", legacy_path if attach else database, copied)
+    finally:
+        if attach:
+            conn.execute("DETACH DATABASE legacy")
+
+
+def _foreign_keys(table, conn):
+    return {(row[2], row[3]) for row in conn.execute(f"PRAGMA foreign_key_list({table})")}
+
+
+def _rebuild(conn, table, definition):
+    """Tabloyu verilen tanımla yeniden oluştur (SQLite'ta sonradan FK ya da CHECK eklenemez)"""
+    target = f"{table}__new"
+    ddl = re.sub(rf"CREATE TABLE IF NOT EXISTS {table}\b", f"CREATE TABLE {target}", definition, count=1)
+    conn.execute(f"DROP TABLE IF EXISTS {target}")
+    conn.execute(ddl)
+    columns = ", ".join(c for c in _columns(conn, target) if c in set(_columns(conn, table)))
+    conn.execute(f"INSERT INTO {target} ({columns}) SELECT {columns} FROM {table}")
+
+    sequence = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = ?", (table,)).fetchone()
+    conn.execute(f"DROP TABLE {table}")
+    conn.execute(f"ALTER TABLE {target} RENAME TO {table}")
+    if sequence:
+        conn.execute("UPDATE sqlite_sequence SET seq = MAX(seq, ?) WHERE name = ?", (sequence[0], table))
+
+
+def _add_foreign_keys(conn):
+    """Yabancı anahtarı eksik (eski sürümlerde oluşturulmuş) tabloları yeniden kur"""
+    reference = sqlite3.connect(":memory:")
+    for ddl in BASELINE_TABLES.values():
+        reference.execute(ddl)
+    outdated = [table for table in BASELINE_TABLES if _foreign_keys(table, conn) != _foreign_keys(table, reference)]
+    reference.close()
+    if not outdated:
+        return
+
+    conn.execute("BEGIN IMMEDIATE")
+    for table in outdated:
+        _rebuild(conn, table, BASELINE_TABLES[table])
+    for ddl in BASELINE_INDEXES:
+        conn.execute(ddl)
+    conn.execute("COMMIT")
+    logger.info("yabancı anahtarlar eklendi: %s", ", ".join(outdated))
+
+    violations = conn.execute("PRAGMA foreign_key_check").fetchall()
+    if violations:
+        logger.warning("%d satır yabancı anahtar kısıtını ihlal ediyor (PRAGMA foreign_key_check)", len(violations))
+
+
+def _add_balance_journal(conn):
+    """Bakiye defteri ve snapshot tablolarını kur; mevcut bakiyeleri açılış kaydı olarak yaz"""
+    conn.execute("BEGIN IMMEDIATE")
+    for ddl in JOURNAL_TABLES.values():
+        conn.execute(ddl)
+    for ddl in JOURNAL_INDEXES:
+        conn.execute(ddl)
+    # Yarıda kalmış bir çalıştırmada açılışı yazılmış hesaplar atlanır
+    opened = conn.execute("""
+        INSERT INTO balance_journal (account_id, delta, kind, reference, created_at)
+        SELECT id, balance, 'open', NULL, ? FROM accounts
+        WHERE balance != 0 AND id NOT IN (SELECT account_id FROM balance_journal WHERE kind = 'open')
+        ORDER BY id
+    """, (datetime.now().isoformat(),)).rowcount
+    conn.execute("COMMIT")
+    logger.info("%d hesabın açılış bakiyesi deftere yazıldı", opened)
+
+
+def _add_phone_index(conn):
+    """Normalize telefon kolonunu doldur ve tekil indeksini kur"""
+    conn.execute("BEGIN IMMEDIATE")
+    if "phone_normalized" not in _columns(conn, "accounts"):
+        conn.execute("ALTER TABLE accounts ADD COLUMN phone_normalized TEXT")
+    taken = [row[0] for row in conn.execute("SELECT phone_normalized FROM accounts WHERE phone_normalized IS NOT NULL")]
+    updates, skipped = assign_normalized(
+        conn.execute("SELECT id, phone FROM accounts WHERE phone_normalized IS NULL"), taken
+    )
+    conn.executemany("UPDATE accounts SET phone_normalized = ? WHERE id = ?", updates)
+    conn.execute(PHONE_INDEX)
+    conn.execute("COMMIT")
+    if skipped:
+        logger.warning("%d hesabın telefonu geçersiz ya da başka bir hesapta kayıtlı; telefonla bulunamaz", skipped)
+
+
+def _check_integer_balance(conn):
+    """accounts.balance'ı tamsayıya kısıtla; 64 biti aşan toplam REAL'e dönüşmek yerine reddedilir"""
+    conn.execute("BEGIN IMMEDIATE")
+    ddl = conn.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'accounts'").fetchone()[0]
+    if "balance_integer" not in ddl:
+        fixed = conn.execute(
+            "UPDATE accounts SET balance = CAST(COALESCE(balance, 0) AS INTEGER) WHERE typeof(balance) != 'integer'"
+        ).rowcount
+        _rebuild(conn, "accounts", TABLES["accounts"])
+        conn.execute(PHONE_INDEX)
+        if fixed:
+            logger.warning("%d hesabın tamsayı olmayan bakiyesi tamsayıya çevrildi", fixed)
+    conn.execute("COMMIT")
+
+
+# (sürüm, açıklama, uygulama fonksiyonu); yeni migration'lar sona eklenir
+MIGRATIONS = (
+    (1, "Temel şema: hesaplar, transferler, ödemeler, bütçe, cashback, bölüşme", _baseline),
+    (2, "İşletmeler aynı veritabanına taşındı", _import_merchants),
+    (3, "Hesap, işletme ve hareket tabloları arasında yabancı anahtarlar", _add_foreign_keys),
+    (4, "Bakiye defteri (journal) ve snapshot tabloları", _add_balance_journal),
+    (5, "Normalize telefon numarası ve tekil telefon indeksi", _add_phone_index),
+    (6, "Hesap bakiyesi için tamsayı kısıtı", _check_integer_balance),
+)
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def schema_version(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(path=None):
+    """Bekleyen migration'ları uygula ve uygulanan sürümleri döndür.
+
+    Şema güncelse yalnızca `PRAGMA user_version` ve indeks listesi okunur.
+    """
+    conn = sqlite3.connect(path or DB_PATH, isolation_level=None)
+    try:
+        version = schema_version(conn)
+        pending = [migration for migration in MIGRATIONS if migration[0] > version]
+        if not pending:
+            restore_indexes(conn)
+            return []
+
+        # Tablo yeniden kurulumları sırasında FK denetimi kapalı olmalı
+        conn.execute("PRAGMA foreign_keys = OFF")
+        for number, description, apply in pending:
+            apply(conn)
+            conn.execute(f"PRAGMA user_version = {number}")
+            logger.info("migration %d: %s", number, description)
+        restore_indexes(conn)
+        return [number for number, _, _ in pending]
+    finally:
+        conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Veritabanı migration'ları")
+    parser.add_argument("--db", default=None, help="Veritabanı dosyası (varsayılan DATABASE_PATH / accounts.db)")
+    parser.add_argument("--status", action="store_true", help="Yalnızca mevcut sürümü göster")
+    args = parser.parse_args()
+
+    if args.status:
+        conn = sqlite3.connect(args.db or DB_PATH)
+        print(f"şema sürümü: {schema_version(conn)} / {LATEST_VERSION}")
+        conn.close()
+        return
+    start_logging()
+    try:
+        applied = migrate(args.db)
+    finally:
+        stop_logging()
+    print("şema güncel" if not applied else f"uygulanan sürümler: {applied}")
+
+
+if __name__ == "__main__":
+    main()
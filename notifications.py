@@ -0,0 +1,209 @@
+"""Bakiye ve ödeme bildirimleri için süreç içi yayın (pub/sub) merkezi.
+
+Bakiye değiştiren yollar (ledger yazıcısı; Postgres arka ucunda LISTEN
+kanalı) commit'ten sonra `hub.publish` ile hesaba bir olay yayınlar;
+`/api/events` (SSE) ve `/ws/events` (WebSocket) bağlantıları hesaplarına
+abone olup olayları istemciye iletir. Olay bir kez JSON'a çevrilir ve aynı
+metin tüm abonelere gönderilir.
+
+Yayıncı hiçbir zaman beklemez: her bağlantının kuyruğu `queue_size` ile
+sınırlıdır ve dolduğunda (istemci okumuyor, soket tamponu dolmuş) bağlantı
+"yavaş tüketici" olarak düşürülür; kuyruğu hemen serbest bırakılır.
+Yeniden bağlanan istemci ilk olay olarak güncel bakiyeyi aldığından kaçan
+olaylar tekrar oynatılmaz. Olaylar yalnızca bu süreçteki abonelere gider.
+
+Açık SSE akışları uvicorn'un kapanışta bağlantıların bitmesini beklemesine
+yol açar; sunucu `--timeout-graceful-shutdown` ile çalıştırılmalıdır (akışlar
+en geç `NOTIFY_STREAM_TTL` sonunda kendiliğinden biter).
+"""
+import asyncio
+import json
+import os
+from collections import deque
+from typing import NamedTuple
+
+# Aboneliğin kapanma nedenleri
+SLOW_CONSUMER = "slow_consumer"
+SHUTDOWN = "shutdown"
+DISCONNECTED = "disconnected"
+
+
+class Event(NamedTuple):
+    id: int
+    kind: str
+    text: str  # {"id", "type", "data"} JSON'u; tüm abonelere aynı metin gider
+
+
+class TooManySubscribers(Exception):
+    """Bağlantı sınırı (toplam ya da hesap başına) dolu"""
+
+
+class SubscriptionClosed(Exception):
+    def __init__(self, reason):
+        super().__init__(reason)
+        self.reason = reason
+
+
+class Subscription:
+    """Tek bir bağlantının sınırlı olay kuyruğu"""
+
+    __slots__ = ("account_id", "maxsize", "queue", "reason", "_waiter")
+
+    def __init__(self, account_id, maxsize):
+        self.account_id = account_id
+        self.maxsize = maxsize
+        self.queue = deque()
+        self.reason = None
+        self._waiter = None
+
+    def push(self, event):
+        """Olayı kuyruğa ekle; kuyruk doluysa False"""
+        if len(self.queue) >= self.maxsize:
+            return False
+        self.queue.append(event)
+        self._wake()
+        return True
+
+    def close(self, reason):
+        if self.reason is None:
+            self.reason = reason
+            self.queue.clear()
+            self._wake()
+
+    def _wake(self):
+        if self._waiter is not None and not self._waiter.done():
+            self._waiter.set_result(None)
+
+    async def get(self, timeout=None):
+        """Sıradaki olay; `timeout` saniye içinde gelmezse None.
+
+        Abonelik kapandıysa SubscriptionClosed fırlatır.
+        """
+        if not self.queue and self.reason is None:
+            loop = asyncio.get_running_loop()
+            self._waiter = loop.create_future()
+            # wait_for yerine tek bir zamanlayıcı: boşta bekleyen binlerce bağlantıda ucuz
+            handle = loop.call_later(timeout, self._wake) if timeout else None
+            try:
+                await self._waiter
+            finally:
+                self._waiter = None
+                if handle is not None:
+                    handle.cancel()
+        if self.queue:
+            return self.queue.popleft()
+        if self.reason is not None:
+            raise SubscriptionClosed(self.reason)
+        return None
+
+
+class NotificationHub:
+    """Hesap ID'sine göre abonelik tablosu ve yayın"""
+
+    def __init__(self, queue_size=64, max_connections=20_000, max_per_account=8):
+        self.queue_size = queue_size
+        self.max_connections = max_connections
+        self.max_per_account = max_per_account
+        self._subscribers = {}
+        self._connections = 0
+        self._sequence = 0
+
+        # Metrikler
+        self.published = 0
+        self.delivered = 0
+        self.dropped = 0
+        self.rejected = 0
+
+    def subscribe(self, account_id):
+        subscribers = self._subscribers.get(account_id)
+        if self._connections >= self.max_connections or (
+            subscribers is not None and len(subscribers) >= self.max_per_account
+        ):
+            self.rejected += 1
+            raise TooManySubscribers("Bildirim bağlantı sınırı dolu")
+        subscription = Subscription(account_id, self.queue_size)
+        if subscribers is None:
+            subscribers = self._subscribers[account_id] = []
+        subscribers.append(subscription)
+        self._connections += 1
+        return subscription
+
+    def unsubscribe(self, subscription):
+        subscribers = self._subscribers.get(subscription.account_id)
+        if subscribers is None or subscription not in subscribers:
+            return
+        subscribers.remove(subscription)
+        if not subscribers:
+            del self._subscribers[subscription.account_id]
+        self._connections -= 1
+
+    def event(self, kind, data):
+        self._sequence += 1
+        return Event(self._sequence, kind, json.dumps(
+            {"id": self._sequence, "type": kind, "data": data}, ensure_ascii=False
+        ))
+
+    def publish(self, account_id, kind, data):
+        """Olayı hesabın tüm bağlantılarına ilet; iletilen bağlantı sayısını döndür"""
+        self.published += 1
+        subscribers = self._subscribers.get(account_id)
+        if not subscribers:
+            return 0
+        event = self.event(kind, data)
+        delivered = 0
+        for subscription in list(subscribers):
+            if subscription.push(event):
+                delivered += 1
+            else:
+                subscription.close(SLOW_CONSUMER)
+                self.unsubscribe(subscription)
+                self.dropped += 1
+        self.delivered += delivered
+        return delivered
+
+    def close(self):
+        """Tüm bağlantıları kapat (kapanışta akışların bitmesi için)"""
+        for subscribers in list(self._subscribers.values()):
+            for subscription in list(subscribers):
+                subscription.close(SHUTDOWN)
+                self.unsubscribe(subscription)
+
+    def stats(self):
+        return {
+            "connections": self._connections,
+            "accounts": len(self._subscribers),
+            "published": self.published,
+            "delivered": self.delivered,
+            "dropped": self.dropped,
+            "rejected": self.rejected,
+        }
+
+
+async def sse_stream(subscription, first, heartbeat=15.0, lifetime=None):
+    """Aboneliği Server-Sent Events çerçeveleri olarak akıt.
+
+    `first` bağlantı açılınca gönderilen olaydır (güncel bakiye). Boşta
+    geçen her `heartbeat` saniyede bir yorum satırı gönderilir (proxy'ler
+    bağlantıyı kesmesin); `lifetime` dolunca akış biter ve EventSource
+    yeniden bağlanır.
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + lifetime if lifetime else None
+    yield "retry: 3000\n" + sse_frame(first)
+    while deadline is None or loop.time() < deadline:
+        try:
+            event = await subscription.get(heartbeat)
+        except SubscriptionClosed:
+            return
+        yield ": ping\n\n" if event is None else sse_frame(event)
+
+
+def sse_frame(event):
+    return f"id: {event.id}\nevent: {event.kind}\ndata: {event.text}\n\n"
+
+
+hub = NotificationHub(
+    queue_size=int(os.environ.get("NOTIFY_QUEUE_SIZE", "64")),
+    max_connections=int(os.environ.get("NOTIFY_MAX_CONNECTIONS", "20000")),
+    max_per_account=int(os.environ.get("NOTIFY_MAX_PER_ACCOUNT", "8")),
+)
@@ -0,0 +1,107 @@
+"""Yavaş istekler için isteğe bağlı örnekleyici profiler.
+
+Etkinleştirildiğinde (`PROFILE_SLOW_MS`) ayrı bir thread her `interval`
+saniyede süreçteki tüm thread'lerin yığınlarını `sys._current_frames()` ile
+okuyup son `window` saniyelik bir halka tamponda tutar. Eşikten uzun süren
+bir istek bittiğinde, isteğin başlangıç-bitiş aralığındaki örnekler
+flamegraph.pl / speedscope'un okuduğu katlanmış yığın biçiminde
+(`thread;çerçeve;çerçeve adet`) `PROFILE_DIR` altına yazılır. Event loop tek
+thread olduğu için örnekler o aralıkta sürecin yaptığı her şeyi kapsar;
+eşzamanlı diğer istekler de görünür.
+
+Dosya yazımı da örnekleyici thread'de yapılır; istek yolu yalnızca kuyruğa ekler.
+"""
+import os
+import queue
+import re
+import sys
+import threading
+import time
+from collections import Counter, deque
+
+from applog import logger
+
+
+def _frame_label(code):
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class SamplingProfiler:
+    def __init__(self, threshold, interval=0.005, window=30.0, directory="profiles"):
+        self.threshold = threshold
+        self.interval = interval
+        self.directory = directory
+        self._samples = deque(maxlen=max(1, int(window / interval)))
+        self._dumps = queue.SimpleQueue()
+        self._stop = threading.Event()
+        self._thread = None
+        self.dumped = 0
+
+    def start(self):
+        if self._thread is not None:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+
+    def dump(self, started, finished, name):
+        """[started, finished] (perf_counter) aralığındaki örnekleri dosyaya yazdır"""
+        self._dumps.put((started, finished, name))
+
+    def _sample(self):
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        own = threading.get_ident()
+        stacks = []
+        for ident, frame in sys._current_frames().items():
+            if ident == own:
+                continue
+            labels = []
+            while frame is not None:
+                labels.append(_frame_label(frame.f_code))
+                frame = frame.f_back
+            labels.append(names.get(ident, str(ident)))
+            stacks.append(";".join(reversed(labels)))
+        self._samples.append((time.perf_counter(), stacks))
+
+    def _write(self, started, finished, name):
+        folded = Counter(
+            stack for at, stacks in list(self._samples) if started <= at <= finished for stack in stacks
+        )
+        if not folded:
+            return
+        slug = re.sub(r"[^A-Za-z0-9]+", "_", name).strip("_")
+        path = os.path.join(self.directory, f"{time.strftime('%Y%m%d-%H%M%S')}-{int((finished - started) * 1000)}ms-{slug}.folded")
+        with open(path, "w", encoding="utf-8") as f:
+            f.writelines(f"{stack} {count}\n" for stack, count in folded.items())
+        self.dumped += 1
+        logger.info("yavaş istek profili yazıldı: %s (%d örnek)", path, sum(folded.values()))
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._sample()
+            while True:
+                try:
+                    started, finished, name = self._dumps.get_nowait()
+                except queue.Empty:
+                    break
+                self._write(started, finished, name)
+
+
+def profiler_from_env():
+    """PROFILE_SLOW_MS tanımlıysa profiler oluştur, değilse None"""
+    threshold = os.environ.get("PROFILE_SLOW_MS")
+    if not threshold:
+        return None
+    return SamplingProfiler(
+        float(threshold) / 1000,
+        interval=float(os.environ.get("PROFILE_INTERVAL_MS", "5")) / 1000,
+        directory=os.environ.get("PROFILE_DIR", "profiles"),
+    )
@@ -0,0 +1,120 @@
+"""QR ödeme istekleri (payment intent).
+
+İşletmenin oluşturduğu ödeme isteği, işletme kategorisi doğrulanmış halde
+bellekteki TTL'li bir depoda tutulur; müşteri onayı sırasında istek için
+veritabanına gidilmez. Süresi dolan istekler okuma anında ve periyodik bir
+görevle temizlenir.
+"""
+import asyncio
+import os
+import secrets
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Optional
+
+# İstek durumları
+PENDING = "pending"
+PROCESSING = "processing"
+PAID = "paid"
+
+
+@dataclass
+class PaymentIntent:
+    id: str
+    merchant_id: int
+    category: str
+    amount: int  # kuruş
+    created_at: datetime
+    expires_at: datetime
+    deadline: float  # time.monotonic() tabanlı son geçerlilik
+    status: str = PENDING
+    payment_id: Optional[int] = None
+
+    @property
+    def qr_payload(self):
+        return f"binarypower://pay?intent={self.id}"
+
+
+class IntentStore:
+    """TTL'li bellek içi ödeme isteği deposu"""
+
+    def __init__(self, default_ttl=300.0, max_ttl=3600.0, evict_interval=30.0):
+        self.default_ttl = default_ttl
+        self.max_ttl = max_ttl
+        self.evict_interval = evict_interval
+        self._intents = {}
+        self._task = None
+
+        # Depo metrikleri
+        self.created = 0
+        self.evicted = 0
+
+    def create(self, merchant_id, category, amount, ttl=None):
+        ttl = min(ttl or self.default_ttl, self.max_ttl)
+        now = datetime.now()
+        intent = PaymentIntent(
+            id=secrets.token_urlsafe(12),
+            merchant_id=merchant_id,
+            category=category,
+            amount=amount,
+            created_at=now,
+            expires_at=now + timedelta(seconds=ttl),
+            deadline=time.monotonic() + ttl,
+        )
+        self._intents[intent.id] = intent
+        self.created += 1
+        return intent
+
+    def get(self, intent_id):
+        """İsteği döndür; süresi dolmuşsa sil ve None döndür"""
+        intent = self._intents.get(intent_id)
+        if intent is None:
+            return None
+        if intent.deadline < time.monotonic() and intent.status == PENDING:
+            del self._intents[intent_id]
+            self.evicted += 1
+            return None
+        return intent
+
+    def evict_expired(self):
+        now = time.monotonic()
+        # Ödenmiş istekler tekrar denemelere yanıt verebilmek için TTL sonuna kadar tutulur
+        expired = [key for key, intent in self._intents.items()
+                   if intent.deadline < now and intent.status != PROCESSING]
+        for key in expired:
+            del self._intents[key]
+        self.evicted += len(expired)
+        return len(expired)
+
+    async def _evict_loop(self):
+        while True:
+            await asyncio.sleep(self.evict_interval)
+            self.evict_expired()
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._evict_loop())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    def stats(self):
+        return {"active": len(self._intents), "created": self.created, "evicted": self.evicted}
+
+
+intent_store = IntentStore(default_ttl=float(os.environ.get("QR_INTENT_TTL", "300")))
+
+
+def fetch_idempotent_result(conn, key):
+    """Anahtarla tamamlanmış işlemin (bağlı istek, hesap, sonuç JSON) kaydı"""
+    return conn.execute(
+        "SELECT reference, account_id, response FROM idempotency_keys WHERE key = ?", (key,)
+    ).fetchone()
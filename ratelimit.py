@@ -0,0 +1,392 @@
+"""Hesap ve IP başına istek sınırı ile saatlik tutar (velocity) sınırı.
+
+`RateLimitMiddleware` yalnızca `ROUTES` içindeki uçlarda (yol parametreli
+şablonlar dahil), routing ve bağımlılıklardan önce çalışır: hesap kimliği
+imzalı oturum çerezinden, oturum yoksa küçük JSON gövdeden okunur; reddedilen
+istek için hiçbir DB bağlantısı açılmaz. Her kural için iki tür sınır vardır:
+
+- token bucket (hesap ve IP başına): saniyede `rate` jeton dolar, en fazla
+  `burst` birikir; her istek bir jeton harcar.
+- kayan pencere (hesap başına tutar): son `window` saniyede gönderilen tutar
+  toplamı. Önceki ve mevcut sabit pencerenin ağırlıklı toplamıyla (sliding
+  window counter) anahtar başına sabit bellek ve O(1) denetimle yaklaşık
+  hesaplanır. Başarısız (4xx/5xx) işlemin tutarı pencereden geri düşülür.
+
+Durum varsayılan olarak süreç içi `MemoryStore`da tutulur (tembel süre
+sonu, amortize O(1) temizlik). Birden fazla worker sınırları paylaşacaksa
+`RATE_LIMIT_STORE=redis` ile `RedisStore` (Redis ya da uyumlu bir sunucu,
+`REDIS_URL`) seçilir; aynı algoritmalar orada Lua betikleriyle atomik çalışır.
+`redis` paketi isteğe bağlıdır ve yalnızca bu durumda gerekir.
+"""
+import json
+import math
+import os
+import re
+import time
+from typing import NamedTuple, Optional
+
+from starlette.responses import JSONResponse
+
+from metrics import registry
+from session import SESSION_COOKIE, signer
+
+REJECTIONS = registry.counter(
+    "rate_limit_rejections_total", "Sınır aşımı nedeniyle reddedilen istekler", ("route", "rule"))
+
+# Sınırlı uçlarda kabul edilen en büyük gövde (hesap ve tutar buradan okunur)
+MAX_BODY = 64 * 1024
+
+
+class Bucket(NamedTuple):
+    name: str
+    key: str  # "account" ya da "ip"
+    rate: float  # saniyede dolan jeton
+    burst: int
+
+
+class Velocity(NamedTuple):
+    name: str
+    limit: int  # pencere başına toplam tutar (kuruş)
+    window: int  # saniye
+
+
+class RouteLimits(NamedTuple):
+    account: Optional[str]  # "session" ya da oturum yoksa hesap ID'sinin okunduğu gövde alanı
+    buckets: tuple
+    velocity: Optional[Velocity] = None
+
+
+def _env_float(name, default):
+    return float(os.environ.get(name, default))
+
+
+ACCOUNT_BUCKET = Bucket("account", "account", _env_float("RATE_LIMIT_ACCOUNT_RATE", 5), int(_env_float("RATE_LIMIT_ACCOUNT_BURST", 20)))
+IP_BUCKET = Bucket("ip", "ip", _env_float("RATE_LIMIT_IP_RATE", 20), int(_env_float("RATE_LIMIT_IP_BURST", 60)))
+LOGIN_BUCKET = Bucket("login", "ip", _env_float("RATE_LIMIT_LOGIN_RATE", 0.2), int(_env_float("RATE_LIMIT_LOGIN_BURST", 10)))
+TRANSFER_VELOCITY = Velocity("transfer_amount", int(_env_float("TRANSFER_HOURLY_LIMIT", 5_000_000)), 3600)
+TOPUP_VELOCITY = Velocity("topup_amount", int(_env_float("TOPUP_HOURLY_LIMIT", 10_000_000)), 3600)
+PAYMENT_VELOCITY = Velocity("payment_amount", int(_env_float("PAYMENT_HOURLY_LIMIT", 5_000_000)), 3600)
+
+# Toplu transfer gövdeleri MAX_BODY'yi aşabildiği (upload akış halindedir) ve QR/hesaplaşma
+# tutarı gövdede olmadığı için bu uçlarda yalnızca jeton sınırı uygulanır
+ROUTES = {
+    ("POST", "/login"): RouteLimits(None, (LOGIN_BUCKET,)),
+    ("POST", "/api/topup"): RouteLimits("session", (ACCOUNT_BUCKET, IP_BUCKET), TOPUP_VELOCITY),
+    ("POST", "/api/transfer"): RouteLimits("session", (ACCOUNT_BUCKET, IP_BUCKET), TRANSFER_VELOCITY),
+    ("POST", "/transfers/"): RouteLimits("from_account_id", (ACCOUNT_BUCKET, IP_BUCKET), TRANSFER_VELOCITY),
+    ("POST", "/transfers/bulk"): RouteLimits("session", (ACCOUNT_BUCKET, IP_BUCKET)),
+    ("POST", "/transfers/bulk/upload"): RouteLimits("session", (ACCOUNT_BUCKET, IP_BUCKET)),
+    ("POST", "/payments/"): RouteLimits("session", (ACCOUNT_BUCKET, IP_BUCKET), PAYMENT_VELOCITY),
+    ("POST", "/qr/intents/{intent_id}/confirm"): RouteLimits("session", (ACCOUNT_BUCKET, IP_BUCKET)),
+    ("POST", "/splits/groups/{group_id}/settle"): RouteLimits("session", (ACCOUNT_BUCKET, IP_BUCKET)),
+}
+
+
+def compile_routes(routes):
+    """(tam yollar sözlüğü, (metot, regex, şablon, sınırlar) listesi); parametreli yollar regex'e çevrilir"""
+    exact, templated = {}, []
+    for (method, path), limits in routes.items():
+        if "{" in path:
+            pattern = re.compile("".join(
+                "[^/]+" if part.startswith("{") else re.escape(part) for part in re.split(r"(\{\w+\})", path)
+            ) + "$")
+            templated.append((method, pattern, path, limits))
+        else:
+            exact[(method, path)] = limits
+    return exact, templated
+
+
+class MemoryStore:
+    """Süreç içi sınır durumu.
+
+    Anahtar başına tek bir tuple tutulur; süresi dolan anahtarlar erişimde
+    sıfırlanır ve sözlük büyüdükçe (her ikiye katlanmada bir) topluca silinir.
+    """
+
+    def __init__(self):
+        self._data = {}
+        self._next_sweep = 1024
+
+    def _get(self, key, now):
+        entry = self._data.get(key)
+        if entry is not None and entry[-1] <= now:
+            del self._data[key]
+            return None
+        return entry
+
+    def _put(self, key, entry, now):
+        self._data[key] = entry
+        if len(self._data) >= self._next_sweep:
+            self._data = {k: v for k, v in self._data.items() if v[-1] > now}
+            self._next_sweep = max(1024, 2 * len(self._data))
+
+    async def take(self, key, rate, burst, now):
+        """Bir jeton harca; (izin, yeniden deneme saniyesi)"""
+        entry = self._get(key, now)
+        tokens = burst if entry is None else min(burst, entry[0] + (now - entry[1]) * rate)
+        allowed = tokens >= 1
+        if allowed:
+            tokens -= 1
+        # Kova dolduğunda anahtar gereksizdir
+        self._put(key, (tokens, now, now + (burst - tokens) / rate + 1), now)
+        return allowed, 0.0 if allowed else (1 - tokens) / rate
+
+    async def add(self, key, amount, limit, window, now):
+        """Pencereye tutar ekle (eksi tutar iade); (izin, yeniden deneme saniyesi)"""
+        start = now - now % window
+        entry = self._get(key, now)
+        current = previous = 0
+        if entry is not None:
+            if entry[0] == start:
+                current, previous = entry[1], entry[2]
+            elif entry[0] == start - window:
+                previous = entry[1]
+        used = previous * (1 - (now - start) / window) + current
+        if amount > 0 and used + amount > limit:
+            return False, _window_retry(previous, current, amount, limit, window, start, now)
+        current = max(0, current + amount)
+        self._put(key, (start, current, previous, start + 2 * window), now)
+        return True, 0.0
+
+    def stats(self):
+        return {"keys": len(self._data)}
+
+    async def close(self):
+        pass
+
+
+def _window_retry(previous, current, amount, limit, window, start, now):
+    """Ağırlıklı toplamın `amount`a yer açacağı ana kadar geçecek süre"""
+    if current + amount <= limit and previous:
+        # previous * (1 - (t - start) / window) + current + amount <= limit
+        return max(0.0, start + window * (1 - (limit - current - amount) / previous) - now)
+    return start + window - now
+
+
+# Lua'nın tostring'i 14 basamak yazar; zaman damgaları %.17g ile tam saklanır
+TAKE_SCRIPT = """
+local rate, burst, now = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3])
+local state = redis.call('HMGET', KEYS[1], 't', 'u')
+local tokens = burst
+if state[1] then tokens = math.min(burst, tonumber(state[1]) + (now - tonumber(state[2])) * rate) end
+local allowed = 0
+if tokens >= 1 then tokens = tokens - 1; allowed = 1 end
+redis.call('HSET', KEYS[1], 't', string.format('%.17g', tokens), 'u', string.format('%.17g', now))
+redis.call('PEXPIRE', KEYS[1], math.ceil(((burst - tokens) / rate + 1) * 1000))
+if allowed == 1 then return {1, '0'} end
+return {0, string.format('%.17g', (1 - tokens) / rate)}
+"""
+
+ADD_SCRIPT = """
+local amount, limit, window, now = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3]), tonumber(ARGV[4])
+local start = now - math.fmod(now, window)
+local state = redis.call('HMGET', KEYS[1], 's', 'c', 'p')
+local current, previous = 0, 0
+if state[1] then
+  local s = tonumber(state[1])
+  if s == start then current, previous = tonumber(state[2]), tonumber(state[3])
+  elseif s == start - window then previous = tonumber(state[2]) end
+end
+local used = previous * (1 - (now - start) / window) + current
+if amount > 0 and used + amount > limit then
+  return {0, string.format('%.17g', previous), string.format('%.17g', current), string.format('%.17g', start)}
+end
+current = math.max(0, current + amount)
+redis.call('HSET', KEYS[1], 's', string.format('%.17g', start), 'c', string.format('%.17g', current),
+           'p', string.format('%.17g', previous))
+redis.call('PEXPIREAT', KEYS[1], math.ceil((start + 2 * window) * 1000))
+return {1}
+"""
+
+
+class RedisStore:
+    """Redis (ya da uyumlu sunucu) üzerinde paylaşılan sınır durumu; her işlem tek Lua çağrısı"""
+
+    def __init__(self, url, prefix="rl:"):
+        try:
+            import redis.asyncio as redis
+        except ImportError:
+            raise RuntimeError("RATE_LIMIT_STORE=redis için redis kurulu olmalı (pip install redis)")
+        self.prefix = prefix
+        self._client = redis.Redis.from_url(url)
+        self._take = self._client.register_script(TAKE_SCRIPT)
+        self._add = self._client.register_script(ADD_SCRIPT)
+
+    async def take(self, key, rate, burst, now):
+        allowed, retry = await self._take(keys=[self.prefix + key], args=[rate, burst, now])
+        return bool(allowed), float(retry)
+
+    async def add(self, key, amount, limit, window, now):
+        result = await self._add(keys=[self.prefix + key], args=[amount, limit, window, now])
+        if result[0]:
+            return True, 0.0
+        previous, current, start = (float(v) for v in result[1:])
+        return False, _window_retry(previous, current, amount, limit, window, start, now)
+
+    def stats(self):
+        return {}
+
+    async def close(self):
+        await self._client.aclose()
+
+
+def create_store(kind=None):
+    """RATE_LIMIT_STORE ortam değişkenine göre durum deposu (memory veya redis)"""
+    kind = kind or os.environ.get("RATE_LIMIT_STORE", "memory")
+    if kind == "memory":
+        return MemoryStore()
+    if kind == "redis":
+        return RedisStore(os.environ.get("REDIS_URL", "redis://localhost:6379/0"))
+    raise ValueError(f"Bilinmeyen RATE_LIMIT_STORE: {kind}")
+
+
+def _as_int(value):
+    """Pydantic'in tamsayı kabul ettiği değerler (5, 5.0, "5") için int, diğerlerinde None"""
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, int):
+        return value
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    if isinstance(value, str):
+        try:
+            return int(value.strip())
+        except ValueError:
+            return None
+    return None
+
+
+def _header(scope, name):
+    for key, value in scope["headers"]:
+        if key == name:
+            return value.decode("latin-1")
+    return None
+
+
+def _session_account(scope):
+    cookie = _header(scope, b"cookie")
+    if not cookie:
+        return None
+    for part in cookie.split(";"):
+        name, _, value = part.strip().partition("=")
+        if name == SESSION_COOKIE:
+            session = signer.verify(value.strip('"'))
+            return session.user_id if session is not None else None
+    return None
+
+
+def _client_ip(scope, trust_proxy):
+    if trust_proxy:
+        forwarded = _header(scope, b"x-forwarded-for")
+        if forwarded:
+            return forwarded.split(",")[0].strip()
+    client = scope.get("client")
+    return client[0] if client else "unknown"
+
+
+def _too_many(detail, retry_after):
+    return JSONResponse(
+        {"detail": detail}, status_code=429, headers={"retry-after": str(max(1, math.ceil(retry_after)))}
+    )
+
+
+class RateLimitMiddleware:
+    """Sınırlı uçlarda jeton ve tutar denetimi yapan saf ASGI middleware"""
+
+    def __init__(self, app, store=None, routes=None, trust_proxy=None):
+        self.app = app
+        self.store = store if store is not None else create_store()
+        self.routes, self.templated = compile_routes(ROUTES if routes is None else routes)
+        self.trust_proxy = os.environ.get("RATE_LIMIT_TRUST_PROXY") == "1" if trust_proxy is None else trust_proxy
+
+    async def _read_body(self, receive):
+        """Gövdeyi oku; (JSON nesnesi, aynı mesajları yeniden veren `receive`) ya da sınır aşılırsa None"""
+        messages, size = [], 0
+        while True:
+            message = await receive()
+            messages.append(message)
+            if message["type"] != "http.request":
+                break
+            size += len(message.get("body", b""))
+            if size > MAX_BODY:
+                return None
+            if not message.get("more_body", False):
+                break
+        body = b"".join(m.get("body", b"") for m in messages if m["type"] == "http.request")
+
+        async def replay():
+            return messages.pop(0) if messages else await receive()
+
+        try:
+            payload = json.loads(body) if body else {}
+        except ValueError:
+            payload = {}
+        return (payload if isinstance(payload, dict) else {}), replay
+
+    def _match(self, method, path):
+        """(sınırlar, metrik etiketi olarak yol şablonu) ya da (None, None)"""
+        limits = self.routes.get((method, path))
+        if limits is not None:
+            return limits, path
+        for route_method, pattern, template, limits in self.templated:
+            if route_method == method and pattern.match(path):
+                return limits, template
+        return None, None
+
+    async def __call__(self, scope, receive, send):
+        limits, route = self._match(scope.get("method"), scope.get("path")) if scope["type"] == "http" else (None, None)
+        if limits is None:
+            return await self.app(scope, receive, send)
+
+        # Oturum varsa hesap her zaman oturumdaki kullanıcıdır; gövdedeki alan yalnızca oturumsuz isteklerde okunur
+        account = _session_account(scope) if limits.account else None
+        payload = {}
+        if limits.velocity is not None or (account is None and limits.account not in (None, "session")):
+            body = await self._read_body(receive)
+            if body is None:
+                return await JSONResponse({"detail": "İstek gövdesi çok büyük"}, status_code=413)(scope, receive, send)
+            payload, receive = body
+        # Kimliksiz istek uygulamada reddedilir; yalnızca IP sınırı işler
+        if account is None and limits.account not in (None, "session"):
+            account = _as_int(payload.get(limits.account))
+
+        now = time.time()
+        for bucket in limits.buckets:
+            if bucket.key == "account":
+                if account is None:
+                    continue
+                key = f"{bucket.name}:a{account}"
+            else:
+                key = f"{bucket.name}:{_client_ip(scope, self.trust_proxy)}"
+            allowed, retry_after = await self.store.take(key, bucket.rate, bucket.burst, now)
+            if not allowed:
+                REJECTIONS.inc(route, bucket.name)
+                return await _too_many("Çok fazla istek; lütfen daha sonra tekrar deneyin", retry_after)(scope, receive, send)
+
+        velocity, amount = limits.velocity, _as_int(payload.get("amount"))
+        if velocity is None or account is None or amount is None or amount <= 0:
+            return await self.app(scope, receive, send)
+
+        key = f"{velocity.name}:a{account}"
+        allowed, retry_after = await self.store.add(key, amount, velocity.limit, velocity.window, now)
+        if not allowed:
+            REJECTIONS.inc(route, velocity.name)
+            return await _too_many("Saatlik tutar limiti aşıldı", retry_after)(scope, receive, send)
+
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            # Gerçekleşmeyen işlemin tutarı limiti tüketmez
+            if status >= 400:
+                await self.store.add(key, -amount, velocity.limit, velocity.window, time.time())
+
+    def stats(self):
+        return self.store.stats()
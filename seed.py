@@ -0,0 +1,329 @@
+"""CSV tohumlarını (hesap, işletme, geçmiş transfer) hızlı yükleme.
+
+Dosya akış halinde, `chunk_size` satırlık parçalarla okunur; bellek kullanımı
+dosya boyutundan bağımsızdır. Her parça API'nin Pydantic modelleriyle tek
+çağrıda (`TypeAdapter(List[Model])`) doğrulanır ve `executemany` ile kendi
+işleminde yazılır; yazma kilidi yalnızca parça yazılırken tutulur, ledger
+yazıcısı parçalar arasında çalışmaya devam eder. Yükleme süresince tablonun
+ikincil indeksleri düşürülür ve sonda tek seferde yeniden kurulur. Kısıt ihlali olan parça
+ikiye bölünerek yeniden denenir; yalnızca hatalı satırlar reddedilir.
+
+Hesap tohumlarının bakiyesi bakiye defterine açılış kaydı olarak yazılır;
+telefon numarası tekil indeksle denetlenir (yinelenen numaralı satır reddedilir).
+Sunucu çalışırken CLI ile yüklenen hesaplar, sunucunun telefon filtresinde
+yeniden başlatmaya kadar görünmez; `POST /debug/seed/accounts` filtreyi yeniler.
+Geçmiş transferler yalnızca hareket kaydıdır; bakiyeleri değiştirmez.
+
+    python seed.py accounts accounts.csv
+    python seed.py merchants merchants.csv
+    python seed.py transfers transfers.csv --chunk-size 50000
+"""
+import argparse
+import csv
+import re
+import sqlite3
+import sys
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from itertools import islice
+from operator import attrgetter, itemgetter
+from typing import List, Optional, Tuple
+
+from pydantic import BaseModel, Field, TypeAdapter, ValidationError, model_validator
+
+import migrations
+from balances import JOURNAL_INSERT
+from db_pool import DEFAULT_PRAGMAS
+from phones import normalize_phone
+
+# Raporda tutulan en fazla hata örneği
+MAX_ERRORS = 20
+
+
+@dataclass
+class SeedTable:
+    table: str
+    model: type
+    columns: Tuple[str, ...]  # "id" ilk sırada; model alanlarıyla aynı adlar
+    journal: bool = False  # bakiye açılışını deftere yaz (hesaplar)
+
+    def __post_init__(self):
+        self.adapter = TypeAdapter(List[self.model])
+        placeholders = ", ".join("?" * len(self.columns))
+        self.insert_sql = f"INSERT INTO {self.table} ({', '.join(self.columns)}) VALUES ({placeholders})"
+        self.values = attrgetter(*self.columns)
+        # ISO metnine çevrilecek sütunların sırası
+        fields = self.model.model_fields
+        self.datetimes = [i for i, c in enumerate(self.columns) if fields[c].annotation is datetime]
+        if self.journal:
+            self.journal_columns = itemgetter(*(self.columns.index(c) for c in ("id", "balance", "created_at")))
+
+    @property
+    def tables(self):
+        return (self.table, "balance_journal") if self.journal else (self.table,)
+
+
+# Tohum modelleri: API'nin hesap, işletme ve transfer modelleriyle aynı kurallar;
+# ID verilmezse sıradaki atanır. CLI'ın uygulamayı (havuz, ledger, ...) içe
+# aktarmaması için burada tanımlıdır.
+class AccountSeed(BaseModel):
+    id: Optional[int] = Field(None, gt=0, description="Hesap ID")
+    name: str = Field(..., description="Kullanıcı adı")
+    phone: str = Field(..., description="Telefon numarası")
+    created_at: datetime = Field(default_factory=datetime.now, description="Hesap oluşturma tarihi")
+    balance: int = Field(default=0, ge=0, description="Hesap bakiyesi (kuruş)")
+    phone_normalized: Optional[str] = Field(None, description="Telefondan hesaplanır")
+
+    @model_validator(mode="after")
+    def _normalize_phone(self):
+        self.phone_normalized = normalize_phone(self.phone)
+        return self
+
+
+class MerchantSeed(BaseModel):
+    id: Optional[int] = Field(None, gt=0, description="İşletme ID")
+    name: str = Field(..., description="İşletme adı")
+    category: str = Field(..., pattern="^(cafe|market|transport|other)$", description="İşletme kategorisi")
+
+
+class TransferSeed(BaseModel):
+    id: Optional[int] = Field(None, gt=0, description="Transfer ID")
+    from_account_id: int = Field(..., description="Gönderen hesap ID")
+    to_account_id: int = Field(..., description="Alıcı hesap ID")
+    amount: int = Field(..., gt=0, description="Transfer miktarı (kuruş)")
+    created_at: datetime = Field(default_factory=datetime.now, description="Transfer tarihi")
+
+
+SEED_TABLES = {
+    "accounts": SeedTable(
+        "accounts", AccountSeed, ("id", "name", "phone", "created_at", "balance", "phone_normalized"), journal=True
+    ),
+    "merchants": SeedTable("merchants", MerchantSeed, ("id", "name", "category")),
+    "transfers": SeedTable(
+        "transfers", TransferSeed, ("id", "from_account_id", "to_account_id", "amount", "created_at")
+    ),
+}
+
+
+def connect(path=None):
+    conn = sqlite3.connect(path or migrations.DB_PATH, isolation_level=None, check_same_thread=False)
+    for pragma in DEFAULT_PRAGMAS:
+        conn.execute(pragma)
+    return conn
+
+
+def _deferred_indexes(tables):
+    """Tablolara ait ikincil indekslerin (ad, DDL) listesi"""
+    found = []
+    for ddl in migrations.INDEXES:
+        match = re.search(r"INDEX IF NOT EXISTS (\w+) ON (\w+)", ddl)
+        if match and match.group(2) in tables:
+            found.append((match.group(1), ddl))
+    return found
+
+
+class SeedLoader:
+    """Tek tabloya parça parça CSV satırı yükleyen yazıcı.
+
+    `start()` düşürülecek indeksleri belirler, `load()` her parçayı doğrulayıp
+    kendi işleminde yazar, `finish()` indeksleri yeniden kurar ve raporu
+    döndürür.
+    """
+
+    def __init__(self, conn, spec, defer_indexes=True):
+        self.conn = conn
+        self.spec = spec
+        self.defer_indexes = defer_indexes
+        self.header = None
+        self.line = 1  # başlık satırı
+        self.accepted = 0
+        self.rejected = 0
+        self.errors = []
+        self._indexes = []
+        self._dropped = False
+        self._next_id = 0
+        self._started = None
+
+    def start(self):
+        self._started = time.perf_counter()
+        if self.defer_indexes:
+            self._indexes = _deferred_indexes(self.spec.tables)
+
+    def _drop_indexes(self):
+        # İndeksler ilk parçayla aynı işlemde düşürülür: commit'ten önce kesilen
+        # yükleme onları da geri alır, sonra kesilirse `migrations.migrate()`
+        # eksik indeksleri açılışta yeniden kurar
+        if self._dropped:
+            return
+        for name, _ in self._indexes:
+            self.conn.execute(f"DROP INDEX IF EXISTS {name}")
+        self._dropped = True
+
+    def _reserve_ids(self):
+        # Parçalar arasında başka yazarlar satır eklemiş olabilir; sıradaki ID işlem içinde okunur
+        table = self.spec.table
+        self._next_id = max(self._next_id, 1 + max(
+            self.conn.execute(f"SELECT COALESCE(MAX(id), 0) FROM {table}").fetchone()[0],
+            (self.conn.execute("SELECT seq FROM sqlite_sequence WHERE name = ?", (table,)).fetchone() or (0,))[0],
+        ))
+
+    def _error(self, line, message):
+        self.rejected += 1
+        if len(self.errors) < MAX_ERRORS:
+            self.errors.append({"line": line, "error": message})
+
+    def _validate(self, rows):
+        """(satır no, model) listesi; geçersiz satırlar reddedilir"""
+        lines = range(self.line + 1, self.line + 1 + len(rows))
+        # Boş hücreler modelin varsayılanına bırakılır
+        records = [{k: v for k, v in zip(self.header, row) if v != ""} for row in rows]
+        try:
+            return list(zip(lines, self.spec.adapter.validate_python(records)))
+        except ValidationError as e:
+            invalid = {}
+            for error in e.errors():
+                field = ".".join(map(str, error["loc"][1:]))
+                invalid.setdefault(error["loc"][0], f"{field}: {error['msg']}" if field else error["msg"])
+        for index, message in sorted(invalid.items()):
+            self._error(lines[index], message)
+        valid = [(line, record) for i, (line, record) in enumerate(zip(lines, records)) if i not in invalid]
+        return list(zip((line for line, _ in valid), self.spec.adapter.validate_python([r for _, r in valid])))
+
+    def _params(self, models):
+        """Modelleri INSERT parametrelerine çevir; ID'siz satırlara sıradaki ID'yi ata"""
+        params = []
+        values, datetimes = self.spec.values, self.spec.datetimes
+        for model in models:
+            row = list(values(model))
+            if row[0] is None:
+                row[0] = self._next_id
+            if row[0] >= self._next_id:
+                self._next_id = row[0] + 1
+            for i in datetimes:
+                row[i] = row[i].isoformat()
+            params.append(row)
+        return params
+
+    def _write(self, params):
+        cursor = self.conn.cursor()
+        cursor.executemany(self.spec.insert_sql, params)
+        if self.spec.journal:
+            opening = (self.spec.journal_columns(p) for p in params)
+            cursor.executemany(JOURNAL_INSERT, [(i, b, "open", None, c) for i, b, c in opening if b])
+
+    def _write_valid(self, lines, params):
+        """Parçayı yaz; kısıt ihlalinde ikiye bölerek yalnızca hatalı satırları reddet"""
+        self.conn.execute("SAVEPOINT chunk")
+        try:
+            self._write(params)
+        except sqlite3.IntegrityError as e:
+            self.conn.execute("ROLLBACK TO chunk")
+            self.conn.execute("RELEASE chunk")
+            if len(params) == 1:
+                self._error(lines[0], str(e))
+                return 0
+            half = len(params) // 2
+            return self._write_valid(lines[:half], params[:half]) + self._write_valid(lines[half:], params[half:])
+        self.conn.execute("RELEASE chunk")
+        return len(params)
+
+    def load(self, rows):
+        """CSV satırlarını (değer listeleri) doğrula ve yaz; ilk çağrıda ilk satır başlıktır"""
+        if self.header is None:
+            if not rows:
+                return
+            self.header = [value.strip() for value in rows[0]]
+            rows = rows[1:]
+        validated = self._validate(rows)
+        self.line += len(rows)
+        if not validated:
+            return
+        lines, models = zip(*validated)
+        # Doğrulama kilit dışında yapıldı; yazma kilidi yalnızca bu işlem boyunca tutulur
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            self._drop_indexes()
+            self._reserve_ids()
+            # Kısıt ihlali (yinelenen ID, olmayan hesap) yalnızca o satırları düşürür
+            written = self._write_valid(lines, self._params(models))
+            self.conn.execute("COMMIT")
+        except BaseException:
+            if self.conn.in_transaction:
+                self.conn.execute("ROLLBACK")
+            raise
+        self.accepted += written
+
+    def _restore_indexes(self):
+        self.conn.execute("BEGIN IMMEDIATE")
+        for _, ddl in self._indexes:
+            self.conn.execute(ddl)
+        self.conn.execute("COMMIT")
+
+    def finish(self):
+        loaded = time.perf_counter()
+        self._restore_indexes()
+        self.conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        finished = time.perf_counter()
+        elapsed = finished - self._started
+        rows = self.accepted + self.rejected
+        return {
+            "table": self.spec.table,
+            "rows": rows,
+            "accepted": self.accepted,
+            "rejected": self.rejected,
+            "seconds": round(elapsed, 3),
+            "index_seconds": round(finished - loaded, 3),
+            "rows_per_second": round(rows / elapsed) if elapsed else rows,
+            "errors": self.errors,
+        }
+
+    def abort(self):
+        if self.conn.in_transaction:
+            self.conn.execute("ROLLBACK")
+        self._restore_indexes()
+
+
+def load_file(conn, spec, stream, chunk_size=50_000, defer_indexes=True):
+    """Açık bir metin akışındaki CSV'yi yükle ve raporu döndür"""
+    loader = SeedLoader(conn, spec, defer_indexes=defer_indexes)
+    reader = csv.reader(stream)
+    loader.start()
+    try:
+        while True:
+            rows = list(islice(reader, chunk_size))
+            if not rows:
+                break
+            loader.load(rows)
+    except BaseException:
+        loader.abort()
+        raise
+    return loader.finish()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="CSV tohum yükleyici")
+    parser.add_argument("table", choices=sorted(SEED_TABLES))
+    parser.add_argument("path", help="Başlıklı CSV dosyası (- : stdin)")
+    parser.add_argument("--db", default=None, help="Veritabanı dosyası (varsayılan DATABASE_PATH / accounts.db)")
+    parser.add_argument("--chunk-size", type=int, default=50_000)
+    parser.add_argument("--keep-indexes", action="store_true", help="İndeksleri yükleme sırasında düşürme")
+    args = parser.parse_args()
+
+    migrations.migrate(args.db)
+    conn = connect(args.db)
+    stream = sys.stdin if args.path == "-" else open(args.path, newline="", encoding="utf-8")
+    try:
+        report = load_file(conn, SEED_TABLES[args.table], stream, args.chunk_size, not args.keep_indexes)
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+        conn.close()
+    for error in report["errors"]:
+        print(f"satır {error['line']}: {error['error']}", file=sys.stderr)
+    print(f"{report['table']}: {report['accepted']} satır yüklendi, {report['rejected']} reddedildi, "
+          f"{report['seconds']} sn ({report['rows_per_second']} satır/sn, indeks {report['index_seconds']} sn)")
+
+
+if __name__ == "__main__":
+    main()
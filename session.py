@@ -0,0 +1,86 @@
+"""İmzalı oturum belirteci.
+
+Belirteç `<hesap ID>.<son geçerlilik (unix sn)>.<HMAC-SHA256 imzası>`
+biçimindedir ve `session` çerezinde taşınır. Doğrulama yalnızca imza ve süre
+kontrolüdür; kimlik doğrulama için veritabanına gidilmez. İsim ve bakiye
+belirtece yazılmaz, gerektiğinde hesap önbelleğinden okunur.
+"""
+import base64
+import hashlib
+import hmac
+import os
+import secrets
+import time
+from typing import NamedTuple, Optional
+
+from fastapi import Depends, HTTPException
+from starlette.requests import HTTPConnection
+
+SESSION_COOKIE = "session"
+
+
+class Session(NamedTuple):
+    user_id: int
+    expires_at: int
+
+
+class SessionSigner:
+    """Oturum belirteçlerini imzalar ve doğrular"""
+
+    def __init__(self, secret, ttl=3600):
+        self.ttl = ttl
+        # Anahtarlı HMAC nesnesi bir kez hazırlanır; her imza kopyasıyla hesaplanır
+        self._hmac = hmac.new(secret, digestmod=hashlib.sha256)
+
+    def _signature(self, payload):
+        mac = self._hmac.copy()
+        mac.update(payload)
+        return base64.urlsafe_b64encode(mac.digest()).rstrip(b"=")
+
+    def issue(self, user_id, now=None):
+        expires_at = int(now if now is not None else time.time()) + self.ttl
+        payload = f"{user_id}.{expires_at}".encode()
+        return (payload + b"." + self._signature(payload)).decode()
+
+    def verify(self, token, now=None):
+        """Geçerli belirteç için Session, aksi halde None"""
+        payload, _, signature = token.encode().rpartition(b".")
+        if not hmac.compare_digest(signature, self._signature(payload)):
+            return None
+        user_id, _, expires_at = payload.partition(b".")
+        try:
+            session = Session(int(user_id), int(expires_at))
+        except ValueError:
+            return None
+        if session.expires_at < (now if now is not None else time.time()):
+            return None
+        return session
+
+
+# SESSION_SECRET verilmezse anahtar süreç başına üretilir; yeniden başlatmada oturumlar düşer
+signer = SessionSigner(
+    os.environ["SESSION_SECRET"].encode() if os.environ.get("SESSION_SECRET") else secrets.token_bytes(32),
+    ttl=int(os.environ.get("SESSION_TTL", "3600")),
+)
+
+
+def set_session_cookie(response, user_id):
+    response.set_cookie(
+        key=SESSION_COOKIE,
+        value=signer.issue(user_id),
+        max_age=signer.ttl,
+        httponly=True,
+        samesite="lax"
+    )
+
+
+def get_session(connection: HTTPConnection) -> Optional[Session]:
+    """Çerezdeki oturum (HTTP isteği ya da WebSocket); yoksa ya da geçersizse None"""
+    token = connection.cookies.get(SESSION_COOKIE)
+    return signer.verify(token) if token else None
+
+
+def require_session(session: Optional[Session] = Depends(get_session)) -> Session:
+    if session is None:
+        raise HTTPException(status_code=401, detail="Oturum bulunamadı")
+    return session
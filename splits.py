@@ -0,0 +1,114 @@
+"""Hesap bölüşme (split) ve borç sadeleştirme.
+
+Tutarlar tamsayı kuruştur. Grup içindeki borçlar `split_debts` tablosunda her hesap çifti için tek satır
+olarak tutulur (küçük ID → büyük ID, işaretli tutar); aynı çift arasındaki yeni
+borçlar mevcut satıra eklenir ve karşılıklı borçlar kendiliğinden netleşir.
+Hesaplaşmada her üyenin net bakiyesi çıkarılır, en büyük borçlu ile en büyük
+alacaklı heap'ler üzerinden eşleştirilir; N üyeli grup en fazla N-1 transferle
+kapanır.
+"""
+import heapq
+from fractions import Fraction
+from math import lcm
+
+DEBT_UPSERT = """
+INSERT INTO split_debts (group_id, account_a, account_b, amount) VALUES (?, ?, ?, ?)
+ON CONFLICT (group_id, account_a, account_b) DO UPDATE SET amount = amount + excluded.amount
+"""
+
+NET_BALANCES_SQL = """
+SELECT account_id, SUM(amount) FROM (
+    SELECT account_a AS account_id, -amount AS amount FROM split_debts WHERE group_id = :group_id
+    UNION ALL
+    SELECT account_b, amount FROM split_debts WHERE group_id = :group_id
+) GROUP BY account_id
+"""
+
+
+def split_shares(amount, participants, weights=None):
+    """Kuruş tutarı katılımcılara eşit ya da ağırlıklı olarak böl.
+
+    Hesap tamsayılarla yapılır: ondalık ağırlıklar girildikleri haliyle ortak
+    paydaya genişletilir, böylece paylar float yuvarlamasından etkilenmez.
+    """
+    ratios = [Fraction(str(w)) for w in weights] if weights else [Fraction(1)] * len(participants)
+    scale = lcm(*(r.denominator for r in ratios))
+    weights = [int(r * scale) for r in ratios]
+    total_weight = sum(weights)
+    shares = [amount * w // total_weight for w in weights]
+    # Bölmeden kalan kuruşlar kalanı en büyük olanlara dağıtılır (eşitlikte sıra korunur)
+    remainder = amount - sum(shares)
+    for i in sorted(range(len(weights)), key=lambda i: amount * weights[i] % total_weight, reverse=True)[:remainder]:
+        shares[i] += 1
+    return list(zip(participants, shares))
+
+
+def debt_rows(group_id, debts):
+    """(borçlu, alacaklı, tutar) kayıtlarını kanonik çift satırlarına çevir"""
+    rows = []
+    for debtor, creditor, amount in debts:
+        if debtor == creditor or not amount:
+            continue
+        if debtor < creditor:
+            rows.append((group_id, debtor, creditor, amount))
+        else:
+            rows.append((group_id, creditor, debtor, -amount))
+    return rows
+
+
+def add_debts(cursor, group_id, debts):
+    cursor.executemany(DEBT_UPSERT, debt_rows(group_id, debts))
+
+
+def record_expense(cursor, group_id, payer_id, shares):
+    """Ödeyen dışındaki her katılımcıyı payı kadar ödeyene borçlandır"""
+    add_debts(cursor, group_id, ((account_id, payer_id, share) for account_id, share in shares))
+
+
+def debts(conn, group_id):
+    """Açık borçlar: (borçlu, alacaklı, tutar)"""
+    result = []
+    for a, b, amount in conn.execute(
+        "SELECT account_a, account_b, amount FROM split_debts WHERE group_id = ? AND amount != 0", (group_id,)
+    ):
+        result.append((a, b, amount) if amount > 0 else (b, a, -amount))
+    return result
+
+
+def net_balances(conn, group_id):
+    """Üyelerin net bakiyeleri; pozitif alacaklı, negatif borçlu"""
+    return dict(conn.execute(NET_BALANCES_SQL, {"group_id": group_id}).fetchall())
+
+
+def simplify(balances):
+    """Net bakiyeleri kapatan (borçlu, alacaklı, tutar) transferleri.
+
+    Her adımda en büyük borçlu en büyük alacaklıya ödeme yapar ve en az biri
+    sıfırlanır; bu yüzden transfer sayısı sıfırdan farklı bakiye sayısının bir
+    eksiğini geçmez.
+    """
+    creditors = [(-amount, account_id) for account_id, amount in balances.items() if amount > 0]
+    debtors = [(amount, account_id) for account_id, amount in balances.items() if amount < 0]
+    heapq.heapify(creditors)
+    heapq.heapify(debtors)
+
+    transfers = []
+    while creditors and debtors:
+        credit, creditor = heapq.heappop(creditors)
+        debt, debtor = heapq.heappop(debtors)
+        amount = min(-credit, -debt)
+        transfers.append((debtor, creditor, amount))
+        if -credit > amount:
+            heapq.heappush(creditors, (credit + amount, creditor))
+        if -debt > amount:
+            heapq.heappush(debtors, (debt + amount, debtor))
+    return transfers
+
+
+def settlement_plan(conn, group_id):
+    """Grubu kapatacak (gönderen, alıcı, tutar) transfer listesi"""
+    return simplify(net_balances(conn, group_id))
+
+
+def clear_debts(cursor, group_id):
+    cursor.execute("DELETE FROM split_debts WHERE group_id = ?", (group_id,))
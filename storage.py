@@ -0,0 +1,308 @@
+"""Hesap, işletme ve transfer verilerine erişim katmanı.
+
+Route fonksiyonları SQL yazmak yerine `Storage` arayüzünü kullanır. Varsayılan
+`SQLiteStorage` mevcut bağlantı havuzu, hesap önbelleği ve group-commit
+ledger yazıcısı üzerinde çalışır ve tek süreçle sınırlıdır. Birden fazla
+uvicorn worker'ı veya sunucu aynı hesapları paylaşacaksa `STORAGE_BACKEND=postgres`
+ile `storage_postgres.PostgresStorage` seçilir; orada bakiye kilitleri
+veritabanında, satır düzeyinde (koşullu `UPDATE`) tutulur.
+
+Hesap satırları her iki arka uçta da `ACCOUNT_COLUMNS` sırasıyla
+(id, name, phone, created_at, balance) döner; created_at ISO metnidir.
+Telefonla arama `phones.normalize_phone` ile normalize edilmiş numaralar
+üzerinden, tekil `phone_normalized` indeksiyle yapılır.
+"""
+import asyncio
+import os
+import sqlite3
+from abc import ABC, abstractmethod
+
+from starlette.concurrency import iterate_in_threadpool
+
+import balances
+from account_cache import ACCOUNT_COLUMNS, account_cache
+from db_pool import database
+from history import fetch_history, local_naive
+from ledger import LedgerError, ledger
+from notifications import hub
+from phones import PhoneFilter, normalize_phone
+
+STREAM_CHUNK_SIZE = 500
+
+DUPLICATE_PHONE = "Bu telefon numarasıyla açılmış bir hesap var"
+
+
+def normalized_phone(phone):
+    try:
+        return normalize_phone(phone)
+    except ValueError as e:
+        raise LedgerError(400, str(e))
+
+
+class Storage(ABC):
+    """Arka uçların uygulaması gereken async arayüz; eksik metodu olan arka uç oluşturulamaz"""
+
+    async def start(self):
+        pass
+
+    async def close(self):
+        pass
+
+    def stats(self):
+        return {}
+
+    # Hesaplar
+    @abstractmethod
+    async def create_account(self, name, phone, created_at, balance):
+        """Yeni hesabı ekle ve ID'sini döndür"""
+        raise NotImplementedError
+
+    @abstractmethod
+    async def get_account(self, account_id):
+        raise NotImplementedError
+
+    @abstractmethod
+    async def list_accounts(self, after, limit):
+        raise NotImplementedError
+
+    @abstractmethod
+    def iter_accounts(self, after):
+        """ID'si `after`dan büyük tüm hesapları satır parçaları halinde veren async iterator"""
+        raise NotImplementedError
+
+    @abstractmethod
+    async def find_accounts_by_phone(self, phones):
+        """Normalize numaralardan kayıtlı olanlar için {numara: hesap ID}"""
+        raise NotImplementedError
+
+    async def find_account_by_phone(self, phone):
+        """Numaranın (herhangi bir biçimde) kayıtlı olduğu hesap ID'si ya da None"""
+        normalized = normalized_phone(phone)
+        return (await self.find_accounts_by_phone([normalized])).get(normalized)
+
+    # İşletmeler
+    @abstractmethod
+    async def create_merchant(self, name, category):
+        raise NotImplementedError
+
+    @abstractmethod
+    async def get_merchant(self, merchant_id):
+        """(id, name, category) satırı ya da None"""
+        raise NotImplementedError
+
+    @abstractmethod
+    async def list_merchants(self, after, limit):
+        raise NotImplementedError
+
+    @abstractmethod
+    def iter_merchants(self, after):
+        raise NotImplementedError
+
+    # Bakiye hareketleri
+    @abstractmethod
+    async def topup(self, account_id, amount):
+        """Bakiyeyi artır ve yeni bakiyeyi döndür"""
+        raise NotImplementedError
+
+    @abstractmethod
+    async def transfer(self, from_account_id, to_account_id, amount):
+        """(transfer_id, gönderenin yeni bakiyesi, created_at) döndür"""
+        raise NotImplementedError
+
+    @abstractmethod
+    async def transaction_history(self, account_id, limit, cursor=None, start=None, end=None):
+        """(id, yön, karşı hesap, tutar, tarih) satırlarını yeniden eskiye döndür"""
+        raise NotImplementedError
+
+    @abstractmethod
+    async def balance_at(self, account_id, moment):
+        """Hesabın `moment` anındaki bakiyesi (bakiye defterinden)"""
+        raise NotImplementedError
+
+
+class SQLiteStorage(Storage):
+    """Tek dosyalı SQLite arka ucu.
+
+    Okumalar bağlantı havuzundan (hesaplar önce önbellekten) yapılır; bakiye
+    değiştiren işlemler ledger yazıcısının tek yazarlı kuyruğundan geçer.
+    Telefon aramaları önce süreç içi `PhoneFilter`dan geçer; filtre tek
+    süreçle sınırlı bu arka uçta hesap açılışlarıyla güncel tutulabilir.
+    """
+
+    def __init__(self, database, ledger, cache=None):
+        self.database = database
+        self.ledger = ledger
+        self.cache = cache
+        self.phones = None
+        self._phone_logs = []  # süren filtre kurulumları sırasında açılan hesapların numaraları
+        self._phones_task = None
+
+    async def start(self):
+        # Filtre arka planda kurulur; hazır olana kadar numaralar doğrudan indeksten sorulur
+        if self._phones_task is None:
+            self._phones_task = asyncio.create_task(self.reload_phones())
+
+    async def close(self):
+        if self._phones_task is not None:
+            self._phones_task.cancel()
+            self._phones_task = None
+
+    async def reload_phones(self):
+        """Telefon filtresini veritabanındaki numaralardan yeniden kur"""
+        log = []
+        self._phone_logs.append(log)
+        try:
+            phones = await self.database.run(lambda conn: PhoneFilter(
+                row[0] for row in conn.execute(
+                    "SELECT phone_normalized FROM accounts WHERE phone_normalized IS NOT NULL"
+                )
+            ))
+            for phone in log:
+                phones.add(phone)
+            self.phones = phones
+        finally:
+            self._phone_logs.remove(log)
+
+    # Havuz ve ledger'ın ömrü ve metrikleri uygulamaya aittir (ödeme, QR ve
+    # bölüşme de aynı havuzu ve yazıcıyı kullanır)
+    def stats(self):
+        stats = {"backend": "sqlite"}
+        if self.phones is not None:
+            stats["phone_filter"] = self.phones.stats()
+        return stats
+
+    async def _insert(self, sql, params):
+        def _run(conn):
+            cursor = conn.cursor()
+            cursor.execute(sql, params)
+            conn.commit()
+            return cursor.lastrowid
+
+        try:
+            return await self.database.run(_run)
+        except sqlite3.IntegrityError as e:
+            raise LedgerError(400, str(e))
+
+    def _iter_chunks(self, sql, params):
+        # Cursor thread havuzunda okunur; event loop bloklanmaz
+        return iterate_in_threadpool(self.database.iterate_chunks(sql, params, STREAM_CHUNK_SIZE))
+
+    async def create_account(self, name, phone, created_at, balance):
+        normalized = normalized_phone(phone)
+
+        def _run(conn):
+            cursor = conn.cursor()
+            cursor.execute(
+                "INSERT INTO accounts (name, phone, created_at, balance, phone_normalized) VALUES (?, ?, ?, ?, ?)",
+                (name, phone, created_at.isoformat(), balance, normalized)
+            )
+            # Açılış bakiyesi deftere hesapla aynı commit'te yazılır
+            balances.record(cursor, [(cursor.lastrowid, balance, "open", None)], created_at.isoformat())
+            conn.commit()
+            return cursor.lastrowid
+
+        try:
+            account_id = await self.database.run(_run)
+        except sqlite3.IntegrityError as e:
+            if "phone_normalized" in str(e):
+                raise LedgerError(409, DUPLICATE_PHONE)
+            raise LedgerError(400, str(e))
+        if self.phones is not None:
+            self.phones.add(normalized)
+        for log in self._phone_logs:
+            log.append(normalized)
+        return account_id
+
+    async def get_account(self, account_id):
+        if self.cache is not None:
+            row = self.cache.get(account_id)
+            if row is not None:
+                return row
+            token = self.cache.read_token()
+        row = await self.database.run(
+            lambda conn: conn.execute(
+                f"SELECT {ACCOUNT_COLUMNS} FROM accounts WHERE id = ?", (account_id,)
+            ).fetchone()
+        )
+        if row is not None and self.cache is not None:
+            self.cache.put_if_unchanged(row, token)
+        return row
+
+    async def list_accounts(self, after, limit):
+        return await self.database.run(lambda conn: conn.execute(
+            f"SELECT {ACCOUNT_COLUMNS} FROM accounts WHERE id > ? ORDER BY id LIMIT ?", (after, limit)
+        ).fetchall())
+
+    def iter_accounts(self, after):
+        return self._iter_chunks(f"SELECT {ACCOUNT_COLUMNS} FROM accounts WHERE id > ? ORDER BY id", (after,))
+
+    async def find_accounts_by_phone(self, phones):
+        # Filtrede olmayan numaralar kesin olarak kayıtsızdır; veritabanına sorulmaz
+        candidates = list(dict.fromkeys(phones))
+        if self.phones is not None:
+            candidates = self.phones.candidates(candidates)
+        if not candidates:
+            return {}
+        found = dict(await self.database.run(lambda conn: conn.execute(
+            f"SELECT phone_normalized, id FROM accounts WHERE phone_normalized IN ({', '.join('?' * len(candidates))})",
+            candidates
+        ).fetchall()))
+        if self.phones is not None:
+            self.phones.false_positives += len(candidates) - len(found)
+        return found
+
+    async def create_merchant(self, name, category):
+        return await self._insert("INSERT INTO merchants (name, category) VALUES (?, ?)", (name, category))
+
+    async def get_merchant(self, merchant_id):
+        return await self.database.run(lambda conn: conn.execute(
+            "SELECT id, name, category FROM merchants WHERE id = ?", (merchant_id,)
+        ).fetchone())
+
+    async def list_merchants(self, after, limit):
+        return await self.database.run(lambda conn: conn.execute(
+            "SELECT id, name, category FROM merchants WHERE id > ? ORDER BY id LIMIT ?", (after, limit)
+        ).fetchall())
+
+    def iter_merchants(self, after):
+        return self._iter_chunks("SELECT id, name, category FROM merchants WHERE id > ? ORDER BY id", (after,))
+
+    async def topup(self, account_id, amount):
+        return await self.ledger.topup(account_id, amount)
+
+    async def transfer(self, from_account_id, to_account_id, amount):
+        return await self.ledger.transfer(from_account_id, to_account_id, amount)
+
+    async def transaction_history(self, account_id, limit, cursor=None, start=None, end=None):
+        return await self.database.run(
+            fetch_history, account_id, limit, cursor,
+            local_naive(start).isoformat() if start else None,
+            local_naive(end).isoformat() if end else None
+        )
+
+    async def balance_at(self, account_id, moment):
+        return await self.database.run(balances.balance_at, account_id, local_naive(moment).isoformat())
+
+
+def create_storage(backend=None):
+    """STORAGE_BACKEND ortam değişkenine göre arka ucu oluştur (sqlite veya postgres)"""
+    backend = backend or os.environ.get("STORAGE_BACKEND", "sqlite")
+    if backend == "sqlite":
+        return SQLiteStorage(database, ledger, cache=account_cache)
+    if backend == "postgres":
+        from storage_postgres import PostgresStorage
+        return PostgresStorage(
+            os.environ["DATABASE_URL"],
+            min_size=int(os.environ.get("PG_POOL_MIN_SIZE", "2")),
+            max_size=int(os.environ.get("DB_POOL_SIZE", "8")),
+            hub=hub,
+        )
+    raise ValueError(f"Bilinmeyen STORAGE_BACKEND: {backend}")
+
+
+storage = create_storage()
+
+
+# FastAPI bağımlılığı
+def get_storage():
+    return storage
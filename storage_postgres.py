@@ -0,0 +1,350 @@
+"""PostgreSQL arka ucu (asyncpg bağlantı havuzu).
+
+Birden fazla uvicorn worker'ı ve sunucu aynı veritabanını paylaşabilir:
+transferde bakiye düşümü `UPDATE ... WHERE balance >= tutar RETURNING` ile
+tek ifadede koşullu yapılır (kontrol ve yazım aynı satır kilidi altında),
+iki hesap satırı ID sırasıyla güncellenir (sabit kilit sırası kilitlenmeyi
+önler) ve hareket aynı işlemde yazılır. Para yükleme tek bir
+koşulsuz `UPDATE ... RETURNING` ile satır kilidi altında yapılır.
+Telefon aramalarında bellek içi filtre kullanılmaz (diğer worker'ların
+açtığı hesapları göremez); numaralar doğrudan tekil indeksten sorulur.
+Bildirimler aynı işlemde `pg_notify` ile yazılır (commit'te teslim edilir);
+her worker ayrı bir bağlantıyla kanalı dinleyip olayları kendi
+`NotificationHub`'ına aktarır, böylece abone hangi worker'a bağlıysa olayı alır.
+
+asyncpg isteğe bağlı bir bağımlılıktır ve yalnızca bu arka uç seçildiğinde
+gerekir. Yerel deneme için geçici bir Postgres yeterlidir:
+
+    STORAGE_BACKEND=postgres DATABASE_URL=postgresql://localhost/binary_power uvicorn app:app --workers 4
+"""
+import asyncio
+import json
+from datetime import datetime
+
+from applog import logger
+from history import decode_cursor, local_naive
+from ledger import BALANCE_OVERFLOW, LedgerError
+from phones import assign_normalized
+from storage import DUPLICATE_PHONE, STREAM_CHUNK_SIZE, Storage, normalized_phone
+
+SCHEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS accounts (
+        id BIGSERIAL PRIMARY KEY,
+        name TEXT NOT NULL,
+        phone TEXT NOT NULL,
+        created_at TIMESTAMP NOT NULL,
+        balance BIGINT NOT NULL DEFAULT 0,
+        phone_normalized TEXT
+    )""",
+    "ALTER TABLE accounts ADD COLUMN IF NOT EXISTS phone_normalized TEXT",
+    """
+    CREATE TABLE IF NOT EXISTS merchants (
+        id BIGSERIAL PRIMARY KEY,
+        name TEXT NOT NULL,
+        category TEXT CHECK (category IN ('cafe', 'market', 'transport', 'other'))
+    )""",
+    """
+    CREATE TABLE IF NOT EXISTS transfers (
+        id BIGSERIAL PRIMARY KEY,
+        from_account_id BIGINT NOT NULL REFERENCES accounts (id),
+        to_account_id BIGINT NOT NULL REFERENCES accounts (id),
+        amount BIGINT NOT NULL,
+        created_at TIMESTAMP NOT NULL
+    )""",
+    "CREATE INDEX IF NOT EXISTS idx_transfers_from_created ON transfers (from_account_id, created_at)",
+    "CREATE INDEX IF NOT EXISTS idx_transfers_to_created ON transfers (to_account_id, created_at)",
+    """
+    CREATE TABLE IF NOT EXISTS balance_journal (
+        id BIGSERIAL PRIMARY KEY,
+        account_id BIGINT NOT NULL REFERENCES accounts (id),
+        delta BIGINT NOT NULL,
+        kind TEXT NOT NULL,
+        reference BIGINT,
+        created_at TIMESTAMP NOT NULL
+    )""",
+    "CREATE INDEX IF NOT EXISTS idx_balance_journal_account_created ON balance_journal (account_id, created_at)",
+    # Defterden önce açılmış hesapların bakiyesi açılış kaydı olarak yazılır
+    """
+    INSERT INTO balance_journal (account_id, delta, kind, reference, created_at)
+    SELECT id, balance, 'open', NULL, LOCALTIMESTAMP FROM accounts
+    WHERE balance <> 0 AND NOT EXISTS (SELECT 1 FROM balance_journal)
+    """,
+)
+
+JOURNAL_INSERT = (
+    "INSERT INTO balance_journal (account_id, delta, kind, reference, created_at) VALUES ($1, $2, $3, $4, $5)"
+)
+
+PHONE_INDEX = "CREATE UNIQUE INDEX IF NOT EXISTS idx_accounts_phone ON accounts (phone_normalized)"
+
+# Bildirimlerin yayınlandığı LISTEN/NOTIFY kanalı
+EVENTS_CHANNEL = "wallet_events"
+
+# Aynı anda açılan worker'ların şemayı tek seferde kurması için advisory lock anahtarı
+SCHEMA_LOCK = 7_014_015
+
+ACCOUNT_SELECT = "SELECT id, name, phone, created_at, balance FROM accounts"
+
+HISTORY_SQL = """
+SELECT * FROM (
+    (SELECT id, 'out' AS direction, to_account_id AS counterparty, amount, created_at FROM transfers
+     WHERE from_account_id = $1
+       AND ($2::timestamp IS NULL OR created_at >= $2) AND ($3::timestamp IS NULL OR created_at < $3)
+       AND ($4::timestamp IS NULL OR ((created_at, id) <= ($4, $5) AND (created_at, id, 'out') < ($4, $5, $7::text)))
+     ORDER BY created_at DESC, id DESC LIMIT $6)
+    UNION ALL
+    (SELECT id, 'in', from_account_id, amount, created_at FROM transfers
+     WHERE to_account_id = $1
+       AND ($2::timestamp IS NULL OR created_at >= $2) AND ($3::timestamp IS NULL OR created_at < $3)
+       AND ($4::timestamp IS NULL OR ((created_at, id) <= ($4, $5) AND (created_at, id, 'in') < ($4, $5, $7::text)))
+     ORDER BY created_at DESC, id DESC LIMIT $6)
+) AS history
+ORDER BY created_at DESC, id DESC, direction DESC
+LIMIT $6
+"""
+
+
+def _account_row(record):
+    return (record[0], record[1], record[2], record[3].isoformat(), record[4])
+
+
+class PostgresStorage(Storage):
+    def __init__(self, dsn, min_size=2, max_size=8, hub=None):
+        self.dsn = dsn
+        self.min_size = min_size
+        self.max_size = max_size
+        self.hub = hub
+        self._pool = None
+        self._listener = None
+
+    async def start(self):
+        if self._pool is not None:
+            return
+        try:
+            import asyncpg
+        except ImportError:
+            raise RuntimeError("STORAGE_BACKEND=postgres için asyncpg kurulu olmalı (pip install asyncpg)")
+        self._pool = await asyncpg.create_pool(self.dsn, min_size=self.min_size, max_size=self.max_size)
+        await self.migrate()
+        if self.hub is not None:
+            self._listener = asyncio.create_task(self._listen())
+
+    async def migrate(self):
+        """Tablolar yoksa oluştur; şema hazırsa yalnızca katalog sorgusu yapılır"""
+        async with self._pool.acquire() as conn:
+            if await conn.fetchval("SELECT to_regclass('idx_accounts_phone')") is not None:
+                return
+            async with conn.transaction():
+                await conn.execute("SELECT pg_advisory_xact_lock($1)", SCHEMA_LOCK)
+                for ddl in SCHEMA:
+                    await conn.execute(ddl)
+                # Mevcut hesapların numaraları normalize edilir (yinelenenler boş kalır)
+                taken = [r[0] for r in await conn.fetch(
+                    "SELECT phone_normalized FROM accounts WHERE phone_normalized IS NOT NULL"
+                )]
+                rows = await conn.fetch("SELECT id, phone FROM accounts WHERE phone_normalized IS NULL")
+                updates, _ = assign_normalized([tuple(r) for r in rows], taken)
+                await conn.executemany("UPDATE accounts SET phone_normalized = $1 WHERE id = $2", updates)
+                await conn.execute(PHONE_INDEX)
+
+    async def close(self):
+        if self._listener is not None:
+            self._listener.cancel()
+            self._listener = None
+        if self._pool is not None:
+            await self._pool.close()
+            self._pool = None
+
+    async def _listen(self):
+        """Bildirim kanalını ayrı bir bağlantıda dinle; bağlantı koparsa yeniden bağlan"""
+        import asyncpg
+        while True:
+            conn = None
+            try:
+                conn = await asyncpg.connect(self.dsn)
+                lost = asyncio.get_running_loop().create_future()
+                conn.add_termination_listener(lambda _: lost.done() or lost.set_result(None))
+                await conn.add_listener(EVENTS_CHANNEL, self._on_events)
+                await lost
+            except (OSError, asyncpg.PostgresError) as e:
+                logger.warning("bildirim kanalı dinlenemiyor: %s", e)
+            finally:
+                if conn is not None and not conn.is_closed():
+                    await conn.close()
+            await asyncio.sleep(1)
+
+    def _on_events(self, conn, pid, channel, payload):
+        for account_id, kind, data in json.loads(payload):
+            self.hub.publish(account_id, kind, data)
+
+    async def _notify(self, conn, events):
+        # İşlem içinde çağrılır; NOTIFY yalnızca commit'te teslim edilir
+        if self.hub is not None:
+            await conn.execute("SELECT pg_notify($1, $2)", EVENTS_CHANNEL, json.dumps(events, ensure_ascii=False))
+
+    def stats(self):
+        if self._pool is None:
+            return {"backend": "postgres", "open": 0}
+        return {
+            "backend": "postgres",
+            "size": self.max_size,
+            "open": self._pool.get_size(),
+            "idle": self._pool.get_idle_size(),
+        }
+
+    async def _insert(self, sql, *args):
+        import asyncpg
+        try:
+            return await self._pool.fetchval(sql, *args)
+        except asyncpg.IntegrityConstraintViolationError as e:
+            raise LedgerError(400, str(e))
+
+    async def _iter_chunks(self, sql, *args):
+        # Sunucu tarafı cursor yalnızca bir işlem içinde açılabilir
+        async with self._pool.acquire() as conn:
+            async with conn.transaction():
+                chunk = []
+                async for record in conn.cursor(sql, *args, prefetch=STREAM_CHUNK_SIZE):
+                    chunk.append(record)
+                    if len(chunk) == STREAM_CHUNK_SIZE:
+                        yield chunk
+                        chunk = []
+                if chunk:
+                    yield chunk
+
+    async def create_account(self, name, phone, created_at, balance):
+        import asyncpg
+        normalized = normalized_phone(phone)
+        created_at = created_at.replace(tzinfo=None)
+        try:
+            async with self._pool.acquire() as conn:
+                async with conn.transaction():
+                    account_id = await conn.fetchval(
+                        "INSERT INTO accounts (name, phone, created_at, balance, phone_normalized) "
+                        "VALUES ($1, $2, $3, $4, $5) RETURNING id",
+                        name, phone, created_at, balance, normalized
+                    )
+                    if balance:
+                        await conn.execute(JOURNAL_INSERT, account_id, balance, "open", None, created_at)
+        except asyncpg.UniqueViolationError:
+            raise LedgerError(409, DUPLICATE_PHONE)
+        except asyncpg.IntegrityConstraintViolationError as e:
+            raise LedgerError(400, str(e))
+        return account_id
+
+    async def get_account(self, account_id):
+        record = await self._pool.fetchrow(f"{ACCOUNT_SELECT} WHERE id = $1", account_id)
+        return _account_row(record) if record is not None else None
+
+    async def list_accounts(self, after, limit):
+        records = await self._pool.fetch(f"{ACCOUNT_SELECT} WHERE id > $1 ORDER BY id LIMIT $2", after, limit)
+        return [_account_row(record) for record in records]
+
+    async def iter_accounts(self, after):
+        async for chunk in self._iter_chunks(f"{ACCOUNT_SELECT} WHERE id > $1 ORDER BY id", after):
+            yield [_account_row(record) for record in chunk]
+
+    async def find_accounts_by_phone(self, phones):
+        records = await self._pool.fetch(
+            "SELECT phone_normalized, id FROM accounts WHERE phone_normalized = ANY($1::text[])", list(phones)
+        )
+        return dict(tuple(record) for record in records)
+
+    async def create_merchant(self, name, category):
+        return await self._insert(
+            "INSERT INTO merchants (name, category) VALUES ($1, $2) RETURNING id", name, category
+        )
+
+    async def get_merchant(self, merchant_id):
+        record = await self._pool.fetchrow("SELECT id, name, category FROM merchants WHERE id = $1", merchant_id)
+        return tuple(record) if record is not None else None
+
+    async def list_merchants(self, after, limit):
+        records = await self._pool.fetch(
+            "SELECT id, name, category FROM merchants WHERE id > $1 ORDER BY id LIMIT $2", after, limit
+        )
+        return [tuple(record) for record in records]
+
+    async def iter_merchants(self, after):
+        async for chunk in self._iter_chunks("SELECT id, name, category FROM merchants WHERE id > $1 ORDER BY id", after):
+            yield [tuple(record) for record in chunk]
+
+    async def topup(self, account_id, amount):
+        async with self._pool.acquire() as conn:
+            async with conn.transaction():
+                balance = await self._credit(conn, account_id, amount, "Hesap bulunamadı")
+                await conn.execute(JOURNAL_INSERT, account_id, amount, "topup", None, datetime.now())
+                await self._notify(conn, [(account_id, "topup", {"amount": amount, "balance": balance})])
+        return balance
+
+    async def _debit(self, conn, account_id, amount, missing):
+        """Bakiye yeterliyse tek ifadede düş; kontrol ve yazım aynı satır kilidi altında"""
+        balance = await conn.fetchval(
+            "UPDATE accounts SET balance = balance - $2 WHERE id = $1 AND balance >= $2 RETURNING balance",
+            account_id, amount
+        )
+        if balance is None:
+            if await conn.fetchval("SELECT 1 FROM accounts WHERE id = $1", account_id) is None:
+                raise LedgerError(404, missing)
+            raise LedgerError(400, "Yetersiz bakiye")
+        return balance
+
+    async def _credit(self, conn, account_id, amount, missing="Alıcı hesap bulunamadı"):
+        import asyncpg
+        try:
+            balance = await conn.fetchval(
+                "UPDATE accounts SET balance = balance + $2 WHERE id = $1 RETURNING balance", account_id, amount
+            )
+        except asyncpg.NumericValueOutOfRangeError:
+            raise LedgerError(400, BALANCE_OVERFLOW)
+        if balance is None:
+            raise LedgerError(404, missing)
+        return balance
+
+    async def transfer(self, from_account_id, to_account_id, amount):
+        async with self._pool.acquire() as conn:
+            async with conn.transaction():
+                # Satırlar her zaman ID sırasıyla güncellenir (kilitlenmeyi önler)
+                if to_account_id < from_account_id:
+                    credited = await self._credit(conn, to_account_id, amount)
+                    new_balance = await self._debit(conn, from_account_id, amount, "Gönderen hesap bulunamadı")
+                else:
+                    new_balance = await self._debit(conn, from_account_id, amount, "Gönderen hesap bulunamadı")
+                    credited = await self._credit(conn, to_account_id, amount)
+                    if to_account_id == from_account_id:
+                        new_balance = credited
+                created_at = datetime.now()
+                transfer_id = await conn.fetchval(
+                    "INSERT INTO transfers (from_account_id, to_account_id, amount, created_at) "
+                    "VALUES ($1, $2, $3, $4) RETURNING id",
+                    from_account_id, to_account_id, amount, created_at
+                )
+                await conn.executemany(JOURNAL_INSERT, [
+                    (from_account_id, -amount, "transfer", transfer_id, created_at),
+                    (to_account_id, amount, "transfer", transfer_id, created_at),
+                ])
+                common = {"transfer_id": transfer_id, "amount": amount, "created_at": created_at.isoformat()}
+                await self._notify(conn, [
+                    (from_account_id, "transfer_out", {**common, "to_account_id": to_account_id, "balance": new_balance}),
+                    (to_account_id, "transfer_in", {**common, "from_account_id": from_account_id, "balance": credited}),
+                ])
+        return transfer_id, new_balance, created_at
+
+    async def transaction_history(self, account_id, limit, cursor=None, start=None, end=None):
+        cursor_at, cursor_id, cursor_dir = None, 0, ""
+        if cursor:
+            cursor_at, cursor_id, cursor_dir = decode_cursor(cursor)
+            cursor_at = datetime.fromisoformat(cursor_at)
+        records = await self._pool.fetch(
+            HISTORY_SQL, account_id, local_naive(start), local_naive(end), cursor_at, cursor_id, limit, cursor_dir
+        )
+        return [(r[0], r[1], r[2], r[3], r[4].isoformat()) for r in records]
+
+    async def balance_at(self, account_id, moment):
+        # Snapshot yok: BIGSERIAL ID'leri commit sırasıyla artmadığından
+        # "şu satıra kadar" snapshot'ı güvenli değil; hesabın defteri toplanır
+        return await self._pool.fetchval(
+            "SELECT COALESCE(SUM(delta), 0) FROM balance_journal WHERE account_id = $1 AND created_at <= $2",
+            account_id, local_naive(moment)
+        )
@@ -0,0 +1,218 @@
+"""HTML sayfaları ve statik dosyalar için önbellekleme katmanı.
+
+`StaticAssets` açılışta `static/` altındaki dosyaları bir kez okur; her dosya
+için içerik özetinden bir parmak izi (`style.3f2a1b9c0d.css`), ETag ve
+Last-Modified üretir, sıkıştırılabilir dosyaları gzip (ve `brotli` kuruluysa
+br) ile bir kez sıkıştırıp bellekte tutar. Parmak izli adlar değişmeyeceği
+için bir yıllık `immutable` önbellek başlığıyla, eski (parmak izsiz) adlar
+`no-cache` + ETag ile yeniden doğrulanarak sunulur; istek başına sıkıştırma
+veya disk okuması yapılmaz.
+
+Şablonlar açılışta derlenir ve (`TEMPLATE_RELOAD=1` verilmedikçe) her
+istekte dosya değişikliği denetlenmez. `{% cache "anahtar", ... %}` bloğu
+istekten bağımsız parçaları bir kez render edip saklar. `render_page`
+sayfa gövdesinden ETag üretir ve eşleşen `If-None-Match` için 304 döndürür.
+"""
+import gzip
+import hashlib
+import mimetypes
+import os
+from email.utils import formatdate, parsedate_to_datetime
+
+from jinja2 import nodes
+from jinja2.ext import Extension
+from starlette.responses import Response
+
+try:
+    import brotli
+except ImportError:  # isteğe bağlı; yoksa yalnızca gzip sunulur
+    brotli = None
+
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "no-cache"
+
+COMPRESSIBLE = ("text/", "application/javascript", "application/json", "image/svg+xml")
+
+
+def _etag(data):
+    return hashlib.blake2b(data, digest_size=12).hexdigest()
+
+
+def _accepted_encodings(header):
+    """Accept-Encoding başlığından q > 0 olan kodlamalar"""
+    accepted = set()
+    for part in header.split(","):
+        name, _, params = part.strip().partition(";")
+        q = params.strip()
+        if q.startswith("q="):
+            try:
+                if float(q[2:]) <= 0:
+                    continue
+            except ValueError:
+                continue
+        accepted.add(name.strip().lower())
+    return accepted
+
+
+def _not_modified(headers, etags, last_modified):
+    """Koşullu istek başlıkları istemcinin kopyasının güncel olduğunu söylüyor mu"""
+    if_none_match = headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        return "*" in tags or not tags.isdisjoint(etags)
+    if_modified_since = headers.get("if-modified-since")
+    if if_modified_since and last_modified is not None:
+        try:
+            return int(parsedate_to_datetime(if_modified_since).timestamp()) >= int(last_modified)
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+class Asset:
+    __slots__ = ("path", "url", "media_type", "last_modified", "variants")
+
+    def __init__(self, path, url, media_type, last_modified, variants):
+        self.path = path
+        self.url = url
+        self.media_type = media_type
+        self.last_modified = last_modified
+        self.variants = variants  # kodlama ("identity", "gzip", "br") -> (gövde, ETag)
+
+
+class StaticAssets:
+    """Parmak izli, önceden sıkıştırılmış statik dosyaları sunan ASGI uygulaması"""
+
+    def __init__(self, directory, prefix="/static"):
+        self.directory = directory
+        self.prefix = prefix
+        self._assets = {}  # istek yolu (parmak izli veya değil) -> (Asset, immutable)
+        self._urls = {}
+        self.load()
+
+    def load(self):
+        assets, urls = {}, {}
+        for root, _, files in os.walk(self.directory):
+            for filename in sorted(files):
+                full = os.path.join(root, filename)
+                path = os.path.relpath(full, self.directory).replace(os.sep, "/")
+                asset = self._build(full, path)
+                assets[path] = (asset, False)
+                assets[asset.url[len(self.prefix) + 1:]] = (asset, True)
+                urls[path] = asset.url
+        self._assets, self._urls = assets, urls
+
+    def _build(self, full, path):
+        with open(full, "rb") as f:
+            data = f.read()
+        digest = _etag(data)
+        stem, ext = os.path.splitext(path)
+        media_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+        variants = {"identity": (data, f'"{digest}"')}
+        if media_type.startswith(COMPRESSIBLE):
+            compressed = gzip.compress(data, compresslevel=9, mtime=0)
+            if len(compressed) < len(data):
+                variants["gzip"] = (compressed, f'"{digest}-gz"')
+            if brotli is not None:
+                compressed = brotli.compress(data, quality=11)
+                if len(compressed) < len(data):
+                    variants["br"] = (compressed, f'"{digest}-br"')
+        return Asset(path, f"{self.prefix}/{stem}.{digest[:10]}{ext}", media_type, os.path.getmtime(full), variants)
+
+    def url(self, path):
+        """Şablonlar için parmak izli URL (bilinmeyen dosyada düz yol)"""
+        return self._urls.get(path, f"{self.prefix}/{path}")
+
+    def stats(self):
+        files = [asset for asset, immutable in self._assets.values() if not immutable]
+        return {
+            "files": len(files),
+            "bytes": sum(len(a.variants["identity"][0]) for a in files),
+            "gzip_bytes": sum(len(a.variants.get("gzip", a.variants["identity"])[0]) for a in files),
+        }
+
+    async def __call__(self, scope, receive, send):
+        assert scope["type"] == "http"
+        path = scope["path"]
+        root_path = scope.get("root_path", "")
+        if root_path and path.startswith(root_path):
+            path = path[len(root_path):]
+        entry = self._assets.get(path.lstrip("/"))
+        if entry is None or scope["method"] not in ("GET", "HEAD"):
+            status = 404 if entry is None else 405
+            return await Response(status_code=status)(scope, receive, send)
+
+        asset, immutable = entry
+        headers = {k.decode("latin-1"): v.decode("latin-1") for k, v in scope["headers"]}
+        encoding = "identity"
+        if len(asset.variants) > 1:
+            accepted = _accepted_encodings(headers.get("accept-encoding", ""))
+            encoding = next((e for e in ("br", "gzip") if e in accepted and e in asset.variants), "identity")
+        body, etag = asset.variants[encoding]
+
+        response_headers = {
+            "cache-control": IMMUTABLE if immutable else REVALIDATE,
+            "etag": etag,
+            "last-modified": formatdate(asset.last_modified, usegmt=True),
+        }
+        if len(asset.variants) > 1:
+            response_headers["vary"] = "Accept-Encoding"
+        if _not_modified(headers, {etag for _, etag in asset.variants.values()}, asset.last_modified):
+            return await Response(status_code=304, headers=response_headers)(scope, receive, send)
+
+        if encoding != "identity":
+            response_headers["content-encoding"] = encoding
+        response_headers["content-length"] = str(len(body))
+        if scope["method"] == "HEAD":
+            body = b""
+        await Response(body, media_type=asset.media_type, headers=response_headers)(scope, receive, send)
+
+
+class FragmentCacheExtension(Extension):
+    """`{% cache "anahtar", ... %}...{% endcache %}`: bloğu anahtar başına bir kez render et"""
+
+    tags = {"cache"}
+
+    def __init__(self, environment):
+        super().__init__(environment)
+        environment.extend(fragment_cache={}, fragment_cache_size=1024)
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        args = [parser.parse_expression()]
+        while parser.stream.skip_if("comma"):
+            args.append(parser.parse_expression())
+        body = parser.parse_statements(("name:endcache",), drop_needle=True)
+        return nodes.CallBlock(
+            self.call_method("_render", [nodes.List(args)]), [], [], body
+        ).set_lineno(lineno)
+
+    def _render(self, key, caller):
+        cache = self.environment.fragment_cache
+        key = tuple(str(part) for part in key)
+        fragment = cache.get(key)
+        if fragment is None:
+            if len(cache) >= self.environment.fragment_cache_size:
+                cache.clear()
+            fragment = cache[key] = caller()
+        return fragment
+
+
+def configure_templates(templates, assets):
+    """Jinja ortamını önbellekli çalışacak şekilde ayarla ve tüm şablonları derle"""
+    env = templates.env
+    env.add_extension(FragmentCacheExtension)
+    env.globals["static_url"] = assets.url
+    env.auto_reload = os.environ.get("TEMPLATE_RELOAD") == "1"
+    for name in env.list_templates():
+        env.get_template(name)
+
+
+def render_page(templates, request, name, context, cache_control="private, no-cache"):
+    """Şablonu render et; gövdenin ETag'i istemcidekiyle aynıysa 304 döndür"""
+    body = templates.get_template(name).render({"request": request, **context}).encode()
+    etag = f'"{_etag(body)}"'
+    headers = {"etag": etag, "cache-control": cache_control}
+    if _not_modified(request.headers, {etag}, None):
+        return Response(status_code=304, headers=headers)
+    return Response(body, media_type="text/html", headers=headers)